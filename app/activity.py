@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import threading
+from array import array
+from datetime import datetime, timezone
+
+from app.config import settings
+from app.models import EntryStatus, WaitlistEntry
+
+# Transition kinds, stored by index; the status each one leaves the entry in.
+KINDS = ("joined", "promoted", "seated", "no_show", "cancelled", "expired")
+STATUS_OF = {
+    "joined": EntryStatus.QUEUED,
+    "promoted": EntryStatus.NOTIFIED,
+    "seated": EntryStatus.SEATED,
+    "no_show": EntryStatus.NO_SHOW,
+    "cancelled": EntryStatus.CANCELLED,
+    "expired": EntryStatus.EXPIRED,
+}
+_CODES = {kind: i for i, kind in enumerate(KINDS)}
+
+
+def _iso(seconds: float) -> str:
+    return datetime.fromtimestamp(seconds, timezone.utc).isoformat()
+
+
+class ActivityLog:
+    """The last `capacity` state transitions of one event.
+
+    Transitions live in parallel arrays allocated up front; each write takes
+    the slot of the oldest one, and reads walk back from the newest, so
+    recording is O(1) and reading the latest n is O(n).
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.at = array("d", [0.0]) * capacity
+        self.kinds = array("b", [0]) * capacity
+        self.party_sizes = array("i", [0]) * capacity
+        self.entry_ids: list[str | None] = [None] * capacity
+        self.names: list[str | None] = [None] * capacity
+        # Transitions ever recorded; the next one goes to slot `total % capacity`.
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def record(self, at: datetime, kind: str, entry: WaitlistEntry) -> None:
+        with self._lock:
+            i = self.total % self.capacity
+            self.at[i] = at.timestamp()
+            self.kinds[i] = _CODES[kind]
+            self.party_sizes[i] = entry.partySize
+            self.entry_ids[i] = entry.id
+            self.names[i] = entry.name
+            self.total += 1
+
+    def recent(self, limit: int) -> list[dict]:
+        """Up to `limit` transitions, newest first."""
+        with self._lock:
+            rows = []
+            for k in range(1, min(limit, self.total, self.capacity) + 1):
+                i = (self.total - k) % self.capacity
+                kind = KINDS[self.kinds[i]]
+                rows.append(
+                    {
+                        "entryId": self.entry_ids[i],
+                        "name": self.names[i],
+                        "partySize": self.party_sizes[i],
+                        "kind": kind,
+                        "status": STATUS_OF[kind].value,
+                        "at": _iso(self.at[i]),
+                    }
+                )
+            return rows
+
+
+class TimeSeries:
+    """Queue length, seated guests and predicted wait of one event at a fixed resolution.
+
+    Bucket b (epoch seconds // resolution) is kept in slot b % slots of arrays
+    allocated up front and holds the last sample taken during it. When a
+    sample lands past buckets nobody sampled, those inherit the previous
+    values, so the series has no gaps and a read is a walk over its window.
+    """
+
+    def __init__(self, resolution_seconds: int, slots: int):
+        self.resolution_seconds = resolution_seconds
+        self.slots = slots
+        self.buckets = array("q", [-1]) * slots
+        self.queue_length = array("i", [0]) * slots
+        self.occupancy = array("i", [0]) * slots
+        self.predicted_wait = array("i", [0]) * slots
+        self.latest = -1
+        self._lock = threading.Lock()
+
+    def _bucket(self, at: datetime) -> int:
+        return int(at.timestamp()) // self.resolution_seconds
+
+    def observe(self, at: datetime, queue_length: int, occupancy: int, predicted_wait: int) -> None:
+        with self._lock:
+            # A sample from behind the newest bucket (clock adjustments) updates the newest one.
+            bucket = max(self._bucket(at), self.latest)
+            if self.latest >= 0:
+                self._carry_to(bucket)
+            i = bucket % self.slots
+            self.buckets[i] = bucket
+            self.queue_length[i] = queue_length
+            self.occupancy[i] = occupancy
+            self.predicted_wait[i] = predicted_wait
+            self.latest = bucket
+
+    def _carry_to(self, bucket: int) -> None:
+        src = self.latest % self.slots
+        values = self.queue_length[src], self.occupancy[src], self.predicted_wait[src]
+        for b in range(max(self.latest + 1, bucket - self.slots + 1), bucket):
+            i = b % self.slots
+            self.buckets[i] = b
+            self.queue_length[i], self.occupancy[i], self.predicted_wait[i] = values
+
+    def window(self, buckets: int) -> dict:
+        """The newest `buckets` points as columns, oldest first."""
+        with self._lock:
+            columns: dict[str, list] = {"at": [], "queueLength": [], "occupancy": [], "predictedWait": []}
+            for b in range(self.latest - min(buckets, self.slots) + 1, self.latest + 1):
+                i = b % self.slots
+                if self.latest < 0 or self.buckets[i] != b:
+                    continue
+                columns["at"].append(_iso(b * self.resolution_seconds))
+                columns["queueLength"].append(self.queue_length[i])
+                columns["occupancy"].append(self.occupancy[i])
+                columns["predictedWait"].append(self.predicted_wait[i])
+            return {"resolutionSeconds": self.resolution_seconds, **columns}
+
+
+class EventActivity:
+    def __init__(self) -> None:
+        self.log = ActivityLog(settings.activity_log_size)
+        self.series = TimeSeries(settings.timeseries_resolution_seconds, settings.timeseries_slots)
+
+
+_indexes: dict[str, EventActivity] = {}
+_lock = threading.Lock()
+
+
+def activity_for(event_id: str) -> EventActivity:
+    activity = _indexes.get(event_id)
+    if activity is None:
+        with _lock:
+            activity = _indexes.get(event_id)
+            if activity is None:
+                activity = _indexes[event_id] = EventActivity()
+    return activity
+
+
+def forget(event_id: str) -> None:
+    _indexes.pop(event_id, None)
@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+
+import numpy as np
+
+from app.models import EntryStatus, Event, EventType, now_utc
+from app.store import store
+
+EVENT_TYPES = list(EventType)
+STATUS_CODES = {status: code for code, status in enumerate(EntryStatus)}
+# Party sizes above this share the last bucket.
+MAX_PARTY_BUCKET = 12
+# A group needs this many resolved entries before its rates are used as priors.
+MIN_SAMPLES = 20
+SERVICE_TIME_BOUNDS = (2.0, 60.0)
+
+
+@dataclass
+class HistoryColumns:
+    """Columnar view of every entry of a set of past events (one row per entry)."""
+
+    hour: np.ndarray
+    weekday: np.ndarray
+    party: np.ndarray
+    event_type: np.ndarray
+    status: np.ndarray
+    service_minutes: np.ndarray  # NaN unless the entry was seated
+
+    def __len__(self) -> int:
+        return len(self.status)
+
+    def keys(self) -> dict[str, tuple[np.ndarray, int]]:
+        """Group key per row and group count for each breakdown of `VenueStats`."""
+        return {
+            "overall": (np.zeros(len(self), dtype=np.int64), 1),
+            "byHour": (self.hour, 24),
+            "byWeekday": (self.weekday, 7),
+            "byPartySize": (self.party, MAX_PARTY_BUCKET + 1),
+            "byEventType": (self.event_type, len(EVENT_TYPES)),
+        }
+
+
+def _epoch_minutes(values: list[datetime]) -> np.ndarray:
+    return np.fromiter((v.timestamp() / 60 for v in values), dtype=np.float64, count=len(values))
+
+
+def build_columns(events: list[Event]) -> HistoryColumns:
+    hours: list[int] = []
+    weekdays: list[int] = []
+    parties: list[int] = []
+    types: list[int] = []
+    statuses: list[int] = []
+    event_index: list[int] = []
+    completed: list[datetime] = []
+    starts: list[datetime] = []
+
+    for i, event in enumerate(events):
+        starts.append(event.startTime)
+        type_code = EVENT_TYPES.index(EventType(event.eventType))
+        for entry in store.waitlists.get(event.id, []):
+            hours.append(entry.joinedAt.hour)
+            weekdays.append(entry.joinedAt.weekday())
+            parties.append(entry.partySize)
+            types.append(type_code)
+            statuses.append(STATUS_CODES[entry.status])
+            event_index.append(i)
+            completed.append(entry.completedAt or entry.joinedAt)
+
+    status = np.asarray(statuses, dtype=np.int8)
+    owner = np.asarray(event_index, dtype=np.int64)
+    service = np.full(len(status), np.nan)
+
+    # Service time in this codebase is "minutes per seated party": the gap
+    # between consecutive seatings of an event (the first one is measured from
+    # the event start). Sort seated rows by (event, completion) and diff.
+    seated = np.flatnonzero(status == STATUS_CODES[EntryStatus.SEATED])
+    if len(seated):
+        done = _epoch_minutes(completed)[seated]
+        order = np.lexsort((done, owner[seated]))
+        rows, done, events_of = seated[order], done[order], owner[seated][order]
+        previous = np.empty_like(done)
+        previous[1:] = done[:-1]
+        first = np.ones(len(done), dtype=bool)
+        first[1:] = events_of[1:] != events_of[:-1]
+        previous[first] = _epoch_minutes(starts)[events_of[first]]
+        service[rows] = np.clip(done - previous, 0, None)
+
+    return HistoryColumns(
+        hour=np.asarray(hours, dtype=np.int64),
+        weekday=np.asarray(weekdays, dtype=np.int64),
+        party=np.minimum(np.asarray(parties, dtype=np.int64), MAX_PARTY_BUCKET),
+        event_type=np.asarray(types, dtype=np.int64),
+        status=status,
+        service_minutes=service,
+    )
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(denominator > 0, numerator / np.maximum(denominator, 1), np.nan)
+
+
+# Rows of the per-group totals built by `group_sums`.
+SUMS = ("entries", "finished", "resolved", "noShows", "abandoned", "serviceMinutes", "serviceCount")
+
+
+def group_sums(columns: HistoryColumns, key: np.ndarray, groups: int) -> np.ndarray:
+    """Per-group totals via bincount, one row per name in `SUMS`."""
+    status = columns.status
+    no_show = status == STATUS_CODES[EntryStatus.NO_SHOW]
+    seated = status == STATUS_CODES[EntryStatus.SEATED]
+    abandoned = (status == STATUS_CODES[EntryStatus.CANCELLED]) | (status == STATUS_CODES[EntryStatus.EXPIRED])
+    finished = seated | no_show
+    has_service = ~np.isnan(columns.service_minutes)
+    return np.vstack(
+        [
+            np.bincount(key, minlength=groups),
+            np.bincount(key, weights=finished, minlength=groups),
+            np.bincount(key, weights=finished | abandoned, minlength=groups),
+            np.bincount(key, weights=no_show, minlength=groups),
+            np.bincount(key, weights=abandoned, minlength=groups),
+            np.bincount(key[has_service], weights=columns.service_minutes[has_service], minlength=groups),
+            np.bincount(key[has_service], minlength=groups),
+        ]
+    ).astype(np.float64)
+
+
+def history_sums(columns: HistoryColumns) -> dict[str, np.ndarray]:
+    return {name: group_sums(columns, key, groups) for name, (key, groups) in columns.keys().items()}
+
+
+def group_stats(sums: np.ndarray) -> dict[str, np.ndarray]:
+    """Per-group no-show rate, abandonment rate and mean service time from `group_sums` totals."""
+    _, finished, resolved, no_shows, abandoned, service_minutes, service_count = sums
+    return {
+        "samples": resolved,
+        "noShowRate": _ratio(no_shows, finished),
+        "abandonmentRate": _ratio(abandoned, resolved),
+        "avgServiceTime": _ratio(service_minutes, service_count),
+    }
+
+
+def _rows(stats: dict[str, np.ndarray], labels: list) -> list[dict]:
+    rows = []
+    for i, label in enumerate(labels):
+        samples = int(stats["samples"][i])
+        if not samples:
+            continue
+        row = {"key": label, "samples": samples}
+        for name in ("noShowRate", "abandonmentRate", "avgServiceTime"):
+            value = stats[name][i]
+            row[name] = None if np.isnan(value) else round(float(value), 4)
+        rows.append(row)
+    return rows
+
+
+@dataclass
+class VenueStats:
+    venue: str
+    events: int
+    entries: int
+    overall: dict
+    byHour: list[dict]
+    byWeekday: list[dict]
+    byPartySize: list[dict]
+    byEventType: list[dict]
+
+    def prior_for(self, event_type: EventType | str) -> dict | None:
+        """Most specific group with enough history: the event type, else the whole venue."""
+        for row in self.byEventType:
+            if row["key"] == EventType(event_type).value and row["samples"] >= MIN_SAMPLES:
+                return row
+        return self.overall if self.overall["samples"] >= MIN_SAMPLES else None
+
+
+def compute_venue_stats(venue: str, events: list[Event], archived: tuple[int, dict[str, np.ndarray]] | None = None) -> VenueStats:
+    sums = history_sums(build_columns(events))
+    archived_events = 0
+    if archived is not None:
+        archived_events, totals = archived
+        sums = {name: sums[name] + totals[name] for name in sums}
+    rows = lambda name, labels: _rows(group_stats(sums[name]), labels)
+    return VenueStats(
+        venue=venue,
+        events=len(events) + archived_events,
+        entries=int(sums["overall"][0, 0]),
+        overall=(rows("overall", ["all"]) or [{"key": "all", "samples": 0}])[0],
+        byHour=rows("byHour", list(range(24))),
+        byWeekday=rows("byWeekday", list(range(7))),
+        byPartySize=rows("byPartySize", list(range(MAX_PARTY_BUCKET + 1))),
+        byEventType=rows("byEventType", [t.value for t in EVENT_TYPES]),
+    )
+
+
+def venue_key(event: Event) -> str:
+    return (event.location or event.name).strip().lower()
+
+
+_cache: dict[str, tuple[tuple, VenueStats]] = {}
+_cache_lock = threading.Lock()
+# Archived history per venue: (event count, `history_sums` totals). The totals have a
+# fixed size, so archiving costs one pass over the event and memory stays flat.
+_archived: dict[str, tuple[int, dict[str, np.ndarray]]] = {}
+
+
+def archive_history(event: Event) -> None:
+    """Add an event's entries to its venue's archived totals."""
+    venue = venue_key(event)
+    sums = history_sums(build_columns([event]))
+    with _cache_lock:
+        count, totals = _archived.get(venue, (0, None))
+        _archived[venue] = (count + 1, sums if totals is None else {name: totals[name] + sums[name] for name in sums})
+
+
+def venue_stats(venue: str) -> VenueStats:
+    """Historical stats over the venue's finished events, cached until that set changes."""
+    now = now_utc()
+    past = [e for e in store.events.values() if e.endTime <= now and not e.archived and venue_key(e) == venue]
+    archived = _archived.get(venue)
+    signature = (tuple(sorted((e.id, len(store.waitlists.get(e.id, ()))) for e in past)), archived[0] if archived else 0)
+    cached = _cache.get(venue)
+    if cached and cached[0] == signature:
+        return cached[1]
+
+    stats = compute_venue_stats(venue, past, archived)
+    with _cache_lock:
+        _cache[venue] = (signature, stats)
+    return stats
+
+
+def apply_priors(event: Event) -> None:
+    """Seed an event's service time and no-show prior from its venue's history."""
+    prior = venue_stats(venue_key(event)).prior_for(event.eventType)
+    if prior is None:
+        return
+    if prior["noShowRate"] is not None:
+        event.historical_no_show_rate = prior["noShowRate"]
+    if prior["avgServiceTime"] is not None:
+        low, high = SERVICE_TIME_BOUNDS
+        event.avg_service_time = max(low, min(high, round(prior["avgServiceTime"], 1)))
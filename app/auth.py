@@ -9,13 +9,14 @@ DEMO_BEARER = "demo-token"
 DEMO_API_KEY = "demo-api-key"
 
 
-def require_auth(authorization: str | None = Header(default=None), x_api_key: str | None = Header(default=None)) -> None:
+def is_staff(authorization: str | None, x_api_key: str | None) -> bool:
     if x_api_key == DEMO_API_KEY:
-        return
-
+        return True
     if authorization and authorization.startswith("Bearer "):
-        token = authorization.removeprefix("Bearer ").strip()
-        if token == DEMO_BEARER:
-            return
+        return authorization.removeprefix("Bearer ").strip() == DEMO_BEARER
+    return False
 
-    raise ApiError(401, "UNAUTHORIZED", "Missing or invalid authentication")
+
+def require_auth(authorization: str | None = Header(default=None), x_api_key: str | None = Header(default=None)) -> None:
+    if not is_staff(authorization, x_api_key):
+        raise ApiError(401, "UNAUTHORIZED", "Missing or invalid authentication")
@@ -8,6 +8,8 @@ from app.store import store
 DOC_EVENT_ID = "550e8400-e29b-41d4-a716-446655440000"
 DOC_ENTRY_ID = "880e8400-e29b-41d4-a716-446655440003"
 LEGACY_EVENT_ID = "223"
+# Fixed demo records the frontend boilerplates rely on; they are never archived.
+SEEDED_EVENT_IDS = (DOC_EVENT_ID, LEGACY_EVENT_ID)
 
 
 def seed_demo_data() -> None:
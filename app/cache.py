@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Iterable
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.config import settings
+from app.models import Event
+
+# Per-request memo of events already resolved by this request.
+_request_events: ContextVar[dict[str, Event] | None] = ContextVar("request_events", default=None)
+
+
+class EventCache:
+    """Bounded LRU of Event records with a TTL, shared by every request in the process."""
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._items: OrderedDict[str, tuple[float, Event]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.scope_hits = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, event_id: str) -> Event | None:
+        scoped = _request_events.get()
+        if scoped is not None and event_id in scoped:
+            self.scope_hits += 1
+            return scoped[event_id]
+
+        with self._lock:
+            item = self._items.get(event_id)
+            if item is not None and item[0] > time.monotonic():
+                self._items.move_to_end(event_id)
+                self.hits += 1
+                event = item[1]
+            else:
+                if item is not None:
+                    del self._items[event_id]
+                self.misses += 1
+                return None
+
+        if scoped is not None:
+            scoped[event_id] = event
+        return event
+
+    def put(self, event: Event) -> None:
+        with self._lock:
+            self._items[event.id] = (time.monotonic() + self.ttl_seconds, event)
+            self._items.move_to_end(event.id)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+                self.evictions += 1
+        scoped = _request_events.get()
+        if scoped is not None:
+            scoped[event.id] = event
+
+    def invalidate(self, event_id: str) -> None:
+        with self._lock:
+            self._items.pop(event_id, None)
+            self.invalidations += 1
+        scoped = _request_events.get()
+        if scoped is not None:
+            scoped.pop(event_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def metric_lines(self) -> Iterable[str]:
+        yield "# HELP event_cache_requests_total Event lookups by cache outcome."
+        yield "# TYPE event_cache_requests_total counter"
+        yield f'event_cache_requests_total{{result="request_scope_hit"}} {self.scope_hits}'
+        yield f'event_cache_requests_total{{result="hit"}} {self.hits}'
+        yield f'event_cache_requests_total{{result="miss"}} {self.misses}'
+        yield "# HELP event_cache_evictions_total Entries dropped by the LRU bound."
+        yield "# TYPE event_cache_evictions_total counter"
+        yield f"event_cache_evictions_total {self.evictions}"
+        yield "# HELP event_cache_invalidations_total Entries dropped because the event was written."
+        yield "# TYPE event_cache_invalidations_total counter"
+        yield f"event_cache_invalidations_total {self.invalidations}"
+        yield "# HELP event_cache_size Events currently cached."
+        yield "# TYPE event_cache_size gauge"
+        yield f"event_cache_size {len(self._items)}"
+
+
+event_cache = EventCache(settings.event_cache_size, settings.event_cache_ttl_seconds)
+
+
+class RequestScopeMiddleware:
+    """Give each HTTP request its own event memo so repeated lookups skip the shared cache."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _request_events.set({})
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_events.reset(token)
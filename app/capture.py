@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import hmac
+import json
+import queue
+import secrets
+import threading
+import time
+from pathlib import Path
+from typing import IO, Any, Iterator
+from urllib.parse import parse_qsl, urlencode
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.models import now_utc
+
+# Request headers that change how a request is handled; credentials are never written.
+CAPTURED_HEADERS = (b"content-type", b"accept", b"idempotency-key", b"if-match")
+# Routes whose bodies carry credentials or bulk guest data: neither body is written.
+PRIVATE_ROUTES = ("/auth/login", "/waitlist/import")
+# JSON keys whose string values are replaced by a pseudonym in request and response bodies.
+REDACTED_FIELDS = frozenset({"name", "phoneNumber", "specialRequests", "email", "password", "token", "query"})
+# Query parameters redacted the same way; `q` is a guest name or phone on /waitlist/search.
+REDACTED_PARAMS = frozenset({"q"})
+
+
+class TrafficCapture:
+    """Appends one compact JSON line per request to a log, gzip-compressed for `.gz` paths.
+
+    A record holds the start time `t`, method `m`, path `p`, query `q`, route
+    template, whether credentials were sent, the handling headers `h`, the
+    request body `b`, status `s`, the JSON response `r` and duration `ms`.
+    Bodies over `capture_max_body_bytes`, bodies that aren't JSON and bodies
+    of `PRIVATE_ROUTES` are dropped and the record marked `trunc`. Values of
+    `REDACTED_FIELDS` become a keyed hash, the same for equal values within
+    one log, so a replay still sees duplicates and repeats. `REDACTED_PARAMS`
+    in the query string are pseudonymised the same way.
+
+    Records are queued and written by a background thread, off the event loop.
+    """
+
+    def __init__(self) -> None:
+        self._queue: queue.SimpleQueue[tuple[dict, bytes, bytes | None] | None] | None = None
+        self._thread: threading.Thread | None = None
+        self._key = b""
+        self.records = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._queue is not None
+
+    def start(self, path: str | Path) -> None:
+        self.stop()
+        path = Path(path)
+        file = gzip.open(path, "at") if path.suffix == ".gz" else path.open("a")
+        self._key = secrets.token_bytes(16)
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, args=(file, self._queue), name="traffic-capture", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Write out every queued record and close the log."""
+        records, thread = self._queue, self._thread
+        self._queue = self._thread = None
+        if records is not None and thread is not None:
+            records.put(None)
+            thread.join()
+
+    def write(self, record: dict, body: bytes = b"", response: bytes | None = None) -> None:
+        records = self._queue
+        if records is not None:
+            records.put((record, body, response))
+
+    def _run(self, file: IO[str], records: queue.SimpleQueue) -> None:
+        with file:
+            while (item := records.get()) is not None:
+                file.write(json.dumps(self._finish(*item), separators=(",", ":")) + "\n")
+                self.records += 1
+                if records.empty():
+                    file.flush()
+
+    def _finish(self, record: dict, body: bytes, response: bytes | None) -> dict:
+        if record["p"].endswith(PRIVATE_ROUTES):
+            record["trunc"] = True
+            return record
+        if record["q"]:
+            record["q"] = urlencode(
+                [(k, self._pseudonym(v) if k in REDACTED_PARAMS else v) for k, v in parse_qsl(record["q"], keep_blank_values=True)]
+            )
+        if body:
+            text = self._redacted(body)
+            if text is None:
+                record["trunc"] = True
+            else:
+                record["b"] = text
+        text = self._redacted(response) if response else None
+        if text:
+            record["r"] = text
+        return record
+
+    def _redacted(self, body: bytes) -> str | None:
+        if len(body) > settings.capture_max_body_bytes:
+            return None
+        try:
+            value = json.loads(body)
+        except ValueError:
+            return None
+        return json.dumps(self._redact(value), separators=(",", ":"))
+
+    def _redact(self, value: Any) -> Any:
+        if isinstance(value, dict):
+            return {
+                k: self._pseudonym(v) if k in REDACTED_FIELDS and isinstance(v, str) else self._redact(v)
+                for k, v in value.items()
+            }
+        if isinstance(value, list):
+            return [self._redact(v) for v in value]
+        return value
+
+    def _pseudonym(self, value: str) -> str:
+        return "redacted-" + hmac.new(self._key, value.encode(), hashlib.sha256).hexdigest()[:12]
+
+
+def read_capture(path: str | Path) -> Iterator[dict]:
+    path = Path(path)
+    with gzip.open(path, "rt") if path.suffix == ".gz" else path.open() as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+capture = TrafficCapture()
+
+
+class CaptureMiddleware:
+    def __init__(self, app: ASGIApp, recorder: TrafficCapture = capture):
+        self.app = app
+        self.recorder = recorder
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.recorder.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        request_chunks: list[bytes] = []
+        response_chunks: list[bytes] = []
+        status = 500
+        json_response = False
+
+        async def capture_receive() -> Message:
+            message = await receive()
+            if message["type"] == "http.request":
+                request_chunks.append(message.get("body", b""))
+            return message
+
+        async def capture_send(message: Message) -> None:
+            nonlocal status, json_response
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = dict(message.get("headers", []))
+                json_response = headers.get(b"content-type", b"").startswith(b"application/json")
+            elif message["type"] == "http.response.body" and json_response:
+                response_chunks.append(message.get("body", b""))
+            await send(message)
+
+        headers = dict(scope["headers"])
+        started_at = now_utc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, capture_receive, capture_send)
+        finally:
+            record = {
+                "t": started_at.isoformat(),
+                "m": scope["method"],
+                "p": scope["path"],
+                "q": scope.get("query_string", b"").decode(),
+                "route": getattr(scope.get("route"), "path", None),
+                "auth": b"authorization" in headers or b"x-api-key" in headers,
+                "h": {k.decode(): headers[k].decode() for k in CAPTURED_HEADERS if k in headers},
+                "s": status,
+                "ms": round((time.perf_counter() - started) * 1000, 3),
+            }
+            self.recorder.write(record, b"".join(request_chunks), b"".join(response_chunks) if json_response else None)
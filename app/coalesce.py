@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import threading
+import time
+from functools import wraps
+from typing import Any, Callable, Iterable, TypeVar
+
+from app.config import settings
+from app.store import store
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "finished_at")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+        self.finished_at: float | None = None
+
+
+class SingleFlight:
+    """Share one computation between concurrent callers asking for the same key.
+
+    A finished result keeps being served for `window_seconds`; callers key on
+    the event's revision, so any write makes the next caller compute afresh.
+    """
+
+    def __init__(self, window_seconds: float):
+        self.window_seconds = window_seconds
+        self._calls: dict[tuple, _Call] = {}
+        self._lock = threading.Lock()
+        self.requests: dict[str, int] = {}
+        self.executions: dict[str, int] = {}
+
+    def _fresh(self, call: _Call, now: float) -> bool:
+        return call.finished_at is None or now - call.finished_at < self.window_seconds
+
+    def do(self, name: str, key: tuple, fn: Callable[[], Any]) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            self.requests[name] = self.requests.get(name, 0) + 1
+            call = self._calls.get((name, key))
+            owner = call is None or not self._fresh(call, now)
+            if owner:
+                call = self._calls[(name, key)] = _Call()
+                self.executions[name] = self.executions.get(name, 0) + 1
+                if len(self._calls) > settings.coalesce_max_keys:
+                    self._prune(now)
+
+        if not owner:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            call.finished_at = time.monotonic()
+            call.done.set()
+        return call.result
+
+    def _prune(self, now: float) -> None:
+        for key in [k for k, c in self._calls.items() if not self._fresh(c, now)]:
+            del self._calls[key]
+
+    def metric_lines(self) -> Iterable[str]:
+        yield "# HELP coalesced_requests_total Calls to a coalesced read, including ones served by another caller's result."
+        yield "# TYPE coalesced_requests_total counter"
+        for name, count in sorted(self.requests.items()):
+            yield f'coalesced_requests_total{{function="{name}"}} {count}'
+        yield "# HELP coalesced_executions_total Coalesced reads that actually ran."
+        yield "# TYPE coalesced_executions_total counter"
+        for name, count in sorted(self.executions.items()):
+            yield f'coalesced_executions_total{{function="{name}"}} {count}'
+        yield "# HELP coalesced_collapse_ratio Requests per execution of a coalesced read."
+        yield "# TYPE coalesced_collapse_ratio gauge"
+        for name, count in sorted(self.requests.items()):
+            yield f'coalesced_collapse_ratio{{function="{name}"}} {count / max(1, self.executions.get(name, 0)):.3f}'
+
+
+single_flight = SingleFlight(settings.coalesce_window_ms / 1000)
+
+
+def coalesced(name: str | None = None) -> Callable[[F], F]:
+    """Coalesce concurrent calls of `fn(event_id)` for the same event revision."""
+
+    def decorate(fn: F) -> F:
+        label = name or fn.__name__
+
+        @wraps(fn)
+        def wrapper(event_id: str):
+            key = (event_id, store.revisions.get(event_id, 0))
+            return single_flight.do(label, key, lambda: fn(event_id))
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorate
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import os
+import tempfile
 
 
 def _split_csv(value: str) -> list[str]:
@@ -11,6 +12,65 @@ class Settings:
     app_name: str = os.getenv("APP_NAME", "Waitlist Management API")
     app_version: str = os.getenv("APP_VERSION", "1.0.0")
     allow_origins: list[str] = _split_csv(os.getenv("CORS_ALLOW_ORIGINS", "http://localhost:3000,http://127.0.0.1:3000,http://localhost:5173,http://127.0.0.1:5173"))
+    # Requests carrying `x-profile: <PROFILE_TOKEN>` are profiled; an empty token disables the header trigger.
+    profile_token: str = os.getenv("PROFILE_TOKEN", "")
+    profile_sample_rate: float = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+    profile_buffer_size: int = int(os.getenv("PROFILE_BUFFER_SIZE", "50"))
+    # Fraction of requests traced; `x-trace: 1` on an authenticated request forces a trace. TRACE_FILE adds a JSON-lines exporter.
+    trace_sample_rate: float = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+    trace_buffer_size: int = int(os.getenv("TRACE_BUFFER_SIZE", "200"))
+    trace_file: str = os.getenv("TRACE_FILE", "")
+    # Process-wide Event cache in front of the store.
+    event_cache_size: int = int(os.getenv("EVENT_CACHE_SIZE", "1024"))
+    event_cache_ttl_seconds: float = float(os.getenv("EVENT_CACHE_TTL_SECONDS", "30"))
+    # Stored responses for retried requests carrying an Idempotency-Key.
+    idempotency_cache_size: int = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+    idempotency_ttl_seconds: float = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+    # Concurrent identical reads share one computation; results are reused for this window.
+    coalesce_window_ms: float = float(os.getenv("COALESCE_WINDOW_MS", "50"))
+    coalesce_max_keys: int = int(os.getenv("COALESCE_MAX_KEYS", "4096"))
+    # Responses at least this large are gzip-compressed for clients that accept it.
+    gzip_min_size: int = int(os.getenv("GZIP_MIN_SIZE", "1024"))
+    # Events are archived this long after endTime; archived records are written compressed
+    # under ARCHIVE_DIR (kept in memory only if it is set to an empty string) and rehydrated on access.
+    archive_grace_seconds: float = float(os.getenv("ARCHIVE_GRACE_SECONDS", "3600"))
+    archive_sweep_interval_seconds: float = float(os.getenv("ARCHIVE_SWEEP_INTERVAL_SECONDS", "30"))
+    archive_batch_size: int = int(os.getenv("ARCHIVE_BATCH_SIZE", "50"))
+    archive_idle_seconds: float = float(os.getenv("ARCHIVE_IDLE_SECONDS", "300"))
+    archive_dir: str = os.getenv("ARCHIVE_DIR", os.path.join(tempfile.gettempdir(), "waitlist-archive"))
+    # PRIORITY promotion: reservations count as due this much before their booked time;
+    # each extra guest in a party delays it by this much.
+    priority_reservation_bonus_minutes: float = float(os.getenv("PRIORITY_RESERVATION_BONUS_MINUTES", "15"))
+    priority_party_size_minutes: float = float(os.getenv("PRIORITY_PARTY_SIZE_MINUTES", "1"))
+    # A guest joining with a reservationTime may arrive this early or this late for it.
+    reservation_join_early_minutes: float = float(os.getenv("RESERVATION_JOIN_EARLY_MINUTES", "120"))
+    reservation_join_late_minutes: float = float(os.getenv("RESERVATION_JOIN_LATE_MINUTES", "30"))
+    # Notification outbox: drained every poll interval by batched sends per provider,
+    # with up to NOTIFICATION_CONCURRENCY batches in flight and exponential retry backoff.
+    notification_poll_seconds: float = float(os.getenv("NOTIFICATION_POLL_SECONDS", "0.2"))
+    notification_drain_limit: int = int(os.getenv("NOTIFICATION_DRAIN_LIMIT", "1000"))
+    notification_batch_size: int = int(os.getenv("NOTIFICATION_BATCH_SIZE", "50"))
+    notification_concurrency: int = int(os.getenv("NOTIFICATION_CONCURRENCY", "4"))
+    notification_max_attempts: int = int(os.getenv("NOTIFICATION_MAX_ATTEMPTS", "5"))
+    notification_backoff_seconds: float = float(os.getenv("NOTIFICATION_BACKOFF_SECONDS", "1"))
+    notification_backoff_max_seconds: float = float(os.getenv("NOTIFICATION_BACKOFF_MAX_SECONDS", "60"))
+    notification_outbox_size: int = int(os.getenv("NOTIFICATION_OUTBOX_SIZE", "10000"))
+    # Traffic capture for offline replay (benchmarks/replay.py): requests are appended to
+    # CAPTURE_FILE as JSON lines (gzip when it ends in .gz); bodies above the limit are not kept,
+    # and guest details and credentials are redacted (see app/capture.py).
+    capture_file: str = os.getenv("CAPTURE_FILE", "")
+    capture_max_body_bytes: int = int(os.getenv("CAPTURE_MAX_BODY_BYTES", "65536"))
+    # Staff activity feed: the last ACTIVITY_LOG_SIZE transitions per event, and queue length,
+    # occupancy and predicted wait kept per TIMESERIES_RESOLUTION_SECONDS for TIMESERIES_SLOTS buckets.
+    activity_log_size: int = int(os.getenv("ACTIVITY_LOG_SIZE", "500"))
+    timeseries_resolution_seconds: int = int(os.getenv("TIMESERIES_RESOLUTION_SECONDS", "60"))
+    timeseries_slots: int = int(os.getenv("TIMESERIES_SLOTS", "1440"))
+    # Monte Carlo ETA engine: rollouts per estimate and the per-request compute budget.
+    simulation_rollouts: int = int(os.getenv("SIMULATION_ROLLOUTS", "1000"))
+    simulation_budget_ms: float = float(os.getenv("SIMULATION_BUDGET_MS", "25"))
+    simulation_horizon: int = int(os.getenv("SIMULATION_HORIZON", "1000"))
+    # Joins are quoted from the last simulation only while it is this young and the queue is unchanged.
+    simulation_quote_max_age_seconds: int = int(os.getenv("SIMULATION_QUOTE_MAX_AGE_SECONDS", "30"))
 
 
 settings = Settings()
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import json
+import types
+from datetime import datetime
+from enum import Enum
+from functools import lru_cache
+from typing import Any, Callable, Union, get_args, get_origin
+
+import msgpack
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+from app.errors import ApiError
+from app.models import EntryStatus, EntryType, EventType
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+MSGPACK_TYPES = (MSGPACK, "application/x-msgpack")
+# Enums sent as integer codes in binary responses, by position in the enum.
+WIRE_ENUMS: tuple[type[Enum], ...] = (EntryStatus, EntryType, EventType)
+
+Converter = Callable[[Any], Any]
+# Encoders cached per (model, format, field set); field sets come from clients, so the caches are bounded.
+ENCODER_CACHE_SIZE = 256
+
+
+def wants_msgpack(request: Request) -> bool:
+    accept = request.headers.get("accept", "")
+    return any(media in accept for media in MSGPACK_TYPES)
+
+
+def enum_codes() -> dict[str, list[str]]:
+    return {enum.__name__: [member.value for member in enum] for enum in WIRE_ENUMS}
+
+
+@lru_cache(maxsize=1024)
+def parse_fields(model: type[BaseModel], raw: str | None, hidden: tuple[str, ...] = ()) -> tuple[str, ...] | None:
+    """Validate a `fields=a,b,c` projection against the model; None selects every field.
+
+    `hidden` fields can't be requested and are left out of the default projection.
+    """
+    allowed = [name for name in model.model_fields if name not in hidden]
+    if not raw:
+        return tuple(allowed) if hidden else None
+    requested = dict.fromkeys(part.strip() for part in raw.split(",") if part.strip())
+    unknown = [name for name in requested if name not in allowed]
+    if unknown or not requested:
+        raise ApiError(400, "INVALID_INPUT", "Unknown fields requested", {"unknownFields": unknown, "allowed": allowed})
+    # Model order, so every ordering of the same set shares one cached encoder.
+    return tuple(name for name in allowed if name in requested)
+
+
+def _datetime_converter(binary: bool) -> Converter:
+    if binary:
+        return lambda value: int(value.timestamp() * 1000)
+    return lambda value: value.isoformat().replace("+00:00", "Z")
+
+
+def _enum_converter(enum: type[Enum], binary: bool) -> Converter:
+    # Keyed by member; str enums also hash equal to their raw value (use_enum_values models).
+    mapping = {member: (i if binary else member.value) for i, member in enumerate(enum)}
+    return mapping.__getitem__
+
+
+def _converter(annotation: Any, binary: bool) -> Converter | None:
+    """Build a converter for one annotated field; None means the value is already wire-ready."""
+    origin = get_origin(annotation)
+    if origin in (Union, types.UnionType):
+        args = [a for a in get_args(annotation) if a is not type(None)]
+        inner = _converter(args[0], binary) if len(args) == 1 else _encode_value_fn(binary)
+        if inner is None:
+            return None
+        return lambda value: None if value is None else inner(value)
+    if origin is list:
+        inner = _converter(get_args(annotation)[0], binary)
+        if inner is None:
+            return None
+        return lambda values: [inner(v) for v in values]
+    if origin is dict or annotation is Any:
+        return _encode_value_fn(binary)
+    if isinstance(annotation, type):
+        if issubclass(annotation, Enum):
+            return _enum_converter(annotation, binary)
+        if issubclass(annotation, datetime):
+            return _datetime_converter(binary)
+        if issubclass(annotation, BaseModel):
+            return model_encoder(annotation, binary)
+    return None
+
+
+def _encode_value_fn(binary: bool) -> Converter:
+    return lambda value: encode_value(value, binary)
+
+
+@lru_cache(maxsize=ENCODER_CACHE_SIZE)
+def _field_converters(model: type[BaseModel], binary: bool, fields: tuple[str, ...] | None) -> tuple[tuple[str, Converter | None], ...]:
+    names = fields if fields is not None else tuple(model.model_fields)
+    return tuple((name, _converter(model.model_fields[name].annotation, binary)) for name in names)
+
+
+@lru_cache(maxsize=ENCODER_CACHE_SIZE)
+def model_encoder(model: type[BaseModel], binary: bool, fields: tuple[str, ...] | None = None) -> Callable[[BaseModel], dict]:
+    """Pre-built `obj -> dict` encoder for a model, instead of `model_dump` per object."""
+    converters = _field_converters(model, binary, fields)
+
+    def encode(obj: BaseModel) -> dict:
+        return {name: getattr(obj, name) if conv is None else conv(getattr(obj, name)) for name, conv in converters}
+
+    return encode
+
+
+@lru_cache(maxsize=ENCODER_CACHE_SIZE)
+def row_encoder(model: type[BaseModel], binary: bool, fields: tuple[str, ...] | None = None) -> Callable[[BaseModel], list]:
+    """Like `model_encoder` but emits values only, in the order of `columns`."""
+    converters = _field_converters(model, binary, fields)
+
+    def encode(obj: BaseModel) -> list:
+        return [getattr(obj, name) if conv is None else conv(getattr(obj, name)) for name, conv in converters]
+
+    return encode
+
+
+def encode_value(value: Any, binary: bool) -> Any:
+    """Generic fallback for payloads that aren't a single model type."""
+    if isinstance(value, BaseModel):
+        return model_encoder(type(value), binary)(value)
+    if isinstance(value, Enum):
+        return _enum_converter(type(value), binary)(value)
+    if isinstance(value, datetime):
+        return _datetime_converter(binary)(value)
+    if isinstance(value, dict):
+        return {k: encode_value(v, binary) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [encode_value(v, binary) for v in value]
+    return value
+
+
+def render(request: Request, payload: Any, fields: tuple[str, ...] | None = None) -> Response:
+    """Serialize `payload` as MessagePack if the client accepts it, JSON otherwise.
+
+    `fields` projects a single-model payload to those attributes (see `parse_fields`).
+    """
+    binary = wants_msgpack(request)
+    content = model_encoder(type(payload), binary, fields)(payload) if fields else encode_value(payload, binary)
+    if binary:
+        return Response(msgpack.packb(content, use_bin_type=True), media_type=MSGPACK, headers={"Vary": "Accept"})
+    return Response(_dumps(content), media_type=JSON, headers={"Vary": "Accept"})
+
+
+def render_page(request: Request, page: dict, model: type[BaseModel], fields: tuple[str, ...] | None = None) -> Response:
+    """Serialize a `{"data": [...], ...}` page; MessagePack pages use a columnar layout."""
+    rows = page["data"]
+    meta = {k: v for k, v in page.items() if k != "data"}
+    if wants_msgpack(request):
+        encode = row_encoder(model, True, fields)
+        columns = list(fields or model.model_fields)
+        body = msgpack.packb({**meta, "columns": columns, "rows": [encode(r) for r in rows]}, use_bin_type=True)
+        return Response(body, media_type=MSGPACK, headers={"Vary": "Accept"})
+    encode = model_encoder(model, False, fields)
+    return Response(_dumps({**meta, "data": [encode(r) for r in rows]}), media_type=JSON, headers={"Vary": "Accept"})
+
+
+def _dumps(content: Any) -> bytes:
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
@@ -1,7 +1,10 @@
 from __future__ import annotations
 
+from uuid import uuid4
+
 from fastapi import Request
 from fastapi.responses import JSONResponse
+from starlette.types import Scope
 
 from app.models import ErrorResponse
 
@@ -23,3 +26,17 @@ async def api_error_handler(request: Request, exc: ApiError) -> JSONResponse:
         requestId=request.headers.get("x-request-id", "req-local"),
     )
     return JSONResponse(status_code=exc.status_code, content=payload.model_dump(mode="json"))
+
+
+def ensure_request_id(scope: Scope) -> str:
+    """Return the request's `x-request-id`, assigning one if the client sent none.
+
+    The generated id is written back into the scope headers so
+    `api_error_handler` and downstream middleware report the same value.
+    """
+    for name, value in scope["headers"]:
+        if name == b"x-request-id":
+            return value.decode("latin-1")
+    request_id = f"req-{uuid4().hex}"
+    scope["headers"] = [*scope["headers"], (b"x-request-id", request_id.encode("latin-1"))]
+    return request_id
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import csv
+import io
+import json
+from typing import Iterator
+
+from app.models import CONTACT_FIELDS, WaitlistEntry
+from app.services import get_event
+from app.store import store
+
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+EXPORT_COLUMNS = [name for name in WaitlistEntry.model_fields if name not in CONTACT_FIELDS]
+# CSV has scalar columns only: notification preferences become the `sms`/`push`
+# columns the CSV import reads, and table ids are joined with ";".
+CSV_COLUMNS = [c for name in EXPORT_COLUMNS for c in (("sms", "push") if name == "notificationPreferences" else (name,))]
+# Rows are buffered into chunks of this many entries per write to the socket.
+CHUNK_ROWS = 500
+
+
+def _ndjson_row(entry: WaitlistEntry) -> str:
+    return json.dumps(entry.model_dump(mode="json", exclude=set(CONTACT_FIELDS)), separators=(",", ":")) + "\n"
+
+
+def _csv_writer() -> tuple[io.StringIO, csv.DictWriter]:
+    buffer = io.StringIO()
+    return buffer, csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, lineterminator="\n")
+
+
+def _csv_scalar(value: object) -> object:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, list):
+        return ";".join(str(v) for v in value)
+    return value
+
+
+def _csv_record(entry: WaitlistEntry) -> dict:
+    record = entry.model_dump(mode="json", exclude=set(CONTACT_FIELDS))
+    record.update(record.pop("notificationPreferences"))
+    return {column: _csv_scalar(value) for column, value in record.items()}
+
+
+def export_waitlist(event_id: str, fmt: str) -> Iterator[str]:
+    """Stream every entry of an event as NDJSON or CSV from a consistent snapshot.
+
+    The event is validated eagerly so a missing event still produces a 404;
+    the returned generator holds the snapshot open until it is exhausted or
+    closed, and only ever buffers one chunk of rows.
+    """
+    get_event(event_id)
+    if fmt == "csv":
+        buffer, writer = _csv_writer()
+
+        def render(entry: WaitlistEntry) -> str:
+            writer.writerow(_csv_record(entry))
+            row = buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            return row
+
+        header = ",".join(CSV_COLUMNS) + "\n"
+    else:
+        render = _ndjson_row
+        header = ""
+
+    def generate() -> Iterator[str]:
+        with store.snapshot(event_id) as snap:
+            chunk: list[str] = [header] if header else []
+            for row in store.iter_snapshot(event_id, snap, render):
+                chunk.append(row)
+                if len(chunk) >= CHUNK_ROWS:
+                    yield "".join(chunk)
+                    chunk.clear()
+            if chunk:
+                yield "".join(chunk)
+
+    return generate()
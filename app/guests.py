@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import re
+import threading
+from bisect import bisect_left, insort
+
+from app.models import EntryStatus, WaitlistEntry
+
+ACTIVE = {EntryStatus.QUEUED, EntryStatus.NOTIFIED}
+# Queries with at least this many digits and no letters search phone numbers.
+MIN_PHONE_QUERY = 3
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_name(name: str) -> str:
+    return _SPACES.sub(" ", name).strip().casefold()
+
+
+def normalize_phone(phone: str) -> str:
+    return "".join(c for c in phone if c.isdigit())
+
+
+def _prefixed(index: list[tuple[str, str]], prefix: str):
+    i = bisect_left(index, (prefix,))
+    while i < len(index) and index[i][0].startswith(prefix):
+        yield index[i][1]
+        i += 1
+
+
+class GuestIndex:
+    """Lookups over one event's waitlist by entry id, normalised name and phone digits.
+
+    Names are kept in a sorted (key, entry id) list holding the full name and
+    each of its words, and phones in another, so a prefix search is a
+    bisection followed by a scan of the matches. Active names map straight
+    to their entry for O(1) duplicate checks.
+
+    The index belongs to one waitlist list; `guests_for` rebuilds it when the
+    store replaces that list and indexes entries appended to it directly.
+    """
+
+    def __init__(self, entries: list[WaitlistEntry]):
+        self.entries = entries
+        self.by_id: dict[str, WaitlistEntry] = {}
+        self.active: dict[str, WaitlistEntry] = {}
+        self.names: list[tuple[str, str]] = []
+        self.phones: list[tuple[str, str]] = []
+        self.lock = threading.Lock()
+        for entry in entries:
+            self._index(entry, list.append)
+        self.names.sort()
+        self.phones.sort()
+
+    def add(self, entry: WaitlistEntry) -> None:
+        self._index(entry, insort)
+
+    def catch_up(self) -> None:
+        """Index entries appended to the waitlist without going through `add` (seed data, fixtures)."""
+        with self.lock:
+            for entry in self.entries:
+                if entry.id not in self.by_id:
+                    self.add(entry)
+
+    def _index(self, entry: WaitlistEntry, put) -> None:
+        self.by_id[entry.id] = entry
+        name = normalize_name(entry.name)
+        if entry.status in ACTIVE:
+            self.active[name] = entry
+        for key in {name, *name.split(" ")}:
+            put(self.names, (key, entry.id))
+        if entry.phoneNumber:
+            put(self.phones, (normalize_phone(entry.phoneNumber), entry.id))
+
+    def active_entry(self, name: str) -> WaitlistEntry | None:
+        """The queued or notified entry with this name, if any."""
+        entry = self.active.get(normalize_name(name))
+        return entry if entry is not None and entry.status in ACTIVE else None
+
+    def search(self, query: str, limit: int) -> list[WaitlistEntry]:
+        digits = normalize_phone(query)
+        if len(digits) >= MIN_PHONE_QUERY and not any(c.isalpha() for c in query):
+            ids = _prefixed(self.phones, digits)
+        else:
+            ids = _prefixed(self.names, normalize_name(query))
+        found: dict[str, WaitlistEntry] = {}
+        for entry_id in ids:
+            if entry_id not in found:
+                found[entry_id] = self.by_id[entry_id]
+                if len(found) >= limit:
+                    break
+        return list(found.values())
+
+
+_indexes: dict[str, GuestIndex] = {}
+_lock = threading.Lock()
+
+
+def guests_for(event_id: str, entries: list[WaitlistEntry]) -> GuestIndex:
+    index = _indexes.get(event_id)
+    if index is None or index.entries is not entries:
+        with _lock:
+            index = _indexes.get(event_id)
+            if index is None or index.entries is not entries:
+                index = _indexes[event_id] = GuestIndex(entries)
+    if len(index.by_id) < len(entries):
+        index.catch_up()
+    return index
+
+
+def forget(event_id: str) -> None:
+    _indexes.pop(event_id, None)
@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Iterable
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.errors import ensure_request_id
+from app.models import ErrorResponse
+
+IDEMPOTENT_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+# Per-request headers that must not be replayed from the original response.
+VOLATILE_HEADERS = {b"content-length", b"x-request-id", b"x-profile-id", b"x-trace-id"}
+# Responses larger than this are not stored; a retry simply runs again.
+MAX_STORED_BODY = 1 << 20
+
+
+@dataclass(eq=False)
+class StoredResponse:
+    fingerprint: str
+    expires_at: float
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+    status: int | None = None
+    headers: list[tuple[bytes, bytes]] = field(default_factory=list)
+    body: bytes = b""
+
+
+class IdempotencyCache:
+    """Bounded, TTL-evicted map of (key, route, principal) to the first response."""
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._items: OrderedDict[tuple[str, str, str, str], StoredResponse] = OrderedDict()
+        self.replays = 0
+
+    def get(self, key: tuple[str, str, str, str]) -> StoredResponse | None:
+        record = self._items.get(key)
+        if record is None:
+            return None
+        if record.expires_at <= time.monotonic() and record.done.is_set():
+            del self._items[key]
+            return None
+        return record
+
+    def start(self, key: tuple[str, str, str, str], fingerprint: str) -> StoredResponse:
+        record = StoredResponse(fingerprint, time.monotonic() + self.ttl_seconds)
+        self._items[key] = record
+        while len(self._items) > self.max_size:
+            oldest_key, oldest = next(iter(self._items.items()))
+            if not oldest.done.is_set():
+                break
+            del self._items[oldest_key]
+        return record
+
+    def discard(self, key: tuple[str, str, str, str], record: StoredResponse) -> None:
+        if self._items.get(key) is record:
+            del self._items[key]
+
+    def metric_lines(self) -> Iterable[str]:
+        yield "# HELP idempotent_replays_total Retried requests answered from a stored response."
+        yield "# TYPE idempotent_replays_total counter"
+        yield f"idempotent_replays_total {self.replays}"
+        yield "# HELP idempotency_keys Idempotency keys currently stored."
+        yield "# TYPE idempotency_keys gauge"
+        yield f"idempotency_keys {len(self._items)}"
+
+
+idempotency_cache = IdempotencyCache(settings.idempotency_cache_size, settings.idempotency_ttl_seconds)
+
+
+def _header(scope: Scope, name: bytes) -> str | None:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def principal(scope: Scope) -> str:
+    """Stable, non-reversible identity of the caller's credentials."""
+    credentials = f"{_header(scope, b'authorization') or ''}|{_header(scope, b'x-api-key') or ''}"
+    return hashlib.sha256(credentials.encode()).hexdigest()
+
+
+async def _read_body(receive: Receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+async def _send_error(scope: Scope, send: Send, status: int, code: str, message: str) -> None:
+    payload = ErrorResponse(code=code, message=message, requestId=ensure_request_id(scope)).model_dump(mode="json")
+    body = json.dumps(payload).encode()
+    await send({"type": "http.response.start", "status": status, "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _replay(record: StoredResponse, send: Send) -> None:
+    headers = [*record.headers, (b"content-length", str(len(record.body)).encode()), (b"idempotent-replayed", b"true")]
+    await send({"type": "http.response.start", "status": record.status, "headers": headers})
+    await send({"type": "http.response.body", "body": record.body})
+
+
+class IdempotencyMiddleware:
+    """Replay the stored response for retried mutating requests that reuse an `Idempotency-Key`.
+
+    A retry with the same key, path and credentials gets the first response
+    back without the endpoint running again; a concurrent duplicate waits for
+    the original to finish. Reusing a key with a different body is rejected.
+    Server errors are not stored, so the next retry runs normally.
+    """
+
+    def __init__(self, app: ASGIApp, cache: IdempotencyCache = idempotency_cache):
+        self.app = app
+        self.cache = cache
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        key_header = _header(scope, b"idempotency-key") if scope["type"] == "http" else None
+        if not key_header or scope["method"] not in IDEMPOTENT_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        body = await _read_body(receive)
+        fingerprint = hashlib.sha256(body).hexdigest()
+        key = (key_header, scope["method"], scope["path"], principal(scope))
+
+        while (record := self.cache.get(key)) is not None:
+            if record.fingerprint != fingerprint:
+                await _send_error(scope, send, 422, "IDEMPOTENCY_KEY_REUSED", "Idempotency-Key was already used with a different request body")
+                return
+            await record.done.wait()
+            if record.status is not None:
+                self.cache.replays += 1
+                await _replay(record, send)
+                return
+            # The original failed and was discarded; the loop re-checks in case another retry took over.
+
+        record = self.cache.start(key, fingerprint)
+        body_sent = False
+
+        async def replay_receive() -> Message:
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        status = 500
+        headers: list[tuple[bytes, bytes]] = []
+        chunks: list[bytes] = []
+        size = 0
+
+        async def capture(message: Message) -> None:
+            nonlocal status, headers, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = [(k, v) for k, v in message.get("headers", []) if k.lower() not in VOLATILE_HEADERS]
+            elif message["type"] == "http.response.body":
+                chunk = message.get("body", b"")
+                size += len(chunk)
+                if size <= MAX_STORED_BODY:
+                    chunks.append(chunk)
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, capture)
+        finally:
+            if status < 500 and size <= MAX_STORED_BODY:
+                record.status, record.headers, record.body = status, headers, b"".join(chunks)
+            else:
+                self.cache.discard(key, record)
+            record.done.set()
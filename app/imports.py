@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import csv
+from typing import AsyncIterator
+
+from pydantic import TypeAdapter, ValidationError
+
+from app.models import WaitlistCreate
+from app.services import WaitlistImporter
+
+# Built once: validating through a shared adapter avoids rebuilding the
+# validator for every streamed record.
+waitlist_create_adapter = TypeAdapter(WaitlistCreate)
+
+CSV_CONTENT_TYPES = ("text/csv", "application/csv")
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, bytes]]:
+    """Yield (line number, raw line) for each non-blank line of a streamed body."""
+    buffer = b""
+    line_no = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for raw in lines:
+            line_no += 1
+            raw = raw.strip()
+            if raw:
+                yield line_no, raw.removeprefix(b"\xef\xbb\xbf") if line_no == 1 else raw
+    if buffer.strip():
+        line_no += 1
+        yield line_no, buffer.strip().removeprefix(b"\xef\xbb\xbf") if line_no == 1 else buffer.strip()
+
+
+def _validation_details(exc: ValidationError) -> list[dict]:
+    return [{"loc": ".".join(str(p) for p in err["loc"]), "msg": err["msg"]} for err in exc.errors()]
+
+
+def _csv_record(header: list[str], values: list[str]) -> dict:
+    record: dict = {}
+    for column, value in zip(header, values):
+        if value == "":
+            continue
+        if column in {"sms", "push"}:
+            record.setdefault("notificationPreferences", {})[column] = value
+        else:
+            record[column] = value
+    return record
+
+
+async def import_waitlist_stream(event_id: str, chunks: AsyncIterator[bytes], content_type: str | None) -> dict:
+    """Import NDJSON (default) or CSV waitlist records from a streamed request body.
+
+    CSV bodies need a header row naming `WaitlistCreate` fields (`sms`/`push`
+    columns map to notification preferences); each record must fit on one line.
+    Invalid or duplicate lines are reported and skipped, the rest are imported.
+    """
+    importer = WaitlistImporter(event_id)
+    is_csv = (content_type or "").split(";")[0].strip().lower() in CSV_CONTENT_TYPES
+    header: list[str] | None = None
+
+    async for line_no, raw in iter_lines(chunks):
+        try:
+            if is_csv:
+                values = next(csv.reader([raw.decode("utf-8")]))
+                if header is None:
+                    header = [column.strip() for column in values]
+                    continue
+                payload = waitlist_create_adapter.validate_python(_csv_record(header, values))
+            else:
+                payload = waitlist_create_adapter.validate_json(raw)
+        except ValidationError as exc:
+            importer.reject(line_no, "INVALID_INPUT", "Record failed validation", _validation_details(exc))
+            continue
+        except (csv.Error, UnicodeDecodeError) as exc:
+            importer.reject(line_no, "INVALID_INPUT", f"Malformed record: {exc}")
+            continue
+        importer.add(line_no, payload)
+
+    return importer.result()
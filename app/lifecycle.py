@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import asyncio
+import gzip
+import hashlib
+import heapq
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterable
+
+from app import activity, guests, queues, simulation, slots, tables
+from app.analytics import archive_history
+from app.cache import event_cache
+from app.config import settings
+from app.models import Event, Reservation, WaitlistEntry, now_utc
+from app.store import store
+from app.versioning import exclusive
+
+logger = logging.getLogger(__name__)
+
+
+class ColdStore:
+    """Compressed archived events as `<sha256(id)>.json.gz` files in `directory`; in memory without one."""
+
+    def __init__(self, directory: str = ""):
+        self.directory = Path(directory) if directory else None
+        self._blobs: dict[str, bytes] = {}
+
+    def _path(self, event_id: str) -> Path:
+        # Hashing keeps ids taken from request paths from ever naming another file.
+        return self.directory / f"{hashlib.sha256(event_id.encode()).hexdigest()}.json.gz"
+
+    def put(self, event_id: str, record: dict) -> None:
+        blob = gzip.compress(json.dumps(record, separators=(",", ":")).encode())
+        if self.directory is None:
+            self._blobs[event_id] = blob
+        else:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._path(event_id).write_bytes(blob)
+
+    def get(self, event_id: str) -> dict | None:
+        if self.directory is None:
+            blob = self._blobs.get(event_id)
+        else:
+            path = self._path(event_id)
+            blob = path.read_bytes() if path.exists() else None
+        return None if blob is None else json.loads(gzip.decompress(blob))
+
+    def size_bytes(self) -> int:
+        return sum(len(b) for b in self._blobs.values())
+
+
+class EventLifecycle:
+    """Moves finished events out of the hot store.
+
+    Events are scheduled when created and archived `archive_grace_seconds`
+    after their `endTime`: the record and waitlist are written to the cold
+    store, the entries are folded into the venue's analytics history, and
+    every in-memory index of the event is dropped. Reading an archived event
+    rehydrates it read-only; it is evicted again after `archive_idle_seconds`.
+    Each sweep handles at most `archive_batch_size` events.
+    """
+
+    def __init__(self, cold: ColdStore):
+        self.cold = cold
+        self._due: list[tuple[datetime, str]] = []
+        self._rehydrated: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.archived_total = 0
+        self.rehydrations = 0
+        self.evictions = 0
+
+    def schedule(self, event: Event) -> None:
+        with self._lock:
+            heapq.heappush(self._due, (event.endTime + timedelta(seconds=settings.archive_grace_seconds), event.id))
+
+    def archive(self, event_id: str) -> bool:
+        event = store.events.get(event_id)
+        if event is None or store.snapshots.get(event_id):
+            return False
+        entries = store.waitlists.get(event_id, [])
+        # Every writer takes one of these and re-checks `archived` under it, so
+        # nothing is written to the event between the dump and the eviction.
+        with (
+            queues.queues_for(event, entries).lock,
+            slots.slots_for(event, store.reservations.setdefault(event_id, [])).lock,
+            guests.guests_for(event_id, entries).lock,
+            exclusive(),
+        ):
+            first_time = not event.archived
+            event.archived = True
+            self.cold.put(
+                event_id,
+                {
+                    "event": event.model_dump(mode="json"),
+                    "waitlist": [e.model_dump(mode="json") for e in entries],
+                    "reservations": [r.model_dump(mode="json") for r in store.reservations.get(event_id, [])],
+                },
+            )
+            if first_time:
+                archive_history(event)
+                self.archived_total += 1
+            self._evict(event_id)
+        return True
+
+    def _evict(self, event_id: str) -> None:
+        store.events.pop(event_id, None)
+        store.waitlists.pop(event_id, None)
+        store.reservations.pop(event_id, None)
+        store.revisions.pop(event_id, None)
+        event_cache.invalidate(event_id)
+        simulation.forget(event_id)
+        activity.forget(event_id)
+        queues.forget(event_id)
+        guests.forget(event_id)
+        slots.forget(event_id)
+        tables.forget(event_id)
+        self._rehydrated.pop(event_id, None)
+
+    def rehydrate(self, event_id: str) -> Event | None:
+        record = self.cold.get(event_id)
+        if record is None:
+            return None
+        event = Event.model_validate(record["event"])
+        store.waitlists[event_id] = [WaitlistEntry.model_validate(e) for e in record["waitlist"]]
+        store.reservations[event_id] = [Reservation.model_validate(r) for r in record.get("reservations", [])]
+        store.events[event_id] = event
+        with self._lock:
+            self._rehydrated[event_id] = time.monotonic()
+        self.rehydrations += 1
+        return event
+
+    def sweep(self, now: datetime | None = None, budget: int | None = None) -> int:
+        """Archive due events and evict idle rehydrated ones; returns how many were handled."""
+        now = now or now_utc()
+        budget = settings.archive_batch_size if budget is None else budget
+        handled = 0
+
+        idle_before = time.monotonic() - settings.archive_idle_seconds
+        for event_id in [k for k, at in list(self._rehydrated.items()) if at <= idle_before][:budget]:
+            if not store.snapshots.get(event_id):
+                self._evict(event_id)
+                self.evictions += 1
+                handled += 1
+
+        while handled < budget:
+            with self._lock:
+                if not self._due or self._due[0][0] > now:
+                    break
+                _, event_id = heapq.heappop(self._due)
+            if self.archive(event_id):
+                handled += 1
+            elif event_id in store.events:
+                # An export is still reading it; try again next sweep.
+                self.schedule(store.events[event_id])
+                break
+        return handled
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(settings.archive_sweep_interval_seconds)
+            try:
+                # Archiving compresses and writes files; keep it off the event loop.
+                await asyncio.to_thread(self.sweep)
+            except Exception:
+                logger.exception("Event archival sweep failed")
+
+    def metric_lines(self) -> Iterable[str]:
+        yield "# HELP events_archived_total Events moved to cold storage."
+        yield "# TYPE events_archived_total counter"
+        yield f"events_archived_total {self.archived_total}"
+        yield "# HELP event_rehydrations_total Archived events loaded back on access."
+        yield "# TYPE event_rehydrations_total counter"
+        yield f"event_rehydrations_total {self.rehydrations}"
+        yield "# HELP events_hot Events currently held in memory."
+        yield "# TYPE events_hot gauge"
+        yield f"events_hot {len(store.events)}"
+        yield "# HELP events_archive_pending Events scheduled for archival."
+        yield "# TYPE events_archive_pending gauge"
+        yield f"events_archive_pending {len(self._due)}"
+        if self.cold.directory is None:
+            yield "# HELP events_cold_bytes Compressed size of archived events held in memory."
+            yield "# TYPE events_cold_bytes gauge"
+            yield f"events_cold_bytes {self.cold.size_bytes()}"
+
+
+lifecycle = EventLifecycle(ColdStore(settings.archive_dir))
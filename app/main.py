@@ -1,45 +1,91 @@
 from __future__ import annotations
 
+import asyncio
 from contextlib import asynccontextmanager
+from dataclasses import asdict
+from datetime import datetime
 
-from fastapi import APIRouter, Depends, FastAPI, Query
+from fastapi import APIRouter, Depends, FastAPI, Header, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 
+from app.analytics import venue_key, venue_stats
 from app.auth import DEMO_BEARER, require_auth
-from app.bootstrap import seed_demo_data
+from app.bootstrap import SEEDED_EVENT_IDS, seed_demo_data
+from app.cache import RequestScopeMiddleware, event_cache
+from app.capture import CaptureMiddleware, capture
+from app.coalesce import single_flight
 from app.config import settings
+from app.encoding import enum_codes, parse_fields, render, render_page
 from app.errors import ApiError, api_error_handler
+from app.exports import EXPORT_FORMATS, export_waitlist
+from app.idempotency import IdempotencyMiddleware, idempotency_cache
+from app.imports import import_waitlist_stream
+from app.lifecycle import lifecycle
+from app.metrics import MetricsMiddleware, metrics, render_metrics
 from app.models import (
+    CONTACT_FIELDS,
     AuthLoginRequest,
+    BatchRequest,
     AuthLoginResponse,
     EntryStatus,
     EntryType,
+    Event,
     EventCreate,
     PromoteRequest,
+    ReservationCreate,
     SeatRequest,
     SyncRequest,
     WaitlistCreate,
+    WaitlistEntry,
 )
+from app.notifications import dispatcher, outbox
+from app.profiling import ProfiledRoute, ProfilingMiddleware, profiles
 from app.services import (
-    add_waitlist_entry,
+    cancel_reservation,
     create_event,
+    create_reservation,
+    find_available_tables,
+    get_activity,
     get_dashboard,
+    get_entry_eta,
     get_event,
+    get_queue_summary,
+    get_timeseries,
+    get_wait_distribution,
     get_waitlist_entry,
+    join_waitlist,
     list_waitlist,   
     promote,
+    run_batch,
+    search_waitlist,
     seat,
     update_user_activity,   
     calculate_heuristic_wait,    
     mark_no_show,          
+    next_available_slot,
 )
+from app.store import store
+from app.tracing import TracingMiddleware, traces
+from app.versioning import etag, parse_if_match
 
 
 
 @asynccontextmanager
 async def lifespan(_: FastAPI):
     seed_demo_data()
+    for event in list(store.events.values()):
+        if event.id not in SEEDED_EVENT_IDS:
+            lifecycle.schedule(event)
+    if settings.capture_file:
+        capture.start(settings.capture_file)
+    sweeper = asyncio.create_task(lifecycle.run())
+    notifier = asyncio.create_task(dispatcher.run())
     yield
+    sweeper.cancel()
+    notifier.cancel()
+    capture.stop()
 
 
 app = FastAPI(title=settings.app_name, version=settings.app_version, lifespan=lifespan)
@@ -51,8 +97,22 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(RequestScopeMiddleware)
+app.add_middleware(IdempotencyMiddleware)
+app.add_middleware(CaptureMiddleware)
+# Outside the idempotency layer so stored responses stay uncompressed and are re-negotiated per retry.
+app.add_middleware(GZipMiddleware, minimum_size=settings.gzip_min_size)
+app.add_middleware(TracingMiddleware)
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(MetricsMiddleware)
 
-router = APIRouter()
+metrics.register(event_cache.metric_lines)
+metrics.register(idempotency_cache.metric_lines)
+metrics.register(single_flight.metric_lines)
+metrics.register(lifecycle.metric_lines)
+metrics.register(dispatcher.metric_lines)
+
+router = APIRouter(route_class=ProfiledRoute)
 
 
 @app.get("/health")
@@ -60,56 +120,193 @@ def health() -> dict[str, str]:
     return {"status": "ok"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint() -> PlainTextResponse:
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/debug/profiles", dependencies=[Depends(require_auth)])
+def list_profiles_endpoint():
+    return {"data": profiles.summaries()}
+
+
+@app.get("/debug/profiles/{request_id}", dependencies=[Depends(require_auth)])
+def get_profile_endpoint(request_id: str):
+    record = profiles.get(request_id)
+    if record is None:
+        raise ApiError(404, "RESOURCE_NOT_FOUND", "Profile not found", {"requestId": request_id})
+    return record
+
+
+@app.get("/debug/traces", dependencies=[Depends(require_auth)])
+def list_traces_endpoint():
+    return {"data": traces.summaries()}
+
+
+@app.get("/debug/traces/{request_id}", dependencies=[Depends(require_auth)])
+def get_trace_endpoint(request_id: str):
+    spans = traces.get(request_id)
+    if spans is None:
+        raise ApiError(404, "RESOURCE_NOT_FOUND", "Trace not found", {"requestId": request_id})
+    return {"traceId": request_id, "spans": spans}
+
+
 @router.post("/auth/login", response_model=AuthLoginResponse)
 def login(payload: AuthLoginRequest) -> AuthLoginResponse:
     _ = payload
     return AuthLoginResponse(token=DEMO_BEARER)
 
 
+@router.get("/wire-format")
+def wire_format_endpoint():
+    return {"timestamps": "epoch-milliseconds", "enums": enum_codes()}
+
+
 @router.post("/events", dependencies=[Depends(require_auth)])
 def create_event_endpoint(payload: EventCreate):
     return create_event(payload)
 
 
 @router.get("/events/{event_id}", dependencies=[Depends(require_auth)])
-def get_event_endpoint(event_id: str):
-    return get_event(event_id)
+def get_event_endpoint(request: Request, event_id: str, fields: str | None = Query(default=None)):
+    event = get_event(event_id)
+    response = render(request, event, parse_fields(Event, fields))
+    response.headers["ETag"] = etag(event)
+    return response
+
+
+@router.get("/events/{event_id}/analytics", dependencies=[Depends(require_auth)])
+def event_analytics_endpoint(event_id: str):
+    return asdict(venue_stats(venue_key(get_event(event_id))))
+
+
+@router.get("/events/{event_id}/queues", dependencies=[Depends(require_auth)])
+def queues_endpoint(event_id: str):
+    return get_queue_summary(event_id)
+
+
+@router.get("/events/{event_id}/notifications", dependencies=[Depends(require_auth)])
+def notifications_endpoint(event_id: str):
+    get_event(event_id)
+    return {"eventId": event_id, "notifications": [asdict(n) for n in outbox.for_event(event_id)]}
+
+
+@router.post("/events/{event_id}/reservations")
+def create_reservation_endpoint(event_id: str, payload: ReservationCreate):
+    return create_reservation(event_id, payload)
+
+
+@router.delete("/events/{event_id}/reservations/{reservation_id}", dependencies=[Depends(require_auth)])
+def cancel_reservation_endpoint(event_id: str, reservation_id: str):
+    return cancel_reservation(event_id, reservation_id)
+
+
+@router.get("/events/{event_id}/availability")
+def availability_endpoint(
+    event_id: str,
+    partySize: int = Query(gt=0),
+    start: datetime = Query(),
+    durationMinutes: int | None = Query(default=None, gt=0, le=720),
+):
+    return find_available_tables(event_id, partySize, start, durationMinutes)
+
+
+@router.get("/events/{event_id}/availability/next")
+def next_slot_endpoint(
+    event_id: str,
+    partySize: int = Query(gt=0),
+    after: datetime | None = Query(default=None),
+    durationMinutes: int | None = Query(default=None, gt=0, le=720),
+):
+    return next_available_slot(event_id, partySize, after, durationMinutes)
 
 
 @router.post("/events/{event_id}/waitlist")
-def join_waitlist_endpoint(event_id: str, payload: WaitlistCreate):
-    return add_waitlist_entry(event_id, payload)
+def join_waitlist_endpoint(request: Request, event_id: str, payload: WaitlistCreate):
+    return render(request, join_waitlist(event_id, payload), parse_fields(WaitlistEntry, None, CONTACT_FIELDS))
+
+
+@router.post("/events/{event_id}/waitlist/import", dependencies=[Depends(require_auth)])
+async def import_waitlist_endpoint(event_id: str, request: Request):
+    return await import_waitlist_stream(event_id, request.stream(), request.headers.get("content-type"))
 
 
 @router.get("/events/{event_id}/waitlist", dependencies=[Depends(require_auth)])
 def list_waitlist_endpoint(
+    request: Request,
     event_id: str,
     page: int = Query(default=1, ge=1),
     pageSize: int = Query(default=20, ge=1, le=100),
     type: EntryType | None = Query(default=None),
     status: EntryStatus | None = Query(default=None),
+    fields: str | None = Query(default=None),
+):
+    projection = parse_fields(WaitlistEntry, fields)
+    return render_page(request, list_waitlist(event_id, page, pageSize, type, status), WaitlistEntry, projection)
+
+
+# Declared before /waitlist/{entry_id} so "search" is not taken for an entry id.
+@router.get("/events/{event_id}/waitlist/search", dependencies=[Depends(require_auth)])
+def search_waitlist_endpoint(
+    request: Request,
+    event_id: str,
+    q: str = Query(min_length=1, max_length=120),
+    limit: int = Query(default=20, ge=1, le=100),
+    fields: str | None = Query(default=None),
 ):
-    return list_waitlist(event_id, page, pageSize, type, status)
+    projection = parse_fields(WaitlistEntry, fields)
+    return render_page(request, search_waitlist(event_id, q, limit), WaitlistEntry, projection)
+
+
+@router.get("/events/{event_id}/export", dependencies=[Depends(require_auth)])
+def export_endpoint(event_id: str, format: str = Query(default="ndjson", pattern="^(ndjson|csv)$")):
+    return StreamingResponse(
+        export_waitlist(event_id, format),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="event-{event_id}.{format}"'},
+    )
 
 
 @router.get("/events/{event_id}/waitlist/{entry_id}")
-def get_entry_endpoint(event_id: str, entry_id: str):
-    return get_waitlist_entry(event_id, entry_id)
+def get_entry_endpoint(request: Request, event_id: str, entry_id: str, fields: str | None = Query(default=None)):
+    entry = get_waitlist_entry(event_id, entry_id)
+    response = render(request, entry, parse_fields(WaitlistEntry, fields, CONTACT_FIELDS))
+    response.headers["ETag"] = etag(entry)
+    return response
 
 
 @router.get("/events/{event_id}/staff/dashboard", dependencies=[Depends(require_auth)])
-def dashboard_endpoint(event_id: str):
-    return get_dashboard(event_id)
+def dashboard_endpoint(request: Request, event_id: str):
+    return render(request, get_dashboard(event_id))
+
+
+@router.get("/events/{event_id}/staff/activity", dependencies=[Depends(require_auth)])
+def activity_endpoint(event_id: str, limit: int = Query(default=50, ge=1, le=settings.activity_log_size)):
+    return get_activity(event_id, limit)
+
+
+@router.get("/events/{event_id}/staff/timeseries", dependencies=[Depends(require_auth)])
+def timeseries_endpoint(
+    request: Request,
+    event_id: str,
+    minutes: int = Query(default=60, ge=1, le=settings.timeseries_resolution_seconds * settings.timeseries_slots // 60),
+):
+    return render(request, get_timeseries(event_id, minutes))
 
 
 @router.post("/events/{event_id}/staff/promote", dependencies=[Depends(require_auth)])
-def promote_endpoint(event_id: str, payload: PromoteRequest):
-    return promote(event_id, payload)
+def promote_endpoint(event_id: str, payload: PromoteRequest, if_match: str | None = Header(default=None)):
+    return promote(event_id, payload, parse_if_match(if_match))
 
 
 @router.post("/events/{event_id}/staff/seat", dependencies=[Depends(require_auth)])
-def seat_endpoint(event_id: str, payload: SeatRequest):
-    return seat(event_id, payload)
+def seat_endpoint(event_id: str, payload: SeatRequest, if_match: str | None = Header(default=None)):
+    return seat(event_id, payload, parse_if_match(if_match))
+
+
+@router.post("/events/{event_id}/staff/batch", dependencies=[Depends(require_auth)])
+def batch_endpoint(event_id: str, payload: BatchRequest):
+    return run_batch(event_id, payload)
 
 
 @router.post("/sync", dependencies=[Depends(require_auth)])
@@ -130,14 +327,22 @@ def get_predicted_wait(event_id: str, _=Depends(require_auth)):
     wait_minutes = calculate_heuristic_wait(event_id)
     return {"minutes_remaining": wait_minutes}
 
+@router.get("/events/{event_id}/predicted-wait/distribution", dependencies=[Depends(require_auth)])
+def wait_distribution_endpoint(event_id: str):
+    return get_wait_distribution(event_id)
+
+@router.get("/events/{event_id}/waitlist/{entry_id}/eta")
+def entry_eta_endpoint(event_id: str, entry_id: str):
+    return get_entry_eta(event_id, entry_id)
+
 @router.post("/events/{event_id}/entries/{entry_id}/ping")
 def ping_activity(event_id: str, entry_id: str):
     update_user_activity(event_id, entry_id)
     return {"status": "active"}
 
 @router.post("/events/{event_id}/staff/no-show", dependencies=[Depends(require_auth)])
-def mark_no_show_endpoint(event_id: str, payload: SeatRequest):
-    return mark_no_show(event_id, payload.entryId)
+def mark_no_show_endpoint(event_id: str, payload: SeatRequest, if_match: str | None = Header(default=None)):
+    return mark_no_show(event_id, payload.entryId, parse_if_match(if_match))
 
 
 # Primary API contract: /v1/*
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import time
+from bisect import bisect_left
+from typing import Callable, Iterable
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.models import EntryType, Event, EventType
+from app.services import calculate_heuristic_wait, get_queues, get_real_time_no_show_rate
+from app.store import store
+
+# Fixed latency buckets (seconds). Observations only bump a preallocated slot,
+# cumulative counts are computed at scrape time.
+LATENCY_BUCKETS: tuple[float, ...] = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+UNMATCHED_ROUTE = "unmatched"
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum")
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class RouteSeries:
+    __slots__ = ("method", "route", "statuses", "latency")
+
+    def __init__(self, method: str, route: str):
+        self.method = method
+        self.route = route
+        self.statuses: dict[int, int] = {}
+        self.latency = Histogram()
+
+
+class MetricsRegistry:
+    """Request metrics keyed by route template.
+
+    Every observation happens on the event loop thread (the middleware is
+    async), so plain integer slots are race-free without locks.
+    """
+
+    def __init__(self) -> None:
+        self.series: dict[tuple[str, str], RouteSeries] = {}
+        self.in_flight = 0
+        self.collectors: list[Callable[[], Iterable[str]]] = []
+
+    def observe(self, method: str, route: str, status: int, seconds: float) -> None:
+        series = self.series.get((method, route))
+        if series is None:
+            series = self.series[(method, route)] = RouteSeries(method, route)
+        series.statuses[status] = series.statuses.get(status, 0) + 1
+        series.latency.observe(seconds)
+
+    def register(self, collector: Callable[[], Iterable[str]]) -> None:
+        self.collectors.append(collector)
+
+
+metrics = MetricsRegistry()
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp, registry: MetricsRegistry = metrics):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        registry = self.registry
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        registry.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            registry.in_flight -= 1
+            route = scope.get("route")
+            template = getattr(route, "path", None) or UNMATCHED_ROUTE
+            registry.observe(scope["method"], template, status, time.perf_counter() - started)
+
+
+def _labels(**labels: object) -> str:
+    parts = []
+    for key, value in labels.items():
+        text = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{key}="{text}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _format(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def request_metric_lines(registry: MetricsRegistry) -> Iterable[str]:
+    yield "# HELP http_requests_in_flight Requests currently being served."
+    yield "# TYPE http_requests_in_flight gauge"
+    yield f"http_requests_in_flight {registry.in_flight}"
+
+    series = sorted(registry.series.values(), key=lambda s: (s.route, s.method))
+    yield "# HELP http_requests_total Completed requests by route template and status."
+    yield "# TYPE http_requests_total counter"
+    for s in series:
+        for status, count in sorted(s.statuses.items()):
+            yield f"http_requests_total{_labels(method=s.method, route=s.route, status=status)} {count}"
+
+    yield "# HELP http_request_duration_seconds Request latency by route template."
+    yield "# TYPE http_request_duration_seconds histogram"
+    for s in series:
+        cumulative = 0
+        for bound, count in zip((*s.latency.buckets, "+Inf"), s.latency.counts):
+            cumulative += count
+            yield f"http_request_duration_seconds_bucket{_labels(method=s.method, route=s.route, le=bound)} {cumulative}"
+        yield f"http_request_duration_seconds_sum{_labels(method=s.method, route=s.route)} {_format(s.latency.sum)}"
+        yield f"http_request_duration_seconds_count{_labels(method=s.method, route=s.route)} {cumulative}"
+
+
+EVENT_GAUGES: dict[str, str] = {
+    "waitlist_queue_length": "Queued entries by entry type.",
+    "event_occupancy": "Guests currently seated.",
+    "event_max_capacity": "Configured event capacity.",
+    "event_free_tables": "Unoccupied tables (INDOOR_TABLES events).",
+    "event_predicted_wait_minutes": "Current heuristic wait for the next guest.",
+    "event_no_show_rate": "Real-time no-show rate used by the wait heuristic.",
+}
+# event id -> ((store revision, event object id), samples per gauge). Writes bump the
+# revision, so a scrape only recomputes the events that changed since the last one.
+_event_samples: dict[str, tuple[tuple[int, int], dict[str, list[str]]]] = {}
+
+
+def _samples(event_id: str, event: Event) -> dict[str, list[str]]:
+    key = (store.revisions.get(event_id, 0), id(event))
+    cached = _event_samples.get(event_id)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    labels = _labels(event_id=event_id)
+    states = get_queues(event).by_id.values()
+    samples: dict[str, list[str]] = {name: [] for name in EVENT_GAUGES}
+    for entry_type in (EntryType.reservation, EntryType.waitlist):
+        count = sum(state.queued_by_type[entry_type] for state in states)
+        samples["waitlist_queue_length"].append(f"waitlist_queue_length{_labels(event_id=event_id, type=entry_type.value)} {count}")
+    samples["event_occupancy"].append(f"event_occupancy{labels} {sum(state.seated_guests for state in states)}")
+    samples["event_max_capacity"].append(f"event_max_capacity{labels} {event.maxCapacity}")
+    if event.eventType == EventType.INDOOR_TABLES:
+        free = sum(1 for t in event.tables if not t.occupied)
+        samples["event_free_tables"].append(f"event_free_tables{labels} {free}")
+    samples["event_predicted_wait_minutes"].append(f"event_predicted_wait_minutes{labels} {calculate_heuristic_wait(event_id)}")
+    samples["event_no_show_rate"].append(f"event_no_show_rate{labels} {_format(get_real_time_no_show_rate(event_id))}")
+    _event_samples[event_id] = (key, samples)
+    return samples
+
+
+def event_metric_lines() -> Iterable[str]:
+    events = list(store.events.items())
+    for event_id in _event_samples.keys() - store.events.keys():
+        _event_samples.pop(event_id, None)
+    per_event = [_samples(event_id, event) for event_id, event in events]
+    for name, help_text in EVENT_GAUGES.items():
+        yield f"# HELP {name} {help_text}"
+        yield f"# TYPE {name} gauge"
+        for samples in per_event:
+            yield from samples[name]
+
+
+def render_metrics(registry: MetricsRegistry = metrics) -> str:
+    lines = [*request_metric_lines(registry), *event_metric_lines()]
+    for collector in registry.collectors:
+        lines.extend(collector())
+    return "\n".join(lines) + "\n"
@@ -2,14 +2,23 @@ from __future__ import annotations
 
 from datetime import datetime, timezone
 from enum import Enum
-from typing import Any
+from typing import Any, Callable
 from uuid import uuid4
 
 from pydantic import BaseModel, ConfigDict, Field, model_validator
 
 
+_clock: Callable[[], datetime] | None = None
+
+
 def now_utc() -> datetime:
-    return datetime.now(timezone.utc)
+    return _clock() if _clock is not None else datetime.now(timezone.utc)
+
+
+def set_clock(clock: Callable[[], datetime] | None) -> None:
+    """Serve `now_utc` from `clock` (e.g. a replay's virtual clock); `None` restores the wall clock."""
+    global _clock
+    _clock = clock
 
 
 class EventType(str, Enum):
@@ -32,6 +41,33 @@ class EntryStatus(str, Enum):
     EXPIRED = "EXPIRED"
 
 
+class PromotionPolicy(str, Enum):
+    FIFO = "FIFO"
+    SMALLEST_PARTY_FIRST = "SMALLEST_PARTY_FIRST"
+    PRIORITY = "PRIORITY"
+
+
+class QueueCreate(BaseModel):
+    name: str = Field(min_length=1, max_length=80)
+    capacity: int | None = Field(default=None, gt=0)
+    minPartySize: int | None = Field(default=None, gt=0)
+    maxPartySize: int | None = Field(default=None, gt=0)
+    entryType: EntryType | None = None
+    promotionPolicy: PromotionPolicy = PromotionPolicy.FIFO
+    serviceMinutes: float = Field(default=8, gt=0)
+
+    def accepts(self, party_size: int, entry_type: EntryType) -> bool:
+        return (
+            (self.minPartySize is None or party_size >= self.minPartySize)
+            and (self.maxPartySize is None or party_size <= self.maxPartySize)
+            and (self.entryType is None or entry_type == self.entryType)
+        )
+
+
+class Queue(QueueCreate):
+    id: str = Field(default_factory=lambda: str(uuid4()))
+
+
 class NotificationPreferences(BaseModel):
     sms: bool = False
     push: bool = False
@@ -46,6 +82,9 @@ class EventCreate(BaseModel):
     totalTables: int | None = Field(default=None, gt=0)
     totalSeats: int | None = Field(default=None, gt=0)
     offlineEnabled: bool = True
+    location: str | None = Field(default=None, max_length=160)
+    # MULTI capacity events: one queue per entrance, area or party-size band. Omitted means one default queue.
+    queues: list[QueueCreate] | None = Field(default=None, max_length=32)
 
     @model_validator(mode="after")
     def validate_by_type(self) -> "EventCreate":
@@ -66,6 +105,7 @@ class Table(BaseModel):
     row: int
     col: int
     occupied: bool = False
+    version: int = 1
 
 
 class Event(BaseModel):
@@ -78,39 +118,78 @@ class Event(BaseModel):
     totalTables: int | None = None
     totalSeats: int | None = None
     offlineEnabled: bool = True
+    location: str | None = None
     createdAt: datetime = Field(default_factory=now_utc)
     tables: list[Table] = Field(default_factory=list)
+    queues: list[Queue] = Field(default_factory=list)
+    archived: bool = False
+    version: int = 1
 
     model_config = ConfigDict(use_enum_values=True)
     reservation_duration: int | None = 45 
-    avg_service_time: int | None = 10     
+    avg_service_time: float | None = 10     
+    historical_no_show_rate: float = 0.15
 
 
 class WaitlistCreate(BaseModel):
     name: str = Field(min_length=2, max_length=120)
     partySize: int = Field(gt=0)
     type: EntryType = EntryType.waitlist
+    queueId: str | None = None
+    reservationTime: datetime | None = None
     phoneNumber: str | None = None
     specialRequests: str | None = None
     notificationPreferences: NotificationPreferences = Field(default_factory=NotificationPreferences)
 
 
+# Guest contact details: kept for notifications and staff, left out of public responses and exports.
+CONTACT_FIELDS = ("phoneNumber",)
+
+
 class WaitlistEntry(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid4()))
     eventId: str
     name: str
     partySize: int
     type: EntryType
+    queueId: str | None = None
+    reservationTime: datetime | None = None
     status: EntryStatus = EntryStatus.QUEUED
     position: int
     estimatedWait: int
     joinedAt: datetime = Field(default_factory=now_utc)
+    completedAt: datetime | None = None
     assignedTableId: int | None = None
+    assignedTableIds: list[int] = Field(default_factory=list)
+    phoneNumber: str | None = None
+    notificationPreferences: NotificationPreferences = Field(default_factory=NotificationPreferences)
+    version: int = 1
     interactionCount: int = 0
     lastActiveTime: datetime = Field(default_factory=now_utc)
     isHighRisk: bool = False
 
 
+class ReservationCreate(BaseModel):
+    name: str = Field(min_length=2, max_length=120)
+    partySize: int = Field(gt=0)
+    start: datetime
+    durationMinutes: int | None = Field(default=None, gt=0, le=720)
+    tableId: int | None = None
+    phoneNumber: str | None = None
+
+
+class Reservation(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid4()))
+    eventId: str
+    entryId: str
+    tableId: int
+    name: str
+    partySize: int
+    start: datetime
+    end: datetime
+    createdAt: datetime = Field(default_factory=now_utc)
+
+
 class DashboardResponse(BaseModel):
     eventId: str
     occupancy: int
@@ -118,12 +197,14 @@ class DashboardResponse(BaseModel):
     queuedReservations: int
     queuedWaitlist: int
     availableTables: int | None = None
+    queues: list[dict[str, Any]] = Field(default_factory=list)
     recentActivity: list[dict[str, Any]] = Field(default_factory=list)
 
 
 class PromoteRequest(BaseModel):
     count: int = Field(default=1, gt=0, le=20)
     type: EntryType | None = None
+    queueId: str | None = None
 
 
 class SeatRequest(BaseModel):
@@ -132,6 +213,41 @@ class SeatRequest(BaseModel):
     reason: str | None = None
 
 
+class BatchOp(str, Enum):
+    SEAT = "SEAT"
+    NO_SHOW = "NO_SHOW"
+    CANCEL = "CANCEL"
+    PROMOTE = "PROMOTE"
+
+
+class BatchMode(str, Enum):
+    ATOMIC = "ATOMIC"
+    BEST_EFFORT = "BEST_EFFORT"
+
+
+class BatchOperation(BaseModel):
+    op: BatchOp
+    entryId: str | None = None
+    tableId: int | None = None
+    # PROMOTE only.
+    count: int = Field(default=1, gt=0, le=20)
+    type: EntryType | None = None
+    queueId: str | None = None
+    # Expected entry version (event version for PROMOTE), like If-Match.
+    version: int | None = None
+
+    @model_validator(mode="after")
+    def validate_target(self) -> "BatchOperation":
+        if self.op != BatchOp.PROMOTE and self.entryId is None:
+            raise ValueError(f"entryId is required for {self.op.value}")
+        return self
+
+
+class BatchRequest(BaseModel):
+    mode: BatchMode = BatchMode.ATOMIC
+    operations: list[BatchOperation] = Field(min_length=1, max_length=100)
+
+
 class AuthLoginRequest(BaseModel):
     email: str
     password: str
@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from itertools import count
+from typing import Iterable, Protocol
+from uuid import uuid4
+
+from app.config import settings
+from app.models import WaitlistEntry, now_utc
+
+logger = logging.getLogger(__name__)
+
+MESSAGES = {
+    "promoted": "{name}, your table is ready. Please come to the host stand.",
+    "seated": "{name}, you're seated. Enjoy!",
+    "no_show": "{name}, we couldn't find you, so your spot was released.",
+    "cancelled": "{name}, your spot in line was cancelled.",
+}
+
+
+@dataclass
+class Notification:
+    key: str
+    eventId: str
+    entryId: str
+    channel: str
+    to: str
+    message: str
+    id: str = field(default_factory=lambda: str(uuid4()))
+    status: str = "PENDING"
+    attempts: int = 0
+    createdAt: datetime = field(default_factory=now_utc)
+    sentAt: datetime | None = None
+    error: str | None = None
+
+
+class Provider(Protocol):
+    max_batch: int
+    concurrency: int
+
+    async def send(self, batch: list[Notification]) -> None:
+        """Deliver the whole batch or raise; a raised batch is retried."""
+
+
+class FakeGateway:
+    """In-process SMS/push gateway that records the last `keep` notifications it was sent; `fail_next` makes sends raise."""
+
+    def __init__(self, name: str, max_batch: int = 50, concurrency: int = 4, latency_seconds: float = 0.0, keep: int = 1000):
+        self.name = name
+        self.max_batch = max_batch
+        self.concurrency = concurrency
+        self.latency_seconds = latency_seconds
+        self.sent: deque[Notification] = deque(maxlen=keep)
+        self.batches = 0
+        self.fail_next = 0
+
+    async def send(self, batch: list[Notification]) -> None:
+        if self.latency_seconds:
+            await asyncio.sleep(self.latency_seconds)
+        self.batches += 1
+        if self.fail_next:
+            self.fail_next -= 1
+            raise ConnectionError(f"{self.name} gateway unavailable")
+        self.sent.extend(batch)
+
+
+def _channels(entry: WaitlistEntry) -> list[tuple[str, str]]:
+    prefs = entry.notificationPreferences
+    channels = []
+    if prefs.sms and entry.phoneNumber:
+        channels.append(("sms", entry.phoneNumber))
+    if prefs.push:
+        channels.append(("push", entry.id))
+    return channels
+
+
+class Outbox:
+    """Notifications written alongside the state change that caused them.
+
+    Each (entry, kind, channel) is recorded once, so repeated promotions or
+    retried requests never message a guest twice. Pending records wait in a
+    heap by the monotonic time they are next due; finished ones are kept for
+    inspection up to `max_size` records.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.records: OrderedDict[str, Notification] = OrderedDict()
+        self._due: list[tuple[float, int, Notification]] = []
+        self._seq = count()
+        self._lock = threading.Lock()
+        self.deduplicated = 0
+
+    def enqueue(self, entry: WaitlistEntry, kind: str) -> list[Notification]:
+        added = []
+        message = MESSAGES[kind].format(name=entry.name)
+        with self._lock:
+            for channel, to in _channels(entry):
+                key = f"{entry.id}:{kind}:{channel}"
+                if key in self.records:
+                    self.deduplicated += 1
+                    continue
+                notification = Notification(key, entry.eventId, entry.id, channel, to, message)
+                self.records[key] = notification
+                heapq.heappush(self._due, (0.0, next(self._seq), notification))
+                added.append(notification)
+            self._trim()
+        return added
+
+    def _trim(self) -> None:
+        while len(self.records) > self.max_size:
+            key, oldest = next(iter(self.records.items()))
+            if oldest.status == "PENDING":
+                break
+            del self.records[key]
+
+    def take_due(self, now: float, limit: int) -> list[Notification]:
+        taken = []
+        with self._lock:
+            while self._due and self._due[0][0] <= now and len(taken) < limit:
+                taken.append(heapq.heappop(self._due)[2])
+        return taken
+
+    def retry_at(self, notification: Notification, due: float) -> None:
+        with self._lock:
+            heapq.heappush(self._due, (due, next(self._seq), notification))
+
+    def pending(self) -> int:
+        return len(self._due)
+
+    def for_event(self, event_id: str) -> list[Notification]:
+        with self._lock:
+            return [n for n in self.records.values() if n.eventId == event_id]
+
+
+class NotificationDispatcher:
+    """Drains the outbox off the request path.
+
+    Each drain groups due notifications by channel, splits them into batches
+    of the provider's `max_batch` and sends them concurrently, at most
+    `concurrency` batches in flight per provider. A failed batch is retried
+    with exponential backoff until `notification_max_attempts`.
+    """
+
+    def __init__(self, outbox: Outbox, providers: dict[str, Provider]):
+        self.outbox = outbox
+        self.providers: dict[str, Provider] = {}
+        self._limits: dict[str, asyncio.Semaphore] = {}
+        for channel, provider in providers.items():
+            self.register(channel, provider)
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.batches = 0
+
+    def register(self, channel: str, provider: Provider) -> None:
+        self.providers[channel] = provider
+        self._limits.pop(channel, None)
+
+    def _limit(self, channel: str) -> asyncio.Semaphore:
+        # Created lazily so each semaphore belongs to the loop that drains.
+        if channel not in self._limits:
+            self._limits[channel] = asyncio.Semaphore(self.providers[channel].concurrency)
+        return self._limits[channel]
+
+    async def drain(self, now: float | None = None) -> int:
+        """Send everything due at `now` (monotonic seconds); returns how many were attempted."""
+        now = time.monotonic() if now is None else now
+        due = self.outbox.take_due(now, settings.notification_drain_limit)
+        by_channel: dict[str, list[Notification]] = {}
+        for notification in due:
+            if notification.status == "PENDING":
+                by_channel.setdefault(notification.channel, []).append(notification)
+        sends = []
+        for channel, notifications in by_channel.items():
+            provider = self.providers.get(channel)
+            if provider is None:
+                for notification in notifications:
+                    self._fail(notification, f"No provider for {channel}")
+                continue
+            for i in range(0, len(notifications), provider.max_batch):
+                sends.append(self._send(channel, provider, notifications[i : i + provider.max_batch], now))
+        await asyncio.gather(*sends)
+        return sum(len(n) for n in by_channel.values())
+
+    async def _send(self, channel: str, provider: Provider, batch: list[Notification], now: float) -> None:
+        async with self._limit(channel):
+            self.batches += 1
+            try:
+                await provider.send(batch)
+            except Exception as exc:
+                for notification in batch:
+                    self._retry(notification, str(exc), now)
+                return
+        sent_at = now_utc()
+        for notification in batch:
+            notification.attempts += 1
+            notification.status = "SENT"
+            notification.sentAt = sent_at
+        self.sent += len(batch)
+
+    def _retry(self, notification: Notification, error: str, now: float) -> None:
+        notification.attempts += 1
+        notification.error = error
+        if notification.attempts >= settings.notification_max_attempts:
+            self._fail(notification, error)
+            return
+        backoff = settings.notification_backoff_seconds * 2 ** (notification.attempts - 1)
+        self.outbox.retry_at(notification, now + min(backoff, settings.notification_backoff_max_seconds))
+        self.retries += 1
+
+    def _fail(self, notification: Notification, error: str) -> None:
+        notification.status = "FAILED"
+        notification.error = error
+        self.failed += 1
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(settings.notification_poll_seconds)
+            try:
+                await self.drain()
+            except Exception:
+                logger.exception("Notification dispatch failed")
+
+    def metric_lines(self) -> Iterable[str]:
+        yield "# HELP notifications_pending Notifications waiting in the outbox, including retries."
+        yield "# TYPE notifications_pending gauge"
+        yield f"notifications_pending {self.outbox.pending()}"
+        yield "# HELP notifications_sent_total Notifications delivered to a provider."
+        yield "# TYPE notifications_sent_total counter"
+        yield f"notifications_sent_total {self.sent}"
+        yield "# HELP notifications_failed_total Notifications given up on."
+        yield "# TYPE notifications_failed_total counter"
+        yield f"notifications_failed_total {self.failed}"
+        yield "# HELP notifications_retries_total Notifications rescheduled after a failed send."
+        yield "# TYPE notifications_retries_total counter"
+        yield f"notifications_retries_total {self.retries}"
+        yield "# HELP notification_batches_total Provider send calls."
+        yield "# TYPE notification_batches_total counter"
+        yield f"notification_batches_total {self.batches}"
+        yield "# HELP notifications_deduplicated_total Notifications skipped because the guest already got them."
+        yield "# TYPE notifications_deduplicated_total counter"
+        yield f"notifications_deduplicated_total {self.outbox.deduplicated}"
+
+
+outbox = Outbox(settings.notification_outbox_size)
+dispatcher = NotificationDispatcher(
+    outbox,
+    {
+        "sms": FakeGateway("sms", settings.notification_batch_size, settings.notification_concurrency),
+        "push": FakeGateway("push", settings.notification_batch_size, settings.notification_concurrency),
+    },
+)
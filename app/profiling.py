@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import asyncio
+import cProfile
+import functools
+import io
+import pstats
+import random
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Callable
+
+from fastapi.routing import APIRoute
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.errors import ensure_request_id
+from app.models import now_utc
+
+_active_profile: ContextVar[cProfile.Profile | None] = ContextVar("active_profile", default=None)
+
+
+class ProfileBuffer:
+    """Bounded ring of captured profiles keyed by request id (oldest evicted first)."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._items: OrderedDict[str, dict[str, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, request_id: str, record: dict[str, Any]) -> None:
+        with self._lock:
+            self._items.pop(request_id, None)
+            self._items[request_id] = record
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def get(self, request_id: str) -> dict[str, Any] | None:
+        return self._items.get(request_id)
+
+    def summaries(self) -> list[dict[str, Any]]:
+        with self._lock:
+            records = list(self._items.values())
+        return [{k: v for k, v in record.items() if k != "stats"} for record in reversed(records)]
+
+
+profiles = ProfileBuffer(settings.profile_buffer_size)
+
+
+def _profiled(call: Callable[..., Any]) -> Callable[..., Any]:
+    """Wrap an endpoint so it runs under the request's profiler, if one is active.
+
+    Sync endpoints execute in the threadpool, where the middleware's profiler
+    can't see them; the context variable is copied into the worker thread, so
+    the profiler is enabled there instead. Untriggered requests pay one
+    ContextVar lookup.
+    """
+    if asyncio.iscoroutinefunction(call):
+
+        @functools.wraps(call)
+        async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+            profiler = _active_profile.get()
+            if profiler is None:
+                return await call(*args, **kwargs)
+            # Coroutines interleave on the loop thread; other requests' frames
+            # may show up while this one awaits.
+            profiler.enable()
+            try:
+                return await call(*args, **kwargs)
+            finally:
+                profiler.disable()
+
+        return async_wrapper
+
+    @functools.wraps(call)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        profiler = _active_profile.get()
+        if profiler is None:
+            return call(*args, **kwargs)
+        return profiler.runcall(call, *args, **kwargs)
+
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    def get_route_handler(self) -> Callable:
+        self.dependant.call = _profiled(self.dependant.call)
+        return super().get_route_handler()
+
+
+def _should_profile(scope: Scope) -> bool:
+    token = settings.profile_token
+    if token:
+        for name, value in scope["headers"]:
+            if name == b"x-profile":
+                return value.decode("latin-1") == token
+    rate = settings.profile_sample_rate
+    return rate > 0 and random.random() < rate
+
+
+def _format_stats(profiler: cProfile.Profile, limit: int = 40) -> str:
+    out = io.StringIO()
+    try:
+        stats = pstats.Stats(profiler, stream=out)
+    except TypeError:
+        # Nothing ran under the profiler (e.g. the request never reached an endpoint).
+        return ""
+    stats.strip_dirs().sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+    return out.getvalue()
+
+
+class ProfilingMiddleware:
+    def __init__(self, app: ASGIApp, buffer: ProfileBuffer = profiles):
+        self.app = app
+        self.buffer = buffer
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not _should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        request_id = ensure_request_id(scope)
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", []), (b"x-profile-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        profiler = cProfile.Profile()
+        token = _active_profile.set(profiler)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _active_profile.reset(token)
+            duration_ms = (time.perf_counter() - started) * 1000
+            route = scope.get("route")
+            self.buffer.add(
+                request_id,
+                {
+                    "requestId": request_id,
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "route": getattr(route, "path", None),
+                    "status": status,
+                    "durationMs": round(duration_ms, 3),
+                    "capturedAt": now_utc(),
+                    "stats": _format_stats(profiler),
+                },
+            )
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import heapq
+import threading
+from itertools import islice, zip_longest
+from math import ceil
+
+from app.errors import ApiError
+from app.models import EntryStatus, EntryType, Event, Queue, WaitlistEntry, now_utc
+from app.scheduling import POLICY_KEYS, Scheduler
+
+DEFAULT_QUEUE_ID = "default"
+# Joins with parties up to this size are routed through a precomputed table.
+MAX_ROUTED_PARTY = 20
+# Weight of the newest gap between seatings in a queue's service-time estimate.
+SERVICE_EMA_ALPHA = 0.2
+
+
+def default_queue() -> Queue:
+    return Queue(id=DEFAULT_QUEUE_ID, name="Default")
+
+
+class QueueState:
+    """Live index of one queue: its queued entries, their promotion scheduler and running counters."""
+
+    def __init__(self, queue: Queue):
+        self.queue = queue
+        self.queued: dict[str, WaitlistEntry] = {}
+        self.scheduler = Scheduler(POLICY_KEYS[queue.promotionPolicy], self.queued)
+        self.queued_by_type = {EntryType.reservation: 0, EntryType.waitlist: 0}
+        self.queued_guests = 0
+        self.notified = 0
+        self.seated = 0
+        self.seated_guests = 0
+        self.no_shows = 0
+        self.service_minutes = queue.serviceMinutes
+        self.last_seated_at = None
+
+    def _count(self, entry: WaitlistEntry, status: EntryStatus, sign: int) -> None:
+        if status == EntryStatus.QUEUED:
+            self.queued_by_type[entry.type] += sign
+            self.queued_guests += sign * entry.partySize
+        elif status == EntryStatus.NOTIFIED:
+            self.notified += sign
+        elif status == EntryStatus.SEATED:
+            self.seated += sign
+            self.seated_guests += sign * entry.partySize
+        elif status == EntryStatus.NO_SHOW:
+            self.no_shows += sign
+
+    def add(self, entry: WaitlistEntry) -> None:
+        if entry.status == EntryStatus.QUEUED:
+            self.queued[entry.id] = entry
+            self.scheduler.push(entry)
+        self._count(entry, entry.status, 1)
+
+    def moved(self, entry: WaitlistEntry, previous: EntryStatus) -> None:
+        if previous == EntryStatus.QUEUED and self.queued.pop(entry.id, None) is not None:
+            self.scheduler.discard(entry)
+        elif entry.status == EntryStatus.QUEUED and previous != EntryStatus.QUEUED:
+            # Back in line, e.g. when a batch is rolled back.
+            self.queued[entry.id] = entry
+            self.scheduler.push(entry)
+        self._count(entry, previous, -1)
+        self._count(entry, entry.status, 1)
+        if entry.status == EntryStatus.SEATED:
+            self._observe_seating(entry.completedAt or now_utc())
+
+    def _observe_seating(self, at) -> None:
+        if self.last_seated_at is not None:
+            gap = max(0.0, (at - self.last_seated_at).total_seconds() / 60)
+            self.service_minutes += SERVICE_EMA_ALPHA * (gap - self.service_minutes)
+        self.last_seated_at = at
+
+    def take(self, n: int, entry_type: EntryType | None = None) -> list[WaitlistEntry]:
+        """The next `n` queued entries in this queue's promotion order (not removed)."""
+        return self.scheduler.take(n, entry_type)
+
+    def estimate_wait(self, position: int) -> int:
+        return max(5, ceil(position * self.service_minutes))
+
+    def stats(self) -> dict:
+        return {
+            "queueId": self.queue.id,
+            "name": self.queue.name,
+            "policy": self.queue.promotionPolicy,
+            "queued": len(self.queued),
+            "queuedGuests": self.queued_guests,
+            "queuedReservations": self.queued_by_type[EntryType.reservation],
+            "queuedWaitlist": self.queued_by_type[EntryType.waitlist],
+            "notified": self.notified,
+            "seated": self.seated,
+            "noShows": self.no_shows,
+            "capacity": self.queue.capacity,
+            "estimatedWait": self.estimate_wait(len(self.queued) + 1),
+        }
+
+
+class EventQueues:
+    """All queues of one event, built once from its waitlist and then kept up to date incrementally."""
+
+    def __init__(self, event: Event, entries: list[WaitlistEntry]):
+        queues = event.queues or [default_queue()]
+        self.by_id = {q.id: QueueState(q) for q in queues}
+        # Serialises staff batches on the event.
+        self.lock = threading.Lock()
+        self.first = self.by_id[queues[0].id]
+        self.routes: dict[tuple[EntryType, int], QueueState | None] = {}
+        for entry_type in EntryType:
+            for size in range(1, MAX_ROUTED_PARTY + 1):
+                self.routes[(entry_type, size)] = self._scan_route(size, entry_type)
+        for entry in entries:
+            self.state_of(entry).add(entry)
+
+    def _scan_route(self, party_size: int, entry_type: EntryType) -> QueueState | None:
+        return next((s for s in self.by_id.values() if s.queue.accepts(party_size, entry_type)), None)
+
+    def state_of(self, entry: WaitlistEntry) -> QueueState:
+        # Entries from before queues existed belong to the first queue.
+        return self.by_id.get(entry.queueId or "", self.first)
+
+    def route(self, party_size: int, entry_type: EntryType, queue_id: str | None = None) -> QueueState:
+        if queue_id is not None:
+            state = self.by_id.get(queue_id)
+            if state is None:
+                raise ApiError(404, "RESOURCE_NOT_FOUND", "Queue not found", {"queueId": queue_id})
+            if not state.queue.accepts(party_size, entry_type):
+                raise ApiError(409, "INVALID_INPUT", "Party does not fit this queue", {"queueId": queue_id})
+        elif party_size <= MAX_ROUTED_PARTY:
+            state = self.routes[(entry_type, party_size)]
+        else:
+            state = self._scan_route(party_size, entry_type)
+        if state is None:
+            raise ApiError(409, "NO_QUEUE", "No queue accepts this party", {"partySize": party_size, "type": entry_type})
+        if state.queue.capacity is not None and len(state.queued) >= state.queue.capacity:
+            raise ApiError(409, "QUEUE_FULL", "Queue is full", {"queueId": state.queue.id})
+        return state
+
+    def set_status(self, entry: WaitlistEntry, status: EntryStatus) -> None:
+        previous = entry.status
+        entry.status = status
+        self.state_of(entry).moved(entry, previous)
+
+    def take(self, n: int, entry_type: EntryType | None = None, queue_id: str | None = None) -> list[WaitlistEntry]:
+        """Next `n` to promote from one queue, or across all of them.
+
+        Queues sharing one policy merge their picks by its key. Keys of
+        different policies don't compare, so mixed queues take turns, each
+        giving up its picks in its own order.
+        """
+        if queue_id is not None:
+            state = self.by_id.get(queue_id)
+            if state is None:
+                raise ApiError(404, "RESOURCE_NOT_FOUND", "Queue not found", {"queueId": queue_id})
+            return state.take(n, entry_type)
+        if len(self.by_id) == 1:
+            return self.first.take(n, entry_type)
+        picks = [s.take(n, entry_type) for s in self.by_id.values()]
+        keys = {s.scheduler.key for s in self.by_id.values()}
+        if len(keys) == 1:
+            return list(islice(heapq.merge(*picks, key=keys.pop()), n))
+        turns = (entry for turn in zip_longest(*picks) for entry in turn if entry is not None)
+        return list(islice(turns, n))
+
+    def queued_total(self) -> int:
+        return sum(len(s.queued) for s in self.by_id.values())
+
+    def seated_guests(self) -> int:
+        return sum(s.seated_guests for s in self.by_id.values())
+
+    def next_wait(self) -> int:
+        """Queue-model wait for a party joining now, in the slowest queue."""
+        return max(s.estimate_wait(len(s.queued) + 1) for s in self.by_id.values())
+
+    def summary(self) -> dict:
+        queues = [s.stats() for s in self.by_id.values()]
+        return {
+            "queues": queues,
+            "queued": sum(q["queued"] for q in queues),
+            "queuedReservations": sum(q["queuedReservations"] for q in queues),
+            "queuedWaitlist": sum(q["queuedWaitlist"] for q in queues),
+            "seatedGuests": self.seated_guests(),
+        }
+
+
+_indexes: dict[str, EventQueues] = {}
+_lock = threading.Lock()
+
+
+def queues_for(event: Event, entries: list[WaitlistEntry]) -> EventQueues:
+    index = _indexes.get(event.id)
+    if index is None:
+        with _lock:
+            index = _indexes.get(event.id)
+            if index is None:
+                index = _indexes[event.id] = EventQueues(event, entries)
+    return index
+
+
+def forget(event_id: str) -> None:
+    _indexes.pop(event_id, None)
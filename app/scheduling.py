@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import heapq
+from itertools import count
+from typing import Callable
+
+from app.config import settings
+from app.models import EntryType, PromotionPolicy, WaitlistEntry
+
+PriorityKey = Callable[[WaitlistEntry], float | tuple]
+# Stale heap items are only rebuilt away once there are at least this many.
+MIN_COMPACT = 64
+
+
+def _minutes(entry: WaitlistEntry) -> float:
+    return entry.joinedAt.timestamp() / 60
+
+
+def fifo_key(entry: WaitlistEntry) -> float:
+    return _minutes(entry)
+
+
+def smallest_party_key(entry: WaitlistEntry) -> tuple:
+    return (entry.partySize, _minutes(entry))
+
+
+def priority_key(entry: WaitlistEntry) -> float:
+    """Minutes-since-epoch at which the entry is "due", lowest first.
+
+    Priority is `now - due`: every entry ages at the same linear rate, so
+    the ordering never changes over time and the key can stay fixed in a
+    heap. Reservations are due at their booked time (or join time) minus a
+    bonus, so they pass walk-ins who joined shortly before; bigger parties
+    are due slightly later since they are harder to seat. Once a walk-in
+    has waited longer than that bonus, no later reservation can overtake
+    it, so walk-ins never starve.
+    """
+    if entry.type == EntryType.reservation:
+        anchor = (entry.reservationTime or entry.joinedAt).timestamp() / 60
+        anchor -= settings.priority_reservation_bonus_minutes
+    else:
+        anchor = _minutes(entry)
+    return anchor + settings.priority_party_size_minutes * (entry.partySize - 1)
+
+
+POLICY_KEYS: dict[PromotionPolicy, PriorityKey] = {
+    PromotionPolicy.FIFO: fifo_key,
+    PromotionPolicy.SMALLEST_PARTY_FIRST: smallest_party_key,
+    PromotionPolicy.PRIORITY: priority_key,
+}
+
+
+class Scheduler:
+    """Queued entries of one queue in one heap per entry type, ordered by a static key.
+
+    `members` is the queue's live set of queued entries; an entry leaving it
+    is dropped from the heaps lazily, when it surfaces or on compaction. Only
+    an entry's latest push is live, so one that leaves and re-joins is not
+    taken twice. `take(k)` costs O(k log n) and leaves the heaps unchanged.
+    """
+
+    def __init__(self, key: PriorityKey, members: dict[str, WaitlistEntry]):
+        self.key = key
+        self.members = members
+        self.heaps: dict[EntryType, list] = {entry_type: [] for entry_type in EntryType}
+        self.stale = 0
+        self._seq = count()
+        self._pushed: dict[str, int] = {}
+
+    def push(self, entry: WaitlistEntry) -> None:
+        seq = self._pushed[entry.id] = next(self._seq)
+        heapq.heappush(self.heaps[entry.type], (self.key(entry), seq, entry.id, entry))
+
+    def discard(self, entry: WaitlistEntry) -> None:
+        self._pushed.pop(entry.id, None)
+        self.stale += 1
+        if self.stale >= MIN_COMPACT and self.stale > len(self.members):
+            self.compact()
+
+    def compact(self) -> None:
+        for heap in self.heaps.values():
+            heap[:] = [item for item in heap if self._live(item)]
+            heapq.heapify(heap)
+        self.stale = 0
+
+    def _live(self, item: tuple) -> bool:
+        return self.members.get(item[2]) is item[3] and self._pushed.get(item[2]) == item[1]
+
+    def _head(self, heap: list) -> tuple | None:
+        while heap and not self._live(heap[0]):
+            heapq.heappop(heap)
+            self.stale = max(0, self.stale - 1)
+        return heap[0] if heap else None
+
+    def take(self, n: int, entry_type: EntryType | None = None) -> list[WaitlistEntry]:
+        heaps = [self.heaps[entry_type]] if entry_type is not None else list(self.heaps.values())
+        taken: list[tuple[list, tuple]] = []
+        while len(taken) < n:
+            heads = [(head, heap) for heap in heaps if (head := self._head(heap)) is not None]
+            if not heads:
+                break
+            head, heap = min(heads, key=lambda pair: pair[0][:2])
+            taken.append((heap, heapq.heappop(heap)))
+        for heap, item in taken:
+            heapq.heappush(heap, item)
+        return [item[3] for _, item in taken]
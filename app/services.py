@@ -1,9 +1,23 @@
 from __future__ import annotations
 
+from datetime import datetime, timedelta, timezone
+from functools import partial
 from math import ceil
+from typing import Callable
 
+from app.activity import EventActivity, activity_for
+from app.analytics import apply_priors
+from app.cache import event_cache
+from app.coalesce import coalesced
+from app.config import settings
 from app.errors import ApiError
+from app.lifecycle import lifecycle
+from app.notifications import outbox
 from app.models import (
+    BatchMode,
+    BatchOp,
+    BatchOperation,
+    BatchRequest,
     DashboardResponse,
     EntryStatus,
     EntryType,
@@ -11,17 +25,33 @@ from app.models import (
     EventCreate,
     EventType,
     PromoteRequest,
+    Queue,
+    Reservation,
+    ReservationCreate,
     SeatRequest,
     Table,
     WaitlistCreate,
     WaitlistEntry,
     now_utc,
 )
+from app.guests import GuestIndex, guests_for, normalize_name
+from app.queues import EventQueues, default_queue, queues_for
+from app.slots import EventSlots, slots_for
+from app.tables import graph_for
+from app.simulation import cached_party_eta, distribution, entry_eta, simulate
 from app.store import store
+from app.tracing import span, traced
+from app.versioning import bump, check_version, compare_and_swap, conflict
+
+# Receives (entry, kind) for each guest-facing change; `partial(_announce, event)` outside batches.
+Notify = Callable[[WaitlistEntry, str], object]
+# Transitions shown on the staff dashboard.
+RECENT_ACTIVITY = 5
 
 
 def create_event(payload: EventCreate) -> Event:
-    event = Event(**payload.model_dump())
+    event = Event(**payload.model_dump(exclude={"queues"}))
+    event.queues = [Queue(**q.model_dump()) for q in payload.queues or []] or [default_queue()]
 
     if event.eventType == EventType.INDOOR_TABLES:
         total_tables = payload.totalTables or 0
@@ -30,28 +60,180 @@ def create_event(payload: EventCreate) -> Event:
             tables.append(Table(id=i + 1, name=f"Table {i+1}", capacity=4, row=i // 4, col=i % 4))
         event.tables = tables
 
+    apply_priors(event)
     store.events[event.id] = event
     store.waitlists[event.id] = []
+    store.reservations[event.id] = []
+    event_cache.put(event)
+    lifecycle.schedule(event)
     return event
 
 
+@traced()
 def get_event(event_id: str) -> Event:
-    event = store.events.get(event_id)
+    event = event_cache.get(event_id)
+    if event is not None:
+        return event
+    event = store.events.get(event_id) or lifecycle.rehydrate(event_id)
     if not event:
         raise ApiError(404, "RESOURCE_NOT_FOUND", "Event not found", {"eventId": event_id})
+    event_cache.put(event)
     return event
 
+
+def get_active_event(event_id: str) -> Event:
+    event = get_event(event_id)
+    _check_active(event)
+    return event
+
+
+def _check_active(event: Event) -> None:
+    # Writers repeat this under their lock: archiving takes the same locks before it dumps the event.
+    if event.archived:
+        raise ApiError(409, "EVENT_ARCHIVED", "Event has ended and is archived", {"eventId": event.id})
+
+
+def get_queues(event: Event) -> EventQueues:
+    return queues_for(event, store.waitlists[event.id])
+
+
+def get_guests(event_id: str) -> GuestIndex:
+    return guests_for(event_id, store.waitlists[event_id])
+
+
+def _record(event: Event, entry: WaitlistEntry, kind: str) -> None:
+    """Add a transition to the event's activity log and sample its time series."""
+    at = now_utc()
+    activity = activity_for(event.id)
+    activity.log.record(at, kind, entry)
+    _sample(event, activity, at)
+
+
+def _sample(event: Event, activity: EventActivity, at: datetime) -> None:
+    queues = get_queues(event)
+    activity.series.observe(at, queues.queued_total(), queues.seated_guests(), queues.next_wait())
+
+
+def _announce(event: Event, entry: WaitlistEntry, kind: str) -> None:
+    _record(event, entry, kind)
+    outbox.enqueue(entry, kind)
+
+
+def get_queue_summary(event_id: str) -> dict:
+    return {"eventId": event_id, **get_queues(get_event(event_id)).summary()}
+
+
+def get_slots(event: Event) -> EventSlots:
+    if event.eventType != EventType.INDOOR_TABLES:
+        raise ApiError(409, "INVALID_INPUT", "Reservations need an INDOOR_TABLES event", {"eventId": event.id})
+    return slots_for(event, store.reservations.setdefault(event.id, []))
+
+
+def _utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _slot_window(event: Event, start: datetime, duration_minutes: int | None) -> tuple[datetime, datetime]:
+    start = _utc(start)
+    end = start + timedelta(minutes=duration_minutes or event.reservation_duration or 45)
+    if start < event.startTime or end > event.endTime:
+        raise ApiError(400, "INVALID_INPUT", "Reservation must fall within the event", {"start": start, "end": end})
+    return start, end
+
+
+def find_available_tables(event_id: str, party_size: int, start: datetime, duration_minutes: int | None) -> dict:
+    event = get_event(event_id)
+    start, end = _slot_window(event, start, duration_minutes)
+    tables = get_slots(event).free_tables(party_size, start, end)
+    return {"eventId": event_id, "start": start, "end": end, "tableIds": [t.table_id for t in tables]}
+
+
+def next_available_slot(event_id: str, party_size: int, after: datetime | None, duration_minutes: int | None) -> dict:
+    event = get_event(event_id)
+    after = max(_utc(after) if after else now_utc(), event.startTime)
+    duration = duration_minutes or event.reservation_duration or 45
+    found = get_slots(event).next_slot(party_size, after, duration, event.endTime)
+    if found is None:
+        return {"eventId": event_id, "tableId": None, "start": None, "end": None}
+    table_id, start = found
+    return {"eventId": event_id, "tableId": table_id, "start": start, "end": start + timedelta(minutes=duration)}
+
+
+def create_reservation(event_id: str, payload: ReservationCreate) -> Reservation:
+    event = get_active_event(event_id)
+    start, end = _slot_window(event, payload.start, payload.durationMinutes)
+    # The booking's reservationTime ranks it under PRIORITY, so it can't start in the past.
+    earliest = now_utc() - timedelta(minutes=settings.reservation_join_late_minutes)
+    if start < earliest:
+        raise ApiError(400, "INVALID_INPUT", "Reservation start has already passed", {"start": start, "earliest": earliest})
+    slots = get_slots(event)
+    with slots.lock:
+        table = slots.first_free(payload.partySize, start, end, payload.tableId)
+        if table is None:
+            raise ApiError(409, "NO_CAPACITY", "No table free for that time", {"start": start, "end": end})
+        entry = add_waitlist_entry(
+            event_id,
+            WaitlistCreate(name=payload.name, partySize=payload.partySize, type=EntryType.reservation, reservationTime=start, phoneNumber=payload.phoneNumber),
+        )
+        reservation = Reservation(eventId=event_id, entryId=entry.id, tableId=table.table_id, name=payload.name, partySize=payload.partySize, start=start, end=end)
+        store.reservations[event_id].append(reservation)
+        slots.add(reservation)
+    return reservation
+
+
+def cancel_reservation(event_id: str, reservation_id: str) -> Reservation:
+    event = get_active_event(event_id)
+    slots = get_slots(event)
+    with slots.lock:
+        reservations = store.reservations[event_id]
+        reservation = next((r for r in reservations if r.id == reservation_id), None)
+        if reservation is None:
+            raise ApiError(404, "RESOURCE_NOT_FOUND", "Reservation not found", {"reservationId": reservation_id})
+        reservations.remove(reservation)
+        slots.remove(reservation)
+    entry = _find_entry(event_id, reservation.entryId)
+    with compare_and_swap((entry, entry.version)):
+        _check_active(event)
+        if entry.status not in {EntryStatus.QUEUED, EntryStatus.NOTIFIED}:
+            return reservation
+        store.preserve(event_id, entry)
+        entry.completedAt = now_utc()
+        get_queues(event).set_status(entry, EntryStatus.CANCELLED)
+    _record(event, entry, "cancelled")
+    store.touch(event_id)
+    return reservation
+
+
+def _booked_table(event_id: str, entry: WaitlistEntry) -> int | None:
+    if entry.reservationTime is None:
+        return None
+    return next((r.tableId for r in store.reservations.get(event_id, ()) if r.entryId == entry.id), None)
+
+
+def save_event(event: Event, bumped: bool = False) -> None:
+    """Write back an event whose fields were changed and drop stale cached copies.
+
+    `bumped` when the write runs inside a compare-and-swap on the event, which moves its version.
+    """
+    if not bumped:
+        bump(event)
+    store.events[event.id] = event
+    event_cache.invalidate(event.id)
+    store.touch(event.id)
+
+@traced()
 def get_real_time_no_show_rate(event_id: str) -> float:
     entries = store.waitlists.get(event_id, [])
     finished = [e for e in entries if e.status in {EntryStatus.SEATED, EntryStatus.NO_SHOW}]
     
     if len(finished) < 5:  
         event = get_event(event_id)
-        return getattr(event, 'historical_no_show_rate', 0.15) 
+        return event.historical_no_show_rate
 
     no_shows = sum(1 for e in finished if e.status == EntryStatus.NO_SHOW)
     return no_shows / len(finished)
 
+@traced()
 def update_event_service_time(event_id: str):
     event = get_event(event_id)
     entries = store.waitlists.get(event_id, [])
@@ -69,6 +251,7 @@ def update_event_service_time(event_id: str):
     new_avg = elapsed_time / len(seated_entries)
     
     event.avg_service_time = max(2, min(60, round(new_avg, 1)))
+    save_event(event)
 
 def get_user_weight(entry: WaitlistEntry) -> float:
     now = now_utc()
@@ -88,6 +271,8 @@ def get_user_weight(entry: WaitlistEntry) -> float:
 
     return round(weight, 2)
 
+@coalesced()
+@traced()
 def calculate_heuristic_wait(event_id: str) -> int:
     event = get_event(event_id)
     entries = store.waitlists.get(event_id, [])
@@ -105,52 +290,171 @@ def calculate_heuristic_wait(event_id: str) -> int:
     
     return ceil(adjusted_count * service_time)
 
+def get_wait_distribution(event_id: str) -> dict:
+    event = get_event(event_id)
+    state = simulate(event, store.waitlists[event_id], get_real_time_no_show_rate(event_id), get_user_weight)
+    return distribution(event_id, state)
+
+
+def get_entry_eta(event_id: str, entry_id: str) -> dict:
+    event = get_event(event_id)
+    entry = _find_entry(event_id, entry_id)
+    state = simulate(event, store.waitlists[event_id], get_real_time_no_show_rate(event_id), get_user_weight)
+    return {**entry_eta(state, entry_id), "status": entry.status}
+
 def update_user_activity(event_id: str, entry_id: str):
-    entry = get_waitlist_entry(event_id, entry_id)
+    get_active_event(event_id)
+    entry = _find_entry(event_id, entry_id)
+    store.preserve(event_id, entry)
     entry.interactionCount += 1
     entry.lastActiveTime = now_utc()
     entry.isHighRisk = False # Reset risk since they just interacted
+    store.touch(event_id)
 
-def mark_no_show(event_id: str, entry_id: str) -> WaitlistEntry:
-    get_event(event_id)
-    entry = get_waitlist_entry(event_id, entry_id)
+def mark_no_show(event_id: str, entry_id: str, if_match: int | None = None) -> WaitlistEntry:
+    event = get_active_event(event_id)
+    entry = _close(event, _find_entry(event_id, entry_id), if_match, EntryStatus.NO_SHOW, partial(_announce, event))
+    store.touch(event_id)
+    return entry
 
-    if entry.status not in {EntryStatus.NOTIFIED, EntryStatus.QUEUED}:
-        raise ApiError(409, "INVALID_INPUT", "Only queued or notified guests can be marked as No-Show")
 
-    entry.status = EntryStatus.NO_SHOW
-    
+def _close(event: Event, entry: WaitlistEntry, if_match: int | None, status: EntryStatus, notify: Notify) -> WaitlistEntry:
+    """Take a queued or notified guest out of line as NO_SHOW or CANCELLED."""
+    expected = entry.version if if_match is None else if_match
+    check_version(entry, expected)
+
+    if entry.status not in {EntryStatus.NOTIFIED, EntryStatus.QUEUED}:
+        label = "No-Show" if status == EntryStatus.NO_SHOW else "cancelled"
+        raise ApiError(409, "INVALID_INPUT", f"Only queued or notified guests can be marked as {label}")
+
+    with compare_and_swap((entry, expected)):
+        _check_active(event)
+        store.preserve(event.id, entry)
+        entry.completedAt = now_utc()
+        get_queues(event).set_status(entry, status)
+    notify(entry, "no_show" if status == EntryStatus.NO_SHOW else "cancelled")
     return entry
 
+
+def join_waitlist(event_id: str, payload: WaitlistCreate) -> WaitlistEntry:
+    """A guest's own join. reservationTime sets PRIORITY order, so it must be close to now."""
+    if payload.reservationTime is not None:
+        # A time without a zone is read as UTC, as for reservations.
+        payload.reservationTime = _utc(payload.reservationTime)
+        now = now_utc()
+        earliest = now - timedelta(minutes=settings.reservation_join_late_minutes)
+        latest = now + timedelta(minutes=settings.reservation_join_early_minutes)
+        if not earliest <= payload.reservationTime <= latest:
+            raise ApiError(400, "INVALID_INPUT", "reservationTime is too far from now", {"earliest": earliest, "latest": latest})
+    return add_waitlist_entry(event_id, payload)
+
+
 def add_waitlist_entry(event_id: str, payload: WaitlistCreate) -> WaitlistEntry:
-    get_event(event_id)
+    event = get_active_event(event_id)
     entries = store.waitlists[event_id]
+    guests = get_guests(event_id)
+
+    with guests.lock:
+        _check_active(event)
+        if guests.active_entry(payload.name) is not None:
+            raise ApiError(409, "ALREADY_EXISTS", "Guest already on waitlist")
+        entry = _join(event, entries, guests, payload)
+    store.touch(event_id)
+    return entry
 
-    if any(e.name.lower() == payload.name.lower() and e.status in {EntryStatus.QUEUED, EntryStatus.NOTIFIED} for e in entries):
-        raise ApiError(409, "ALREADY_EXISTS", "Guest already on waitlist")
 
-    position = sum(1 for e in entries if e.status == EntryStatus.QUEUED) + 1
-    estimated_wait = max(5, position * 8)
+def _join(event: Event, entries: list[WaitlistEntry], guests: GuestIndex, payload: WaitlistCreate) -> WaitlistEntry:
+    event_id = event.id
+    queues = get_queues(event)
+    queue = queues.route(payload.partySize, payload.type, payload.queueId)
+    position = len(queue.queued) + 1
+    # The event-wide simulation only describes the queue when there is just one.
+    simulated = cached_party_eta(event_id, payload.partySize, queue.queued) if len(queues.by_id) == 1 else None
+    estimated_wait = max(5, simulated) if simulated is not None else queue.estimate_wait(position)
     entry = WaitlistEntry(
         eventId=event_id,
         name=payload.name,
         partySize=payload.partySize,
         type=payload.type,
+        queueId=queue.queue.id,
+        reservationTime=payload.reservationTime,
+        phoneNumber=payload.phoneNumber,
+        notificationPreferences=payload.notificationPreferences,
         position=position,
         estimatedWait=estimated_wait,
     )
     entries.append(entry)
+    queue.add(entry)
+    guests.add(entry)
+    _record(event, entry, "joined")
     return entry
 
 
+class WaitlistImporter:
+    """Adds many entries to one event with a single pass over its existing waitlist.
+
+    Duplicate names are checked against the event's guest index and each
+    record joins exactly as a single join would, routed and positioned
+    through the event's queue index, so importing k records into a list of n
+    costs O(n + k) instead of O(n * k).
+    """
+
+    def __init__(self, event_id: str):
+        event = get_active_event(event_id)
+        self.event = event
+        self.event_id = event_id
+        self.entries = store.waitlists[event_id]
+        self.guests = get_guests(event_id)
+        self.imported = 0
+        self.errors: list[dict] = []
+
+    def add(self, line: int, payload: WaitlistCreate) -> WaitlistEntry | None:
+        with self.guests.lock:
+            return self._add(line, payload)
+
+    def _add(self, line: int, payload: WaitlistCreate) -> WaitlistEntry | None:
+        _check_active(self.event)
+        if self.guests.active_entry(payload.name) is not None:
+            self.reject(line, "ALREADY_EXISTS", "Guest already on waitlist", {"name": payload.name})
+            return None
+
+        try:
+            entry = _join(self.event, self.entries, self.guests, payload)
+        except ApiError as exc:
+            self.reject(line, exc.code, exc.message, exc.details)
+            return None
+        self.imported += 1
+        store.touch(self.event_id)
+        return entry
+
+    def reject(self, line: int, code: str, message: str, details: dict | list | None = None) -> None:
+        self.errors.append({"line": line, "code": code, "message": message, "details": details})
+
+    def result(self) -> dict:
+        return {"imported": self.imported, "failed": len(self.errors), "errors": self.errors}
+
+
+@traced()
 def get_waitlist_entry(event_id: str, entry_id: str) -> WaitlistEntry:
     get_event(event_id)
-    for entry in store.waitlists[event_id]:
-        if entry.id == entry_id:
-            return entry
+    return _find_entry(event_id, entry_id)
+
+
+def _find_entry(event_id: str, entry_id: str) -> WaitlistEntry:
+    entry = get_guests(event_id).by_id.get(entry_id)
+    if entry is not None:
+        return entry
     raise ApiError(404, "RESOURCE_NOT_FOUND", "Entry not found", {"eventId": event_id, "entryId": entry_id})
 
 
+def search_waitlist(event_id: str, query: str, limit: int) -> dict:
+    get_event(event_id)
+    # A blank query is a prefix of every name, so it would list the whole waitlist.
+    if not normalize_name(query):
+        raise ApiError(400, "INVALID_INPUT", "Search query must not be blank", {"q": query})
+    return {"query": query, "data": get_guests(event_id).search(query, limit)}
+
+
 def list_waitlist(event_id: str, page: int, page_size: int, type_filter: EntryType | None, status: EntryStatus | None) -> dict:
     get_event(event_id)
     entries = store.waitlists[event_id]
@@ -160,26 +464,41 @@ def list_waitlist(event_id: str, page: int, page_size: int, type_filter: EntryTy
     return {"data": data, "page": page, "pageSize": page_size, "total": len(filtered), "totalPages": ceil(len(filtered) / page_size) if filtered else 0}
 
 
+@coalesced()
 def get_dashboard(event_id: str) -> DashboardResponse:
     event = get_event(event_id)
-    entries = store.waitlists[event_id]
-    seated = [e for e in entries if e.status == EntryStatus.SEATED]
-    occupancy = sum(e.partySize for e in seated)
+    queues = get_queues(event).summary()
     available_tables = None
     if event.eventType == EventType.INDOOR_TABLES:
         available_tables = sum(1 for t in event.tables if not t.occupied)
 
     return DashboardResponse(
         eventId=event_id,
-        occupancy=occupancy,
+        occupancy=queues["seatedGuests"],
         maxCapacity=event.maxCapacity,
-        queuedReservations=sum(1 for e in entries if e.status == EntryStatus.QUEUED and e.type == EntryType.reservation),
-        queuedWaitlist=sum(1 for e in entries if e.status == EntryStatus.QUEUED and e.type == EntryType.waitlist),
+        queuedReservations=queues["queuedReservations"],
+        queuedWaitlist=queues["queuedWaitlist"],
         availableTables=available_tables,
-        recentActivity=[{"entryId": e.id, "name": e.name, "status": e.status} for e in entries[-5:]],
+        queues=queues["queues"],
+        recentActivity=activity_for(event_id).log.recent(RECENT_ACTIVITY),
     )
 
 
+def get_activity(event_id: str, limit: int) -> dict:
+    get_event(event_id)
+    return {"eventId": event_id, "data": activity_for(event_id).log.recent(limit)}
+
+
+def get_timeseries(event_id: str, minutes: int) -> dict:
+    event = get_event(event_id)
+    activity = activity_for(event_id)
+    # Sampling now carries the last values up to the current bucket.
+    _sample(event, activity, now_utc())
+    buckets = ceil(minutes * 60 / activity.series.resolution_seconds)
+    return {"eventId": event_id, **activity.series.window(buckets)}
+
+
+@traced()
 def _best_table(event: Event, party_size: int, preferred_table_id: int | None = None) -> Table | None:
     tables = [t for t in event.tables if not t.occupied and t.capacity >= party_size]
     if preferred_table_id is not None:
@@ -189,41 +508,263 @@ def _best_table(event: Event, party_size: int, preferred_table_id: int | None =
     return sorted(tables, key=lambda t: t.capacity)[0] if tables else None
 
 
-def promote(event_id: str, payload: PromoteRequest) -> dict:
-    event = get_event(event_id)
-    entries = store.waitlists[event_id]
-    queue = [e for e in entries if e.status == EntryStatus.QUEUED]
-    if payload.type:
-        queue = [e for e in queue if e.type == payload.type]
+@traced()
+def _table_set(event: Event, party_size: int, preferred_table_id: int | None = None) -> list[Table]:
+    """One table for the party if any fits, else the smallest group of adjacent free tables."""
+    table = _best_table(event, party_size, preferred_table_id)
+    if table is not None:
+        return [table]
+    graph = graph_for(event)
+    by_id = {t.id: t for t in event.tables}
+    return [by_id[i] for i in graph.combination(graph.free_mask(event.tables), party_size) or ()]
 
-    promoted: list[WaitlistEntry] = []
-    for entry in queue[: payload.count]:
-        if event.eventType == EventType.INDOOR_TABLES:
-            table = _best_table(event, entry.partySize)
-            if not table:
-                raise ApiError(409, "NO_CAPACITY", "No table available for current queue")
-            table.occupied = True
-            entry.assignedTableId = table.id
-        entry.status = EntryStatus.NOTIFIED
-        promoted.append(entry)
 
-    return {"promoted": promoted, "count": len(promoted)}
+def _occupy(event: Event, entry: WaitlistEntry, tables: list[Table], bumped: bool = False) -> None:
+    for table in tables:
+        table.occupied = True
+    entry.assignedTableId = tables[0].id
+    entry.assignedTableIds = [t.id for t in tables]
+    save_event(event, bumped)
 
 
-def seat(event_id: str, payload: SeatRequest) -> WaitlistEntry:
-    event = get_event(event_id)
-    entry = get_waitlist_entry(event_id, payload.entryId)
+def _held_tables(entry: WaitlistEntry) -> list[int]:
+    if entry.assignedTableId is None:
+        return []
+    return entry.assignedTableIds or [entry.assignedTableId]
+
+
+def _release(event: Event, entry: WaitlistEntry) -> None:
+    held = set(_held_tables(entry))
+    for table in event.tables:
+        if table.id in held:
+            table.occupied = False
+    entry.assignedTableId = None
+    entry.assignedTableIds = []
+
+
+def _seat(event: Event, entry: WaitlistEntry, table_id: int | None, if_match: int | None, notify: Notify) -> WaitlistEntry:
+    expected = entry.version if if_match is None else if_match
+    check_version(entry, expected)
 
     if entry.status not in {EntryStatus.NOTIFIED, EntryStatus.QUEUED}:
         raise ApiError(409, "INVALID_INPUT", "Only queued/notified guests can be seated")
 
-    if event.eventType == EventType.INDOOR_TABLES:
-        table = _best_table(event, entry.partySize, payload.tableId)
-        if not table:
+    held = _held_tables(entry) if entry.status == EntryStatus.NOTIFIED else []
+    tables: list[Table] = []
+    # A promoted guest keeps the tables held for them unless staff pick another one.
+    if event.eventType == EventType.INDOOR_TABLES and not (held and table_id in (None, *held)):
+        tables = _table_set(event, entry.partySize, table_id or _booked_table(event.id, entry))
+        if not tables:
             raise ApiError(409, "TABLE_OCCUPIED", "Requested table unavailable")
-        table.occupied = True
-        entry.assignedTableId = table.id
+    released = [t for t in event.tables if t.id in held] if tables else []
+    # Moving tables writes the event, so its version moves in the same swap.
+    watched = [(event, None)] if tables else []
+
+    with compare_and_swap((entry, expected), *((t, t.version) for t in tables + released), *watched):
+        _check_active(event)
+        _claim(tables)
+        store.preserve(event.id, entry)
+        if tables:
+            _release(event, entry)
+            _occupy(event, entry, tables, bumped=True)
+        entry.completedAt = now_utc()
+        get_queues(event).set_status(entry, EntryStatus.SEATED)
+    notify(entry, "seated")
+    return entry
+
+
+def _claim(tables: list[Table]) -> None:
+    for table in tables:
+        if table.occupied:
+            raise conflict(table)
+
+
+def promote(event_id: str, payload: PromoteRequest, if_match: int | None = None) -> dict:
+    event = get_active_event(event_id)
+    queues = get_queues(event)
+    # Taking reorders the scheduler heaps, so it is serialised with staff batches.
+    with queues.lock:
+        _check_active(event)
+        taken = _take(queues, payload.count, payload.type, payload.queueId)
+        promoted = _promote(event, queues, taken, partial(_announce, event), if_match)
+    store.touch(event_id)
+    return {"promoted": promoted, "count": len(promoted)}
 
-    entry.status = EntryStatus.SEATED
+
+def _take(queues: EventQueues, count: int, entry_type: EntryType | None, queue_id: str | None) -> list[tuple[WaitlistEntry, int]]:
+    with span("waitlist.schedule", queued=queues.queued_total()):
+        return [(entry, entry.version) for entry in queues.take(count, entry_type, queue_id)]
+
+
+def _promote(
+    event: Event, queues: EventQueues, taken: list[tuple[WaitlistEntry, int]], notify: Notify, event_version: int | None = None
+) -> list[WaitlistEntry]:
+    """Notify the taken entries in order, holding a table set for each at table events.
+
+    `event_version` (the event's If-Match) is compared in the same
+    compare-and-swap as the first entry and its tables, which then moves the
+    event's version, so a second promote with the same ETag conflicts.
+    """
+    if not taken:
+        check_version(event, event_version)
+    promoted: list[WaitlistEntry] = []
+    for entry, version in taken:
+        tables: list[Table] = []
+        if event.eventType == EventType.INDOOR_TABLES:
+            tables = _table_set(event, entry.partySize, _booked_table(event.id, entry))
+            if not tables:
+                raise ApiError(409, "NO_CAPACITY", "No table available for current queue")
+        # Holding tables writes the event, so it joins the swap even without an If-Match.
+        expected_event = None if promoted else event_version
+        watched = [(event, expected_event)] if tables or expected_event is not None else []
+        with compare_and_swap((entry, version), *((t, t.version) for t in tables), *watched):
+            if entry.status != EntryStatus.QUEUED:
+                raise conflict(entry)
+            _claim(tables)
+            store.preserve(event.id, entry)
+            if tables:
+                _occupy(event, entry, tables, bumped=True)
+            elif watched:
+                save_event(event, bumped=True)
+            queues.set_status(entry, EntryStatus.NOTIFIED)
+        notify(entry, "promoted")
+        promoted.append(entry)
+    return promoted
+
+
+def seat(event_id: str, payload: SeatRequest, if_match: int | None = None) -> WaitlistEntry:
+    event = get_active_event(event_id)
+    entry = _seat(event, _find_entry(event_id, payload.entryId), payload.tableId, if_match, partial(_announce, event))
     update_event_service_time(event_id)
+    store.touch(event_id)
     return entry
+
+
+class BatchUndo:
+    """State of the entries and tables an atomic batch touched, as it was before the batch."""
+
+    def __init__(self, event: Event):
+        self.event = event
+        self.entries: dict[str, tuple[WaitlistEntry, WaitlistEntry]] = {}
+        # Versions the batch's own writes left entries and tables at.
+        self.produced: dict[str, int] = {}
+        self.produced_tables: dict[int, int] = {}
+        self.tables = {t.id: t.occupied for t in event.tables}
+
+    def capture(self, entry: WaitlistEntry) -> None:
+        if entry.id not in self.entries:
+            self.entries[entry.id] = (entry, entry.model_copy(deep=True))
+
+    def changed(self, entry: WaitlistEntry) -> None:
+        """Called right after each write: the entry and the tables it took or gave up."""
+        self.produced[entry.id] = entry.version
+        held = {*_held_tables(entry), *_held_tables(self.entries[entry.id][1])}
+        for table in self.event.tables:
+            if table.id in held:
+                self.produced_tables[table.id] = table.version
+
+    def rollback(self, queues: EventQueues) -> None:
+        """Restore what the batch changed; entries and tables someone else changed since are left alone.
+
+        An entry whose tables moved stays as the batch left it, since
+        restoring it would hand back a table another guest now holds.
+        """
+        moved = {t.id for t in self.event.tables if t.id in self.produced_tables and t.version != self.produced_tables[t.id]}
+        touched: set[int] = set()
+        for live, original in reversed(self.entries.values()):
+            if live.id not in self.produced:
+                continue
+            held = {*_held_tables(live), *_held_tables(original)}
+            if held & moved:
+                continue
+            previous = live.status
+            try:
+                with compare_and_swap((live, self.produced[live.id])):
+                    touched.update(held)
+                    store.preserve(self.event.id, live)
+                    for name in WaitlistEntry.model_fields:
+                        if name != "version":
+                            setattr(live, name, getattr(original, name))
+                    queues.state_of(live).moved(live, previous)
+            except ApiError:
+                continue
+        restored = False
+        for table in self.event.tables:
+            if table.id not in touched:
+                continue
+            try:
+                with compare_and_swap((table, self.produced_tables[table.id])):
+                    table.occupied = self.tables[table.id]
+                    restored = True
+            except ApiError:
+                continue
+        if restored:
+            save_event(self.event)
+
+
+def run_batch(event_id: str, payload: BatchRequest) -> dict:
+    """Apply staff operations in order under the event's batch lock.
+
+    Entries are resolved with one pass over the waitlist. ATOMIC stops at the
+    first failing operation and undoes the earlier ones; BEST_EFFORT records
+    the failure and carries on. Notifications go out only for changes that stand.
+    """
+    event = get_active_event(event_id)
+    queues = get_queues(event)
+    wanted = {op.entryId for op in payload.operations if op.entryId is not None}
+    entries = {e.id: e for e in store.waitlists[event_id] if e.id in wanted} if wanted else {}
+    atomic = payload.mode == BatchMode.ATOMIC
+    undo = BatchUndo(event) if atomic else None
+    notices: list[tuple[WaitlistEntry, str]] = []
+    results: list[dict] = []
+
+    def notify(entry: WaitlistEntry, kind: str) -> None:
+        notices.append((entry, kind))
+        if undo is not None:
+            undo.changed(entry)
+
+    with queues.lock:
+        _check_active(event)
+        for index, op in enumerate(payload.operations):
+            written = len(notices)
+            try:
+                changed = _apply(event, queues, entries, op, undo, notify)
+            except ApiError as exc:
+                # A PROMOTE can fail part-way; in BEST_EFFORT the entries it promoted first stand.
+                kept = [] if atomic else [e.model_dump(mode="json") for e, _ in notices[written:]]
+                results.append(
+                    {"index": index, "op": op.op, "ok": False, "code": exc.code, "message": exc.message, "details": exc.details, "entries": kept}
+                )
+                if atomic:
+                    undo.rollback(queues)
+                    store.touch(event_id)
+                    raise ApiError(409, "BATCH_FAILED", "Batch rolled back", {"failedIndex": index, "results": results})
+                continue
+            results.append({"index": index, "op": op.op, "ok": True, "entries": [e.model_dump(mode="json") for e in changed]})
+
+    for entry, kind in notices:
+        _announce(event, entry, kind)
+    if any(op.op == BatchOp.SEAT for op in payload.operations):
+        update_event_service_time(event_id)
+    store.touch(event_id)
+    applied = sum(1 for r in results if r["ok"])
+    return {"eventId": event_id, "mode": payload.mode, "applied": applied, "failed": len(results) - applied, "results": results}
+
+
+def _apply(event: Event, queues: EventQueues, entries: dict[str, WaitlistEntry], op: BatchOperation, undo: BatchUndo | None, notify: Notify) -> list[WaitlistEntry]:
+    if op.op == BatchOp.PROMOTE:
+        taken = _take(queues, op.count, op.type, op.queueId)
+        if undo is not None:
+            for entry, _ in taken:
+                undo.capture(entry)
+        return _promote(event, queues, taken, notify, op.version)
+
+    entry = entries.get(op.entryId)
+    if entry is None:
+        raise ApiError(404, "RESOURCE_NOT_FOUND", "Entry not found", {"eventId": event.id, "entryId": op.entryId})
+    if undo is not None:
+        undo.capture(entry)
+    if op.op == BatchOp.SEAT:
+        return [_seat(event, entry, op.tableId, op.version, notify)]
+    status = EntryStatus.NO_SHOW if op.op == BatchOp.NO_SHOW else EntryStatus.CANCELLED
+    return [_close(event, entry, op.version, status, notify)]
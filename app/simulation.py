@@ -0,0 +1,329 @@
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Collection
+
+import numpy as np
+
+from app.config import settings
+from app.models import EntryStatus, Event, EventType, WaitlistEntry, now_utc
+from app.tables import TableGraph
+
+# Table turn times are lognormal around the event's reservation duration.
+TURN_TIME_SIGMA = 0.3
+# Entries simulated per vectorised step (tables are assigned one party at a time within a step).
+TABLE_STEP = 16
+SERVER_STEP = 256
+# Rollouts older than this are rebuilt so table turns and guest weights are re-sampled.
+MAX_AGE_SECONDS = 300
+PERCENTILES = (50, 90)
+# Adjacent table sets considered for a party no single table fits.
+MAX_COMBINATIONS = 32
+
+
+@dataclass
+class Rollouts:
+    """Progress of one event's simulation; extended in place while the queue only grows.
+
+    Times are minutes after `origin`. Tables are stored sorted by capacity, so
+    the tables that fit a party are always a suffix of the columns. A party
+    no single table fits takes the adjacent set of columns that frees up first.
+    """
+
+    signature: tuple
+    rng: np.random.Generator
+    capacities: np.ndarray  # ascending; a single infinite "server" for events without tables
+    free_at: np.ndarray  # rollouts x tables: when each table/server frees up
+    origin: datetime = field(default_factory=now_utc)
+    queue_ids: list[str] = field(default_factory=list)
+    party_sizes: list[int] = field(default_factory=list)
+    p50: list[float] = field(default_factory=list)
+    p90: list[float] = field(default_factory=list)
+    complete: bool = False
+    graph: TableGraph | None = None  # adjacency of the columns
+    combined: dict[int, np.ndarray | None] = field(default_factory=dict)
+
+    def first_fitting(self, party_size: int) -> int:
+        return int(np.searchsorted(self.capacities, party_size, side="left"))
+
+    def combinations(self, party_size: int) -> np.ndarray | None:
+        """Column sets seating the party, one per row, padded by repeating their first column."""
+        if party_size not in self.combined:
+            sets = self.graph.candidates(party_size, MAX_COMBINATIONS) if self.graph else []
+            width = max(map(len, sets), default=0)
+            self.combined[party_size] = np.array([s + s[:1] * (width - len(s)) for s in sets]) if sets else None
+        return self.combined[party_size]
+
+    def ready_at(self, party_size: int) -> tuple[np.ndarray, np.ndarray] | None:
+        """Per rollout, when the first adjacent set seating the party is free, and that set's columns."""
+        sets = self.combinations(party_size)
+        if sets is None:
+            return None
+        ready = self.free_at[:, sets].max(axis=2)
+        choice = np.argmin(ready, axis=1)
+        return ready[np.arange(len(choice)), choice], sets[choice]
+
+    def elapsed(self) -> float:
+        return (now_utc() - self.origin).total_seconds() / 60
+
+
+_states: dict[str, Rollouts] = {}
+_locks: dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+def _lock_for(event_id: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(event_id, threading.Lock())
+
+
+def forget(event_id: str) -> None:
+    """Drop an event's rollouts, e.g. once it is archived."""
+    _states.pop(event_id, None)
+    with _locks_guard:
+        _locks.pop(event_id, None)
+
+
+def _turn_times(rng: np.random.Generator, mean: float, size: tuple[int, ...]) -> np.ndarray:
+    mu = np.log(mean) - TURN_TIME_SIGMA**2 / 2
+    return rng.lognormal(mu, TURN_TIME_SIGMA, size)
+
+
+def _signature(event: Event, no_show_rate: float) -> tuple:
+    occupied = tuple(t.id for t in event.tables if t.occupied)
+    return (event.eventType, occupied, round(no_show_rate, 3), event.avg_service_time, event.reservation_duration)
+
+
+def _initial_state(event: Event, entries: list[WaitlistEntry], signature: tuple, rollouts: int) -> Rollouts:
+    rng = np.random.default_rng()
+    if event.eventType != EventType.INDOOR_TABLES or not event.tables:
+        return Rollouts(signature, rng, np.array([np.inf]), np.zeros((rollouts, 1)))
+
+    duration = float(event.reservation_duration or 45)
+    tables = sorted(event.tables, key=lambda t: t.capacity)
+    free_at = np.zeros((rollouts, len(tables)))
+    holders = {
+        table_id: e
+        for e in entries
+        if e.assignedTableId is not None and e.status in {EntryStatus.SEATED, EntryStatus.NOTIFIED}
+        for table_id in e.assignedTableIds or [e.assignedTableId]
+    }
+    now = now_utc()
+    for col, table in enumerate(tables):
+        if not table.occupied:
+            continue
+        turn = _turn_times(rng, duration, (rollouts,))
+        holder = holders.get(table.id)
+        if holder is not None and holder.status == EntryStatus.SEATED and holder.completedAt:
+            elapsed = (now - holder.completedAt).total_seconds() / 60
+            free_at[:, col] = np.maximum(turn - elapsed, 0.0)
+        elif holder is not None:
+            free_at[:, col] = turn  # promoted but not seated yet: a full turn ahead
+        else:
+            free_at[:, col] = turn * rng.random(rollouts)
+    capacities = np.array([t.capacity for t in tables], dtype=np.float64)
+    return Rollouts(signature, rng, capacities, free_at, origin=now, graph=TableGraph(tables))
+
+
+def _extend_server(state: Rollouts, shows: np.ndarray, service_time: float) -> np.ndarray:
+    """Single server: each party's start is the sum of service times ahead of it."""
+    durations = state.rng.exponential(service_time, shows.shape) * (state.rng.random(shows.shape) < shows)
+    finish = state.free_at[:, :1] + np.cumsum(durations, axis=1)
+    starts = finish - durations
+    state.free_at[:, 0] = finish[:, -1]
+    return starts
+
+
+def _extend_tables(state: Rollouts, party_sizes: list[int], shows: np.ndarray, duration: float) -> np.ndarray:
+    """FCFS table assignment: each party takes the earliest-free table (or adjacent tables) that fits it."""
+    rollouts = state.free_at.shape[0]
+    rows = np.arange(rollouts)
+    starts = np.full((rollouts, len(party_sizes)), np.nan)
+    turns = _turn_times(state.rng, duration, starts.shape)
+    show = state.rng.random(starts.shape) < shows
+    for i, party in enumerate(party_sizes):
+        first = state.first_fitting(party)
+        if first == len(state.capacities):
+            combined = state.ready_at(party)
+            if combined is None:
+                continue
+            start, cols = combined
+            held = state.free_at[rows[:, None], cols]
+            state.free_at[rows[:, None], cols] = np.where(show[:, i, None], (start + turns[:, i])[:, None], held)
+            starts[:, i] = start
+            continue
+        fitting = state.free_at[:, first:]
+        table = np.argmin(fitting, axis=1)
+        start = fitting[rows, table]
+        fitting[rows, table] = np.where(show[:, i], start + turns[:, i], start)
+        starts[:, i] = start
+    return starts
+
+
+def _record(state: Rollouts, starts: np.ndarray) -> None:
+    # Columns are either all NaN (party fits no table) or fully populated.
+    p50, p90 = np.full((2, starts.shape[1]), np.nan)
+    seatable = ~np.isnan(starts[0]) if starts.size else np.zeros(0, dtype=bool)
+    if seatable.any():
+        p50[seatable], p90[seatable] = np.percentile(starts[:, seatable], PERCENTILES, axis=0)
+    state.p50.extend(p50.tolist())
+    state.p90.extend(p90.tolist())
+
+
+def simulate(
+    event: Event,
+    entries: list[WaitlistEntry],
+    no_show_rate: float,
+    show_weight: Callable[[WaitlistEntry], float],
+    budget_ms: float | None = None,
+) -> Rollouts:
+    """Advance the event's rollouts within `budget_ms` and return the current state.
+
+    Each queued party shows up with probability `(1 - no_show_rate) *
+    show_weight(entry)`; tables (or a single server for events without
+    tables) are then handed out first come, first served.
+
+    The state is reused while the table/rate inputs are unchanged and the
+    queue has only grown at the tail (new joins), so only new entries are
+    simulated. Anything else (promotions, seatings, no-shows) starts over.
+    Only the first `simulation_horizon` queued entries are simulated. Entries
+    not reached within the budget have no ETA yet and are picked up by the
+    next call; if another request is already simulating this event the
+    current state is returned without waiting.
+    """
+    event_id = event.id
+    lock = _lock_for(event_id)
+    if not lock.acquire(blocking=False):
+        state = _states.get(event_id)
+        if state is not None:
+            return state
+        lock.acquire()
+
+    try:
+        deadline = time.perf_counter() + (settings.simulation_budget_ms if budget_ms is None else budget_ms) / 1000
+        queue = [e for e in entries if e.status == EntryStatus.QUEUED]
+        signature = _signature(event, no_show_rate)
+
+        state = _states.get(event_id)
+        done = len(state.p50) if state else 0
+        if (
+            state is None
+            or state.signature != signature
+            or state.elapsed() * 60 > MAX_AGE_SECONDS
+            or state.queue_ids[:done] != [e.id for e in queue[:done]]
+        ):
+            state = _initial_state(event, entries, signature, settings.simulation_rollouts)
+            done = 0
+        state.queue_ids = [e.id for e in queue]
+        state.party_sizes = [e.partySize for e in queue]
+
+        rollouts = state.free_at.shape[0]
+        tables = event.eventType == EventType.INDOOR_TABLES and bool(event.tables)
+        horizon = min(len(queue), settings.simulation_horizon)
+        step = TABLE_STEP if tables else SERVER_STEP
+        while done < horizon and time.perf_counter() < deadline:
+            batch = queue[done : min(done + step, horizon)]
+            p_show = np.array([(1 - no_show_rate) * show_weight(e) for e in batch])
+            shows = np.broadcast_to(p_show, (rollouts, len(batch)))
+            if tables:
+                starts = _extend_tables(state, [e.partySize for e in batch], shows, float(event.reservation_duration or 45))
+            else:
+                starts = _extend_server(state, shows, float(event.avg_service_time or 10))
+            _record(state, starts)
+            done += len(batch)
+
+        state.complete = done >= horizon
+        _states[event_id] = state
+        return state
+    finally:
+        lock.release()
+
+
+def _minutes(value: float, elapsed: float) -> float | None:
+    return None if np.isnan(value) else round(max(0.0, value - elapsed), 1)
+
+
+def _tail_starts(state: Rollouts, party_size: int) -> np.ndarray | None:
+    first = state.first_fitting(party_size)
+    if first == len(state.capacities):
+        combined = state.ready_at(party_size)
+        return None if combined is None else combined[0]
+    return state.free_at[:, first:].min(axis=1)
+
+
+def party_size_etas(state: Rollouts) -> list[dict]:
+    """ETA percentiles for a party of each size joining the tail of the queue now.
+
+    Sizes run up to the largest table or the largest queued party, whichever
+    is bigger; a size nothing can seat has no ETA.
+    """
+    finite = state.capacities[np.isfinite(state.capacities)]
+    largest = int(finite.max()) if finite.size else max(state.party_sizes, default=8)
+    largest = max(largest, max(state.party_sizes, default=0))
+    elapsed = state.elapsed()
+    results = []
+    for party in range(1, largest + 1):
+        starts = _tail_starts(state, party)
+        p50, p90 = (np.nan, np.nan) if starts is None else np.percentile(starts, PERCENTILES)
+        results.append({"partySize": party, "p50": _minutes(p50, elapsed), "p90": _minutes(p90, elapsed)})
+    return results
+
+
+def _entry_row(state: Rollouts, i: int, elapsed: float) -> dict:
+    simulated = i < len(state.p50)
+    return {
+        "entryId": state.queue_ids[i],
+        "position": i + 1,
+        "partySize": state.party_sizes[i],
+        "p50": _minutes(state.p50[i], elapsed) if simulated else None,
+        "p90": _minutes(state.p90[i], elapsed) if simulated else None,
+    }
+
+
+def distribution(event_id: str, state: Rollouts) -> dict:
+    elapsed = state.elapsed()
+    # Tail ETAs only describe a new joiner when the whole queue fit in the horizon.
+    whole_queue = state.complete and len(state.p50) == len(state.queue_ids)
+    return {
+        "eventId": event_id,
+        "rollouts": state.free_at.shape[0],
+        "complete": state.complete,
+        "horizon": settings.simulation_horizon,
+        "computedAt": state.origin,
+        "partySizes": party_size_etas(state) if whole_queue else [],
+        "entries": [_entry_row(state, i, elapsed) for i in range(len(state.queue_ids))],
+    }
+
+
+def entry_eta(state: Rollouts, entry_id: str) -> dict:
+    try:
+        i = state.queue_ids.index(entry_id)
+    except ValueError:
+        return {"entryId": entry_id, "p50": None, "p90": None}
+    return _entry_row(state, i, state.elapsed())
+
+
+def cached_party_eta(event_id: str, party_size: int, queued: Collection[str]) -> int | None:
+    """Median wait for a party joining behind `queued` from the last finished simulation, without computing.
+
+    The tail ETA only describes the joiner's own position while the simulated
+    queue is exactly the queued entries now, and only while the state is
+    younger than `simulation_quote_max_age_seconds`; otherwise there is none.
+    """
+    state = _states.get(event_id)
+    if (
+        state is None
+        or not state.complete
+        or len(state.p50) != len(state.queue_ids)
+        or state.elapsed() * 60 > settings.simulation_quote_max_age_seconds
+        or len(state.queue_ids) != len(queued)
+        or not all(entry_id in queued for entry_id in state.queue_ids)
+    ):
+        return None
+    starts = _tail_starts(state, party_size)
+    if starts is None:
+        return None
+    return int(np.ceil(max(0.0, float(np.median(starts)) - state.elapsed())))
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+
+from app.models import Event, Reservation
+
+
+def _minutes(value: datetime) -> float:
+    return value.timestamp() / 60
+
+
+def _datetime(minutes: float) -> datetime:
+    return datetime.fromtimestamp(minutes * 60, tz=timezone.utc)
+
+
+class TableSlots:
+    """Bookings of one table as parallel sorted arrays of non-overlapping [start, end) minutes."""
+
+    __slots__ = ("table_id", "capacity", "starts", "ends", "ids")
+
+    def __init__(self, table_id: int, capacity: int):
+        self.table_id = table_id
+        self.capacity = capacity
+        self.starts: list[float] = []
+        self.ends: list[float] = []
+        self.ids: list[str] = []
+
+    def is_free(self, start: float, end: float) -> bool:
+        i = bisect_right(self.starts, start)
+        if i and self.ends[i - 1] > start:
+            return False
+        return i == len(self.starts) or self.starts[i] >= end
+
+    def add(self, start: float, end: float, reservation_id: str) -> None:
+        i = bisect_right(self.starts, start)
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+        self.ids.insert(i, reservation_id)
+
+    def remove(self, start: float, reservation_id: str) -> None:
+        i = bisect_left(self.starts, start)
+        while i < len(self.ids) and self.ids[i] != reservation_id:
+            i += 1
+        if i < len(self.ids):
+            del self.starts[i], self.ends[i], self.ids[i]
+
+    def next_free(self, after: float, duration: float) -> float:
+        """Earliest start >= `after` with `duration` free minutes."""
+        i = bisect_right(self.starts, after)
+        candidate = max(after, self.ends[i - 1]) if i else after
+        while i < len(self.starts) and self.starts[i] < candidate + duration:
+            candidate = max(candidate, self.ends[i])
+            i += 1
+        return candidate
+
+
+class EventSlots:
+    """Per-table interval indexes of an event, with tables ordered by capacity.
+
+    The tables that fit a party are a suffix found by bisection; each table
+    answers "free for [start, end)?" in O(log b) for b bookings on it. There
+    is no index across tables: listing free tables checks each fitting table,
+    and `next_slot` walks each one's bookings from `after` on.
+    """
+
+    def __init__(self, event: Event, reservations: list[Reservation]):
+        tables = sorted(event.tables, key=lambda t: (t.capacity, t.id))
+        self.tables = [TableSlots(t.id, t.capacity) for t in tables]
+        self.capacities = [t.capacity for t in tables]
+        self.by_id = {t.table_id: t for t in self.tables}
+        self.lock = threading.Lock()
+        for reservation in reservations:
+            self.add(reservation)
+
+    def fitting(self, party_size: int) -> list[TableSlots]:
+        return self.tables[bisect_left(self.capacities, party_size):]
+
+    def free_tables(self, party_size: int, start: datetime, end: datetime) -> list[TableSlots]:
+        s, e = _minutes(start), _minutes(end)
+        return [t for t in self.fitting(party_size) if t.is_free(s, e)]
+
+    def first_free(self, party_size: int, start: datetime, end: datetime, table_id: int | None = None) -> TableSlots | None:
+        """The smallest fitting table free for [start, end), or `table_id` if it fits and is free.
+
+        Stops at the first free table instead of listing them all.
+        """
+        s, e = _minutes(start), _minutes(end)
+        if table_id is not None:
+            table = self.by_id.get(table_id)
+            return table if table is not None and table.capacity >= party_size and table.is_free(s, e) else None
+        return next((t for t in self.fitting(party_size) if t.is_free(s, e)), None)
+
+    def next_slot(self, party_size: int, after: datetime, duration_minutes: float, latest_end: datetime) -> tuple[int, datetime] | None:
+        best: tuple[float, int] | None = None
+        limit = _minutes(latest_end)
+        for table in self.fitting(party_size):
+            start = table.next_free(_minutes(after), duration_minutes)
+            if start + duration_minutes <= limit and (best is None or start < best[0]):
+                best = (start, table.table_id)
+        return None if best is None else (best[1], _datetime(best[0]))
+
+    def add(self, reservation: Reservation) -> None:
+        self.by_id[reservation.tableId].add(_minutes(reservation.start), _minutes(reservation.end), reservation.id)
+
+    def remove(self, reservation: Reservation) -> None:
+        self.by_id[reservation.tableId].remove(_minutes(reservation.start), reservation.id)
+
+
+_indexes: dict[str, EventSlots] = {}
+_lock = threading.Lock()
+
+
+def slots_for(event: Event, reservations: list[Reservation]) -> EventSlots:
+    index = _indexes.get(event.id)
+    if index is None:
+        with _lock:
+            index = _indexes.get(event.id)
+            if index is None:
+                index = _indexes[event.id] = EventSlots(event, reservations)
+    return index
+
+
+def forget(event_id: str) -> None:
+    _indexes.pop(event_id, None)
@@ -1,14 +1,72 @@
 from __future__ import annotations
 
+import threading
+from contextlib import contextmanager
 from dataclasses import dataclass, field
+from typing import Callable, Iterator, TypeVar
 
-from app.models import Event, WaitlistEntry
+from app.models import Event, Reservation, WaitlistEntry
+
+T = TypeVar("T")
+
+
+@dataclass(eq=False)
+class Snapshot:
+    """Copy-on-write view of an event's waitlist as of the moment it was taken.
+
+    Entries appended later are excluded by `length`; entries mutated later are
+    copied into `preserved` by `InMemoryStore.preserve` just before the write.
+    """
+
+    length: int
+    preserved: dict[str, WaitlistEntry] = field(default_factory=dict)
+    lock: threading.Lock = field(default_factory=threading.Lock)
 
 
 @dataclass
 class InMemoryStore:
     events: dict[str, Event] = field(default_factory=dict)
     waitlists: dict[str, list[WaitlistEntry]] = field(default_factory=dict)
+    snapshots: dict[str, list[Snapshot]] = field(default_factory=dict)
+    revisions: dict[str, int] = field(default_factory=dict)
+    reservations: dict[str, list[Reservation]] = field(default_factory=dict)
+
+    def touch(self, event_id: str) -> None:
+        """Call after writing an event or its waitlist so results keyed by revision go stale."""
+        self.revisions[event_id] = self.revisions.get(event_id, 0) + 1
+
+    @contextmanager
+    def snapshot(self, event_id: str) -> Iterator[Snapshot]:
+        snap = Snapshot(length=len(self.waitlists[event_id]))
+        self.snapshots.setdefault(event_id, []).append(snap)
+        try:
+            yield snap
+        finally:
+            active = self.snapshots.get(event_id, [])
+            if snap in active:
+                active.remove(snap)
+            if not active:
+                self.snapshots.pop(event_id, None)
+
+    def preserve(self, event_id: str, entry: WaitlistEntry) -> None:
+        """Call before mutating `entry` so open snapshots keep its current state."""
+        for snap in self.snapshots.get(event_id, ()):
+            with snap.lock:
+                if entry.id not in snap.preserved:
+                    snap.preserved[entry.id] = entry.model_copy()
+
+    def iter_snapshot(self, event_id: str, snap: Snapshot, render: Callable[[WaitlistEntry], T]) -> Iterator[T]:
+        """Yield `render(entry)` for every entry in the snapshot.
+
+        Rendering happens under the snapshot lock so a concurrent writer can't
+        change an entry between the preserved-copy check and its serialization.
+        """
+        entries = self.waitlists[event_id]
+        for i in range(snap.length):
+            with snap.lock:
+                entry = entries[i]
+                rendered = render(snap.preserved.get(entry.id, entry))
+            yield rendered
 
 
 store = InMemoryStore()
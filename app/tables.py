@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+
+from app.models import Event, Table
+
+# Largest number of adjacent tables pushed together for one party.
+MAX_COMBINED_TABLES = 6
+# Combination results kept per event, keyed by (connected free tables bitmask, party size).
+MEMO_SIZE = 4096
+# Connected sets examined per search; past this each table is grown greedily instead.
+MAX_SEARCH_NODES = 4096
+
+
+class TableGraph:
+    """Adjacency of an event's tables on the row/col grid, with bit i standing for table i."""
+
+    def __init__(self, tables: list[Table]):
+        self.ids = [t.id for t in tables]
+        self.capacities = [t.capacity for t in tables]
+        position = {(t.row, t.col): i for i, t in enumerate(tables)}
+        self.neighbours = [0] * len(tables)
+        for i, t in enumerate(tables):
+            for cell in ((t.row - 1, t.col), (t.row + 1, t.col), (t.row, t.col - 1), (t.row, t.col + 1)):
+                j = position.get(cell)
+                if j is not None:
+                    self.neighbours[i] |= 1 << j
+        self._memo: OrderedDict[tuple[int, int], tuple[int, ...] | None] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def free_mask(self, tables: list[Table]) -> int:
+        mask = 0
+        for i, table in enumerate(tables):
+            if not table.occupied:
+                mask |= 1 << i
+        return mask
+
+    def combination(self, free_mask: int, party_size: int) -> tuple[int, ...] | None:
+        """Fewest contiguous free tables seating `party_size`, least spare seats first; table ids."""
+        best = None
+        for component in self.components(free_mask):
+            found = self._component_best(component, party_size)
+            if found is not None and (best is None or self._rank(found) < self._rank(best)):
+                best = found
+        return None if best is None else tuple(self.ids[i] for i in _bits(best))
+
+    def candidates(self, party_size: int, limit: int) -> list[tuple[int, ...]]:
+        """Up to `limit` contiguous sets seating `party_size` with every table free, best first; table indices."""
+        everything = (1 << len(self.ids)) - 1
+        sets = [m for component in self.components(everything) for m in self._fitting(component, party_size)]
+        return [tuple(_bits(m)) for m in sorted(sets, key=self._rank)[:limit]]
+
+    def components(self, free_mask: int) -> list[int]:
+        """The connected groups of free tables, as bitmasks."""
+        found = []
+        while free_mask:
+            component = frontier = free_mask & -free_mask
+            while frontier:
+                grown = 0
+                for i in _bits(frontier):
+                    grown |= self.neighbours[i]
+                frontier = grown & free_mask & ~component
+                component |= frontier
+            found.append(component)
+            free_mask &= ~component
+        return found
+
+    def _component_best(self, component: int, party_size: int) -> int | None:
+        # Seating a party only changes its own component, so results (including
+        # "nothing fits") for the others stay valid across seatings.
+        key = (component, party_size)
+        with self._lock:
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                self.hits += 1
+                return self._memo[key]
+        self.misses += 1
+        fitting = self._fitting(component, party_size)
+        found = min(fitting, key=self._rank) if fitting else None
+        with self._lock:
+            self._memo[key] = found
+            if len(self._memo) > MEMO_SIZE:
+                self._memo.popitem(last=False)
+        return found
+
+    def _capacity(self, mask: int) -> int:
+        return sum(self.capacities[i] for i in _bits(mask))
+
+    def _rank(self, mask: int) -> tuple[int, int, int]:
+        return mask.bit_count(), self._capacity(mask), mask
+
+    def _fitting(self, component: int, party_size: int) -> list[int]:
+        """Connected sets in `component` with the fewest tables that seat `party_size`."""
+        largest = max(self.capacities[i] for i in _bits(component))
+        if self._capacity(component) < party_size or largest * MAX_COMBINED_TABLES < party_size:
+            return []
+        # Grow connected sets one adjacent table at a time, breadth first by set
+        # size, dropping sets that can't reach the party even if every table
+        # still to add were the largest one.
+        level = {1 << i: self.capacities[i] for i in _bits(component)}
+        nodes = len(level)
+        for size in range(1, MAX_COMBINED_TABLES + 1):
+            fitting = [m for m, seats in level.items() if seats >= party_size]
+            if fitting or size == MAX_COMBINED_TABLES:
+                return fitting
+            needed = party_size - (MAX_COMBINED_TABLES - size - 1) * largest
+            grown: dict[int, int] = {}
+            for mask, seats in level.items():
+                frontier = 0
+                for i in _bits(mask):
+                    frontier |= self.neighbours[i]
+                for j in _bits(frontier & component & ~mask):
+                    if seats + self.capacities[j] >= needed:
+                        grown[mask | 1 << j] = seats + self.capacities[j]
+                if nodes + len(grown) > MAX_SEARCH_NODES:
+                    return self._greedy(component, party_size)
+            if not grown:
+                return []
+            nodes += len(grown)
+            level = grown
+        return []
+
+    def _greedy(self, component: int, party_size: int) -> list[int]:
+        # From each table, keep adding the largest adjacent table until the party fits.
+        found = set()
+        for seed in _bits(component):
+            mask, seats, frontier = 1 << seed, self.capacities[seed], self.neighbours[seed] & component
+            while seats < party_size and mask.bit_count() < MAX_COMBINED_TABLES and frontier:
+                j = max(_bits(frontier), key=lambda i: (self.capacities[i], -i))
+                mask |= 1 << j
+                seats += self.capacities[j]
+                frontier = (frontier | self.neighbours[j] & component) & ~mask
+            if seats >= party_size:
+                found.add(mask)
+        fewest = min((m.bit_count() for m in found), default=0)
+        return [m for m in found if m.bit_count() == fewest]
+
+
+def _bits(mask: int):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+_graphs: dict[str, TableGraph] = {}
+_lock = threading.Lock()
+
+
+def graph_for(event: Event) -> TableGraph:
+    graph = _graphs.get(event.id)
+    if graph is None or len(graph.ids) != len(event.tables):
+        with _lock:
+            graph = _graphs[event.id] = TableGraph(event.tables)
+    return graph
+
+
+def forget(event_id: str) -> None:
+    _graphs.pop(event_id, None)
@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import functools
+import json
+import queue
+import random
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Callable, Iterator, TypeVar
+from uuid import uuid4
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.auth import is_staff
+from app.config import settings
+from app.errors import ensure_request_id
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "started_at", "_started", "duration_ms", "attributes", "thread", "_spans")
+
+    def __init__(self, trace_id: str, name: str, parent: Span | None = None, attributes: dict[str, Any] | None = None):
+        self.trace_id = trace_id
+        self.span_id = uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.name = name
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.duration_ms: float | None = None
+        self.attributes = attributes or {}
+        self.thread = threading.current_thread().name
+        # Every span of a trace appends itself to the root's list when it ends.
+        self._spans: list[Span] = parent._spans if parent else []
+
+    def end(self) -> None:
+        self.duration_ms = (time.perf_counter() - self._started) * 1000
+        self._spans.append(self)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentId": self.parent_id,
+            "name": self.name,
+            "startTime": datetime.fromtimestamp(self.started_at, timezone.utc).isoformat(),
+            "durationMs": round(self.duration_ms or 0.0, 4),
+            "thread": self.thread,
+            "attributes": self.attributes,
+        }
+
+
+_current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+class TraceBuffer:
+    """In-memory exporter: the most recent finished traces, keyed by request id."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._traces: OrderedDict[str, list[dict[str, Any]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def export(self, trace_id: str, spans: list[dict[str, Any]]) -> None:
+        with self._lock:
+            self._traces.pop(trace_id, None)
+            self._traces[trace_id] = spans
+            while len(self._traces) > self.max_size:
+                self._traces.popitem(last=False)
+
+    def get(self, trace_id: str) -> list[dict[str, Any]] | None:
+        return self._traces.get(trace_id)
+
+    def summaries(self) -> list[dict[str, Any]]:
+        with self._lock:
+            traces = list(self._traces.items())
+        summaries = []
+        for trace_id, spans in reversed(traces):
+            root = spans[-1]
+            summaries.append({"traceId": trace_id, "name": root["name"], "durationMs": root["durationMs"], "spans": len(spans), **root["attributes"]})
+        return summaries
+
+
+class JsonLinesExporter:
+    """Appends spans to a JSON-lines file from a background thread, off the request path."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue: queue.SimpleQueue[list[dict[str, Any]]] = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, trace_id: str, spans: list[dict[str, Any]]) -> None:
+        self._queue.put(spans)
+
+    def _run(self) -> None:
+        with open(self.path, "a", encoding="utf-8") as fh:
+            while True:
+                spans = self._queue.get()
+                fh.write("".join(json.dumps(span, default=str) + "\n" for span in spans))
+                if self._queue.empty():
+                    fh.flush()
+
+
+traces = TraceBuffer(settings.trace_buffer_size)
+exporters: list[TraceBuffer | JsonLinesExporter] = [traces]
+if settings.trace_file:
+    exporters.append(JsonLinesExporter(settings.trace_file))
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span | None]:
+    """Open a child span of the current one; a no-op outside a sampled trace."""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(parent.trace_id, name, parent, attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    finally:
+        _current_span.reset(token)
+        child.end()
+
+
+def traced(name: str | None = None) -> Callable[[F], F]:
+    """Decorate a function so each call inside a sampled trace records a span."""
+
+    def decorator(func: F) -> F:
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            parent = _current_span.get()
+            if parent is None:
+                return func(*args, **kwargs)
+            child = Span(parent.trace_id, label, parent)
+            token = _current_span.set(child)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _current_span.reset(token)
+                child.end()
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
+
+
+def _should_trace(scope: Scope) -> bool:
+    headers = dict(scope["headers"])
+    # Only staff can force a trace; everyone else is left to sampling.
+    if headers.get(b"x-trace") == b"1":
+        authorization, api_key = headers.get(b"authorization"), headers.get(b"x-api-key")
+        if is_staff(authorization and authorization.decode("latin-1"), api_key and api_key.decode("latin-1")):
+            return True
+    rate = settings.trace_sample_rate
+    return rate > 0 and random.random() < rate
+
+
+class TracingMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not _should_trace(scope):
+            await self.app(scope, receive, send)
+            return
+
+        request_id = ensure_request_id(scope)
+        root = Span(request_id, f"{scope['method']} {scope['path']}", attributes={"method": scope["method"], "path": scope["path"]})
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                root.attributes["status"] = message["status"]
+                message["headers"] = [*message.get("headers", []), (b"x-trace-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        token = _current_span.set(root)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_span.reset(token)
+            route = scope.get("route")
+            if route is not None:
+                root.name = f"{scope['method']} {route.path}"
+                root.attributes["route"] = route.path
+            root.end()
+            spans = [s.to_dict() for s in root._spans]
+            for exporter in exporters:
+                exporter.export(request_id, spans)
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Protocol
+
+from app.errors import ApiError
+
+# Objects map onto a fixed set of locks, so writers only wait for writers
+# touching one of the same entries or tables, never for the whole event.
+STRIPES = 64
+_locks = [threading.Lock() for _ in range(STRIPES)]
+
+
+class Versioned(Protocol):
+    version: int
+
+    def model_dump(self, **kwargs) -> dict: ...
+
+
+def _stripe(obj: Versioned) -> int:
+    # CPython object ids are 16-byte aligned.
+    return (id(obj) >> 4) % STRIPES
+
+
+def parse_if_match(value: str | None) -> int | None:
+    """Version from an `If-Match` header: `3`, `"3"` or `W/"3"`; `*` or no header matches anything."""
+    if value is None or value.strip() == "*":
+        return None
+    tag = value.strip().removeprefix("W/").strip('"')
+    if not tag.isdigit():
+        raise ApiError(400, "INVALID_INPUT", "If-Match must be a version number", {"ifMatch": value})
+    return int(tag)
+
+
+def etag(obj: Versioned) -> str:
+    return f'"{obj.version}"'
+
+
+def conflict(obj: Versioned) -> ApiError:
+    return ApiError(
+        409,
+        "VERSION_CONFLICT",
+        f"{type(obj).__name__} was changed by another request",
+        {"resource": type(obj).__name__, "version": obj.version, "current": obj.model_dump(mode="json")},
+    )
+
+
+def check_version(obj: Versioned, expected: int | None) -> None:
+    if expected is not None and obj.version != expected:
+        raise conflict(obj)
+
+
+@contextmanager
+def compare_and_swap(*expected: tuple[Versioned, int | None]) -> Iterator[None]:
+    """Write to objects only if none changed since their versions were read.
+
+    Holds the lock stripes of every object while comparing and while the
+    block writes, then bumps each version. A moved version raises
+    VERSION_CONFLICT carrying the object's current state, before any write.
+    An expected version of None skips the comparison but still locks and
+    bumps the object, for writes that move it without an `If-Match`.
+    """
+    stripes = sorted({_stripe(obj) for obj, _ in expected})
+    for i in stripes:
+        _locks[i].acquire()
+    try:
+        for obj, version in expected:
+            check_version(obj, version)
+        yield
+        for obj, _ in expected:
+            obj.version += 1
+    finally:
+        for i in reversed(stripes):
+            _locks[i].release()
+
+
+@contextmanager
+def exclusive() -> Iterator[None]:
+    """Hold every lock stripe, so no compare-and-swap runs until the block ends."""
+    for lock in _locks:
+        lock.acquire()
+    try:
+        yield
+    finally:
+        for lock in reversed(_locks):
+            lock.release()
+
+
+def bump(obj: Versioned) -> None:
+    """Move a version under its stripe, outside any compare-and-swap.
+
+    The stripes aren't reentrant: a block that also bumps `obj` lists it in
+    its own compare-and-swap with version None instead.
+    """
+    with compare_and_swap((obj, None)):
+        pass
@@ -0,0 +1,288 @@
+"""HTTP load generator for the waitlist API.
+
+Drives the FastAPI app either in-process (ASGI transport, the default) or
+against a running server (``--base-url http://localhost:8000``) and reports
+throughput and latency percentiles per route template.
+
+    python -m benchmarks.loadtest --scenario festival_opening --joins 5000
+    python -m benchmarks.loadtest --scenario all --compare bench_results/previous.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+import httpx
+
+AUTH_HEADERS = {"Authorization": "Bearer demo-token"}
+DEFAULT_OUT_DIR = Path("bench_results")
+
+
+@dataclass
+class LoadConfig:
+    joins: int = 2000
+    guests: int = 300
+    polls_per_guest: int = 5
+    tables: int = 240
+    bursts: int = 10
+    burst_size: int = 10
+    concurrency: int = 50
+
+
+@dataclass
+class RouteStats:
+    latencies_ms: list[float] = field(default_factory=list)
+    errors: int = 0
+    statuses: dict[int, int] = field(default_factory=lambda: defaultdict(int))
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = min(len(sorted_values), max(1, math.ceil(pct / 100 * len(sorted_values)))) - 1
+    return sorted_values[rank]
+
+
+class LoadRunner:
+    def __init__(self, client: httpx.AsyncClient, config: LoadConfig):
+        self.client = client
+        self.config = config
+        self.routes: dict[str, RouteStats] = defaultdict(RouteStats)
+        self._semaphore = asyncio.Semaphore(config.concurrency)
+
+    async def request(self, route: str, method: str, path: str, **kwargs: Any) -> httpx.Response:
+        async with self._semaphore:
+            started = time.perf_counter()
+            response = await self.client.request(method, path, **kwargs)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+
+        stats = self.routes[f"{method} {route}"]
+        stats.latencies_ms.append(elapsed_ms)
+        stats.statuses[response.status_code] += 1
+        if response.status_code >= 400:
+            stats.errors += 1
+        return response
+
+    async def create_event(self, event_type: str, **extra: Any) -> str:
+        start = datetime.now(timezone.utc)
+        payload = {
+            "name": f"Load test {event_type.lower()}",
+            "eventType": event_type,
+            "maxCapacity": 100_000,
+            "startTime": start.isoformat(),
+            "endTime": (start + timedelta(hours=8)).isoformat(),
+            **extra,
+        }
+        response = await self.request("/v1/events", "POST", "/v1/events", json=payload, headers=AUTH_HEADERS)
+        response.raise_for_status()
+        return response.json()["id"]
+
+    async def join(self, event_id: str, index: int, entry_type: str = "waitlist") -> str | None:
+        response = await self.request(
+            "/v1/events/{event_id}/waitlist",
+            "POST",
+            f"/v1/events/{event_id}/waitlist",
+            json={"name": f"Guest {index:06d}", "partySize": 1 + index % 4, "type": entry_type},
+        )
+        return response.json()["id"] if response.status_code == 200 else None
+
+    async def gather(self, calls: list[Awaitable[Any]]) -> list[Any]:
+        return await asyncio.gather(*calls)
+
+
+async def festival_opening(runner: LoadRunner) -> None:
+    """Doors open: thousands of guests join an outdoor event at once."""
+    event_id = await runner.create_event("OUTDOOR")
+    await runner.gather([runner.join(event_id, i) for i in range(runner.config.joins)])
+
+
+async def steady_state(runner: LoadRunner) -> None:
+    """Guests already in line poll their entry and the wait estimate and send pings."""
+    event_id = await runner.create_event("OUTDOOR")
+    entry_ids = [e for e in await runner.gather([runner.join(event_id, i) for i in range(runner.config.guests)]) if e]
+
+    async def guest(entry_id: str) -> None:
+        for _ in range(runner.config.polls_per_guest):
+            await runner.request(
+                "/v1/events/{event_id}/waitlist/{entry_id}", "GET", f"/v1/events/{event_id}/waitlist/{entry_id}"
+            )
+            await runner.request(
+                "/v1/events/{event_id}/predicted-wait",
+                "GET",
+                f"/v1/events/{event_id}/predicted-wait",
+                headers=AUTH_HEADERS,
+            )
+            await runner.request(
+                "/v1/events/{event_id}/entries/{entry_id}/ping", "POST", f"/v1/events/{event_id}/entries/{entry_id}/ping"
+            )
+
+    await runner.gather([guest(entry_id) for entry_id in entry_ids])
+
+
+async def staff_burst(runner: LoadRunner) -> None:
+    """Staff tablets promote and seat parties in bursts while polling the dashboard."""
+    config = runner.config
+    event_id = await runner.create_event("INDOOR_TABLES", totalTables=config.tables)
+    joined = await runner.gather([runner.join(event_id, i) for i in range(config.bursts * config.burst_size)])
+    queued = sum(1 for entry_id in joined if entry_id)
+
+    for _ in range(config.bursts):
+        promoted: list[dict] = []
+        # Promote at most 20 per request, and never more than the burst or the queue holds.
+        remaining = min(config.burst_size, queued)
+        while remaining > 0:
+            response = await runner.request(
+                "/v1/events/{event_id}/staff/promote",
+                "POST",
+                f"/v1/events/{event_id}/staff/promote",
+                json={"count": min(20, remaining)},
+                headers=AUTH_HEADERS,
+            )
+            if response.status_code != 200:
+                break
+            batch = response.json()["promoted"]
+            promoted.extend(batch)
+            remaining -= len(batch)
+            queued -= len(batch)
+            if not batch:
+                break
+
+        calls: list[Awaitable[Any]] = [
+            runner.request(
+                "/v1/events/{event_id}/staff/seat",
+                "POST",
+                f"/v1/events/{event_id}/staff/seat",
+                json={"entryId": entry["id"], "tableId": entry["assignedTableId"]},
+                headers=AUTH_HEADERS,
+            )
+            for entry in promoted
+        ]
+        calls.append(
+            runner.request(
+                "/v1/events/{event_id}/staff/dashboard",
+                "GET",
+                f"/v1/events/{event_id}/staff/dashboard",
+                headers=AUTH_HEADERS,
+            )
+        )
+        await runner.gather(calls)
+
+
+SCENARIOS: dict[str, Callable[[LoadRunner], Awaitable[None]]] = {
+    "festival_opening": festival_opening,
+    "steady_state": steady_state,
+    "staff_burst": staff_burst,
+}
+
+
+def summarize(routes: dict[str, RouteStats], elapsed: float) -> dict[str, dict[str, Any]]:
+    summary: dict[str, dict[str, Any]] = {}
+    for route, stats in sorted(routes.items()):
+        values = sorted(stats.latencies_ms)
+        summary[route] = {
+            "count": len(values),
+            "errors": stats.errors,
+            "statuses": {str(code): n for code, n in sorted(stats.statuses.items())},
+            "throughputRps": round(len(values) / elapsed, 2) if elapsed else 0.0,
+            "meanMs": round(sum(values) / len(values), 3) if values else 0.0,
+            "p50Ms": round(percentile(values, 50), 3),
+            "p95Ms": round(percentile(values, 95), 3),
+            "p99Ms": round(percentile(values, 99), 3),
+            "maxMs": round(values[-1], 3) if values else 0.0,
+        }
+    return summary
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_scenario(name: str, config: LoadConfig, base_url: str | None = None) -> dict[str, Any]:
+    if base_url:
+        client = httpx.AsyncClient(base_url=base_url, timeout=30)
+    else:
+        from app.main import app
+
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest", timeout=30)
+
+    async with client:
+        runner = LoadRunner(client, config)
+        started = time.perf_counter()
+        await SCENARIOS[name](runner)
+        elapsed = time.perf_counter() - started
+
+    return {
+        "scenario": name,
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "target": base_url or "in-process",
+        "config": asdict(config),
+        "elapsedSeconds": round(elapsed, 3),
+        "totalRequests": sum(len(s.latencies_ms) for s in runner.routes.values()),
+        "routes": summarize(runner.routes, elapsed),
+    }
+
+
+def print_report(result: dict[str, Any], previous: dict[str, Any] | None = None) -> None:
+    print(f"\n== {result['scenario']} ({result['totalRequests']} requests in {result['elapsedSeconds']}s) ==")
+    print(f"{'Route':<52} | {'n':>6} | {'err':>4} | {'rps':>8} | {'p50':>8} | {'p95':>8} | {'p99':>8} | {'Δp95':>8}")
+    print("-" * 124)
+    prev_routes = (previous or {}).get("routes", {})
+    for route, row in result["routes"].items():
+        delta = ""
+        if route in prev_routes and prev_routes[route]["p95Ms"]:
+            delta = f"{(row['p95Ms'] / prev_routes[route]['p95Ms'] - 1) * 100:+.0f}%"
+        print(
+            f"{route:<52} | {row['count']:>6} | {row['errors']:>4} | {row['throughputRps']:>8.1f} | "
+            f"{row['p50Ms']:>8.2f} | {row['p95Ms']:>8.2f} | {row['p99Ms']:>8.2f} | {delta:>8}"
+        )
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=[*SCENARIOS, "all"], default="all")
+    parser.add_argument("--base-url", help="Target a running server instead of the in-process app")
+    parser.add_argument("--out", type=Path, help="JSON results file (default: bench_results/loadtest-<commit>-<ts>.json)")
+    parser.add_argument("--compare", type=Path, help="Previous results file to diff p95 latencies against")
+    defaults = LoadConfig()
+    for name, value in asdict(defaults).items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, default=value)
+    args = parser.parse_args(argv)
+
+    config = LoadConfig(**{name: getattr(args, name) for name in asdict(defaults)})
+    names = list(SCENARIOS) if args.scenario == "all" else [args.scenario]
+    previous = json.loads(args.compare.read_text()) if args.compare else None
+    previous_by_scenario = {r["scenario"]: r for r in (previous or {}).get("results", [])}
+
+    results = []
+    for name in names:
+        result = asyncio.run(run_scenario(name, config, args.base_url))
+        print_report(result, previous_by_scenario.get(name))
+        results.append(result)
+
+    out = args.out
+    if out is None:
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        out = DEFAULT_OUT_DIR / f"loadtest-{git_commit() or 'local'}-{stamp}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps({"results": results}, indent=2))
+    print(f"\nResults written to {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
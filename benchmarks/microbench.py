@@ -0,0 +1,261 @@
+"""Microbenchmarks for the service-layer hot paths with regression gating.
+
+Each case times one service function directly against a synthetic store of
+1k/10k/100k entries (and 10-500 tables for table assignment). Two gates are
+applied:
+
+* baseline: fail if a case got slower than ``--tolerance`` relative to the
+  recorded baseline (``--record`` writes a new one for this machine);
+* scaling: fail if a function's cost grows faster than ``n ** --max-exponent``
+  between the smallest and largest store, which flags accidental quadratic
+  paths independently of the machine the suite runs on.
+
+    python -m benchmarks.microbench --record
+    python -m benchmarks.microbench --tolerance 0.3
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import sys
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Callable
+
+from app import activity, guests, queues, services, simulation, slots, tables
+from app.cache import event_cache
+from app.models import (
+    EntryStatus,
+    EntryType,
+    Event,
+    EventType,
+    PromoteRequest,
+    Table,
+    WaitlistCreate,
+    WaitlistEntry,
+    now_utc,
+)
+from app.store import store
+
+DEFAULT_BASELINE = Path(__file__).with_name("baseline.json")
+ENTRY_SIZES = (1_000, 10_000, 100_000)
+TABLE_SIZES = (10, 100, 500)
+DEFAULT_TABLES = 100
+
+
+@dataclass
+class Case:
+    name: str
+    size: int
+    call: Callable[[], Any]
+    reset: Callable[[], None] | None = None
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}[{self.size}]"
+
+
+def build_event(event_id: str, entries: int, tables: int) -> Event:
+    """Populate the global store with a realistic mid-service event.
+
+    Roughly 70% of the entries are still queued, the rest have been seated,
+    marked no-show or cancelled, and 20% of the tables are occupied.
+    """
+    start = now_utc() - timedelta(hours=2)
+    event = Event(
+        id=event_id,
+        name=f"Bench {entries}x{tables}",
+        eventType=EventType.INDOOR_TABLES,
+        maxCapacity=entries * 4,
+        startTime=start,
+        endTime=start + timedelta(hours=8),
+        totalTables=tables,
+        tables=[Table(id=i + 1, name=f"Table {i + 1}", capacity=2 + 2 * (i % 4), row=i // 4, col=i % 4) for i in range(tables)],
+    )
+    for table in event.tables[: tables // 5]:
+        table.occupied = True
+
+    finished = (EntryStatus.SEATED, EntryStatus.SEATED, EntryStatus.NO_SHOW, EntryStatus.CANCELLED)
+    waitlist: list[WaitlistEntry] = []
+    position = 0
+    for i in range(entries):
+        status = finished[i % 4] if i % 10 < 3 else EntryStatus.QUEUED
+        if status == EntryStatus.QUEUED:
+            position += 1
+        waitlist.append(
+            WaitlistEntry.model_construct(
+                id=f"{event_id}-{i:07d}",
+                eventId=event_id,
+                name=f"Guest {i:07d}",
+                partySize=1 + i % 6,
+                type=EntryType.reservation if i % 5 == 0 else EntryType.waitlist,
+                status=status,
+                position=position if status == EntryStatus.QUEUED else 0,
+                estimatedWait=max(5, position * 8),
+                joinedAt=start + timedelta(seconds=i),
+                assignedTableId=None,
+                interactionCount=i % 7,
+                lastActiveTime=start + timedelta(seconds=i),
+                isHighRisk=False,
+            )
+        )
+
+    store.waitlists[event_id] = waitlist
+    queues.forget(event_id)
+    guests.forget(event_id)
+    services.save_event(event)
+    return event
+
+
+def entry_cases(size: int) -> list[Case]:
+    event_id = f"bench-{size}"
+    event = build_event(event_id, size, DEFAULT_TABLES)
+    waitlist = store.waitlists[event_id]
+    last_id = waitlist[-1].id
+    joins = iter(range(10**9))
+    last_page = max(1, math.ceil(sum(1 for e in waitlist if e.status == EntryStatus.QUEUED) / 100))
+    promote_payload = PromoteRequest(count=5)
+
+    def reset_promote() -> None:
+        # Put promoted guests back through the queue index and free their tables,
+        # so every sample promotes the same guests from the same queue.
+        event_queues = services.get_queues(event)
+        for entry in waitlist:
+            if entry.status == EntryStatus.NOTIFIED:
+                services._release(event, entry)
+                event_queues.set_status(entry, EntryStatus.QUEUED)
+
+    # Coalesced reads are timed through __wrapped__; the single-flight cache would
+    # otherwise answer every sample after the first.
+    return [
+        Case("get_waitlist_entry", size, lambda: services.get_waitlist_entry(event_id, last_id)),
+        Case(
+            "add_waitlist_entry",
+            size,
+            lambda: services.add_waitlist_entry(event_id, WaitlistCreate(name=f"Walk-in {next(joins)}", partySize=2)),
+        ),
+        Case("calculate_heuristic_wait", size, lambda: services.calculate_heuristic_wait.__wrapped__(event_id)),
+        Case("get_real_time_no_show_rate", size, lambda: services.get_real_time_no_show_rate(event_id)),
+        Case("promote", size, lambda: services.promote(event_id, promote_payload), reset_promote),
+        Case("list_waitlist", size, lambda: services.list_waitlist(event_id, last_page, 100, None, EntryStatus.QUEUED)),
+        Case("get_dashboard", size, lambda: services.get_dashboard.__wrapped__(event_id)),
+    ]
+
+
+def table_cases(size: int) -> list[Case]:
+    event = build_event(f"bench-tables-{size}", 0, size)
+    return [
+        Case("_best_table", size, lambda: services._best_table(event, 5)),
+        Case("_table_set", size, lambda: services._table_set(event, 10)),
+    ]
+
+
+def measure(case: Case, samples: int = 5, min_sample_seconds: float = 0.002) -> float:
+    """Return the best observed seconds-per-call over ``samples`` timed batches."""
+    if case.reset:
+        case.reset()
+    started = time.perf_counter()
+    case.call()
+    single = max(time.perf_counter() - started, 1e-7)
+    # Stateful cases are reset between calls, so time them one call at a time.
+    number = 1 if case.reset else max(1, int(min_sample_seconds / single))
+
+    best = math.inf
+    for _ in range(samples):
+        if case.reset:
+            case.reset()
+        started = time.perf_counter()
+        for _ in range(number):
+            case.call()
+        best = min(best, (time.perf_counter() - started) / number)
+    return best
+
+
+def run(entry_sizes: tuple[int, ...] = ENTRY_SIZES, table_sizes: tuple[int, ...] = TABLE_SIZES, samples: int = 5) -> dict[str, float]:
+    results: dict[str, float] = {}
+    try:
+        for size in entry_sizes:
+            for case in entry_cases(size):
+                results[case.key] = measure(case, samples)
+        for size in table_sizes:
+            for case in table_cases(size):
+                results[case.key] = measure(case, samples)
+    finally:
+        for event_id in [k for k in store.events if k.startswith("bench-")]:
+            store.events.pop(event_id, None)
+            store.waitlists.pop(event_id, None)
+            store.reservations.pop(event_id, None)
+            store.revisions.pop(event_id, None)
+            event_cache.invalidate(event_id)
+            simulation.forget(event_id)
+            activity.forget(event_id)
+            queues.forget(event_id)
+            guests.forget(event_id)
+            slots.forget(event_id)
+            tables.forget(event_id)
+    return results
+
+
+def check_baseline(results: dict[str, float], baseline: dict[str, float], tolerance: float) -> list[str]:
+    failures = []
+    for key, seconds in results.items():
+        previous = baseline.get(key)
+        if previous and seconds > previous * (1 + tolerance):
+            failures.append(f"{key}: {seconds * 1e6:.1f}us vs baseline {previous * 1e6:.1f}us (+{(seconds / previous - 1) * 100:.0f}%)")
+    return failures
+
+
+def check_scaling(results: dict[str, float], max_exponent: float) -> list[str]:
+    by_name: dict[str, dict[int, float]] = {}
+    for key, seconds in results.items():
+        name, size = key[:-1].split("[")
+        by_name.setdefault(name, {})[int(size)] = seconds
+
+    failures = []
+    for name, points in by_name.items():
+        if len(points) < 2:
+            continue
+        small, large = min(points), max(points)
+        exponent = math.log(points[large] / points[small]) / math.log(large / small)
+        if exponent > max_exponent:
+            failures.append(f"{name}: cost grows as n^{exponent:.2f} between {small} and {large} (limit n^{max_exponent})")
+    return failures
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--record", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Allowed slowdown vs baseline (0.5 = +50%%)")
+    parser.add_argument("--max-exponent", type=float, default=1.3, help="Largest allowed growth exponent across sizes")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(ENTRY_SIZES))
+    parser.add_argument("--tables", type=int, nargs="+", default=list(TABLE_SIZES))
+    parser.add_argument("--samples", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    results = run(tuple(args.sizes), tuple(args.tables), args.samples)
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+
+    print(f"{'Case':<36} | {'per call':>12} | {'baseline':>12}")
+    print("-" * 66)
+    for key, seconds in results.items():
+        previous = f"{baseline[key] * 1e6:.1f}us" if key in baseline else "-"
+        print(f"{key:<36} | {seconds * 1e6:>10.1f}us | {previous:>12}")
+
+    if args.record:
+        args.baseline.write_text(json.dumps(results, indent=2, sort_keys=True))
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    failures = check_baseline(results, baseline, args.tolerance) + check_scaling(results, args.max_exponent)
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
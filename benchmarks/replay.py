@@ -0,0 +1,198 @@
+"""Replay captured traffic against the app in-process on a virtual clock.
+
+Start the server with ``CAPTURE_FILE`` set to record every request, then feed
+the log back through the ASGI app. ``now_utc`` follows each record's capture
+time instead of the wall clock, and requests are sent back to back, so a night
+of traffic replays in seconds:
+
+    CAPTURE_FILE=capture.jsonl.gz uvicorn app.main:app
+    python -m benchmarks.replay capture.jsonl.gz
+
+The report gives latency per route template, replayed next to captured, and
+lists every response whose status differs from the recording. It also checks
+every waitlist entry seen in a recorded response: the replayed store must end
+in the same status. Ids created during the replay differ from the recorded
+ones, so they are learned from responses and substituted into later requests.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import re
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterable
+
+import httpx
+
+from benchmarks.loadtest import percentile
+
+UUID_RE = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+ID_KEYS = frozenset({"id", "eventId", "entryId"})
+REPLAY_AUTH = {"Authorization": "Bearer demo-token"}
+MAX_REPORTED = 20
+
+
+class VirtualClock:
+    def __init__(self, start: datetime):
+        self.now = start
+
+    def __call__(self) -> datetime:
+        return self.now
+
+    def advance_to(self, moment: datetime) -> None:
+        self.now = max(self.now, moment)
+
+
+class IdMap:
+    """Recorded id -> id the replay created for the same object."""
+
+    def __init__(self) -> None:
+        self.ids: dict[str, str] = {}
+
+    def learn(self, recorded: Any, replayed: Any) -> None:
+        if isinstance(recorded, dict) and isinstance(replayed, dict):
+            for key, value in recorded.items():
+                other = replayed.get(key)
+                if key in ID_KEYS and isinstance(value, str) and isinstance(other, str):
+                    self.ids.setdefault(value, other)
+                else:
+                    self.learn(value, other)
+        elif isinstance(recorded, list) and isinstance(replayed, list):
+            for value, other in zip(recorded, replayed):
+                self.learn(value, other)
+
+    def translate(self, text: str) -> str:
+        return UUID_RE.sub(lambda m: self.ids.get(m.group(), m.group()), text)
+
+
+def _entries(body: Any) -> Iterable[dict]:
+    """Waitlist-entry-shaped objects anywhere in a response body."""
+    if isinstance(body, dict):
+        if {"id", "eventId", "status", "partySize"} <= body.keys():
+            yield body
+        for value in body.values():
+            yield from _entries(value)
+    elif isinstance(body, list):
+        for value in body:
+            yield from _entries(value)
+
+
+def check_state(last_seen: dict[str, dict], ids: IdMap) -> list[str]:
+    from app.store import store
+
+    mismatches = []
+    for recorded_id, recorded in last_seen.items():
+        entry_id = ids.ids.get(recorded_id, recorded_id)
+        event_id = ids.ids.get(recorded["eventId"], recorded["eventId"])
+        entry = next((e for e in store.waitlists.get(event_id, ()) if e.id == entry_id), None)
+        if entry is None:
+            mismatches.append(f"entry {recorded_id}: missing after replay")
+        elif entry.status != recorded["status"]:
+            mismatches.append(f"entry {recorded_id}: {entry.status} after replay, {recorded['status']} recorded")
+    return mismatches
+
+
+async def replay(records: list[dict], app: Any = None) -> dict[str, Any]:
+    from app.bootstrap import seed_demo_data
+    from app.models import set_clock
+
+    if app is None:
+        from app.main import app
+
+    seed_demo_data()
+    replayable = [r for r in records if not r.get("trunc")]
+    times = [datetime.fromisoformat(r["t"]) for r in replayable]
+    clock = VirtualClock(times[0] if times else datetime.now().astimezone())
+    ids = IdMap()
+    routes: dict[str, dict[str, list[float]]] = {}
+    status_mismatches: list[str] = []
+    last_seen: dict[str, dict] = {}
+
+    set_clock(clock)
+    started = time.perf_counter()
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://replay", timeout=30) as client:
+            for record, moment in zip(replayable, times):
+                clock.advance_to(moment)
+                headers = dict(record.get("h", {}))
+                if record.get("auth"):
+                    headers.update(REPLAY_AUTH)
+                url = ids.translate(record["p"]) + (f"?{ids.translate(record['q'])}" if record.get("q") else "")
+                sent = time.perf_counter()
+                response = await client.request(record["m"], url, headers=headers, content=ids.translate(record.get("b", "")).encode())
+                elapsed_ms = (time.perf_counter() - sent) * 1000
+
+                row = routes.setdefault(f"{record['m']} {record.get('route') or record['p']}", {"replayed": [], "captured": []})
+                row["replayed"].append(elapsed_ms)
+                row["captured"].append(record["ms"])
+                if response.status_code != record["s"]:
+                    status_mismatches.append(f"{record['m']} {record['p']} at {record['t']}: {response.status_code}, {record['s']} recorded")
+                if "r" in record and response.headers.get("content-type", "").startswith("application/json"):
+                    recorded_body = json.loads(record["r"])
+                    ids.learn(recorded_body, response.json())
+                    for entry in _entries(recorded_body):
+                        last_seen[entry["id"]] = entry
+    finally:
+        set_clock(None)
+    wall = time.perf_counter() - started
+
+    state_mismatches = check_state(last_seen, ids)
+    return {
+        "requests": len(replayable),
+        "skipped": len(records) - len(replayable),
+        "virtualSeconds": round((times[-1] - times[0]).total_seconds(), 3) if times else 0.0,
+        "wallSeconds": round(wall, 3),
+        "routes": {
+            route: {
+                "count": len(row["replayed"]),
+                "p50Ms": round(percentile(sorted(row["replayed"]), 50), 3),
+                "p95Ms": round(percentile(sorted(row["replayed"]), 95), 3),
+                "maxMs": round(max(row["replayed"]), 3),
+                "capturedP95Ms": round(percentile(sorted(row["captured"]), 95), 3),
+            }
+            for route, row in sorted(routes.items())
+        },
+        "checkedEntries": len(last_seen),
+        "statusMismatches": status_mismatches[:MAX_REPORTED],
+        "stateMismatches": state_mismatches[:MAX_REPORTED],
+        "mismatches": len(status_mismatches) + len(state_mismatches),
+    }
+
+
+def print_report(report: dict[str, Any]) -> None:
+    print(
+        f"\n== replayed {report['requests']} requests ({report['skipped']} skipped): "
+        f"{report['virtualSeconds']}s of traffic in {report['wallSeconds']}s =="
+    )
+    print(f"{'Route':<60} | {'n':>6} | {'p50':>8} | {'p95':>8} | {'max':>8} | {'captured p95':>12}")
+    print("-" * 116)
+    for route, row in report["routes"].items():
+        print(f"{route:<60} | {row['count']:>6} | {row['p50Ms']:>8.2f} | {row['p95Ms']:>8.2f} | {row['maxMs']:>8.2f} | {row['capturedP95Ms']:>12.2f}")
+    print(f"\n{report['checkedEntries']} entries checked, {report['mismatches']} mismatches")
+    for line in report["statusMismatches"] + report["stateMismatches"]:
+        print(f"  {line}")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("capture", type=Path, help="Log written with CAPTURE_FILE")
+    parser.add_argument("--out", type=Path, help="Also write the report as JSON")
+    args = parser.parse_args(argv)
+
+    from app.capture import read_capture
+
+    report = asyncio.run(replay(list(read_capture(args.capture))))
+    print_report(report)
+    if args.out:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(json.dumps(report, indent=2))
+    return 1 if report["mismatches"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,6 @@
+import csv
+import json
+
 from fastapi.testclient import TestClient
 
 from app.main import app
@@ -88,3 +91,945 @@ def test_seeded_demo_records_exist_for_frontend_boilerplates():
     )
     assert add_to_legacy_event.status_code == 200
     assert add_to_legacy_event.json()["eventId"] == "223"
+
+
+def test_metrics_exports_route_templates_and_event_gauges():
+    event_id = client.post(
+        "/v1/events",
+        headers=auth_headers(),
+        json={
+            "name": "Metrics Cafe",
+            "eventType": "INDOOR_TABLES",
+            "maxCapacity": 40,
+            "totalTables": 6,
+            "startTime": "2026-03-20T17:00:00Z",
+            "endTime": "2026-03-20T23:00:00Z",
+        },
+    ).json()["id"]
+    client.post(f"/v1/events/{event_id}/waitlist", json={"name": "Metrics Guest", "partySize": 2})
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert 'http_requests_total{method="POST",route="/v1/events/{event_id}/waitlist",status="200"}' in body
+    assert event_id not in body.split("# HELP waitlist_queue_length")[0]
+    assert f'waitlist_queue_length{{event_id="{event_id}",type="waitlist"}} 1' in body
+    assert f'event_free_tables{{event_id="{event_id}"}} 6' in body
+    assert f'event_max_capacity{{event_id="{event_id}"}} 40' in body
+
+
+def test_profiled_request_is_retrievable_by_request_id(monkeypatch):
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "profile_token", "let-me-profile")
+    response = client.get(
+        "/v1/events/223/predicted-wait",
+        headers={**auth_headers(), "x-profile": "let-me-profile", "x-request-id": "req-profile-1"},
+    )
+    assert response.headers["x-profile-id"] == "req-profile-1"
+
+    unprofiled = client.get("/v1/events/223/predicted-wait", headers={**auth_headers(), "x-profile": "wrong"})
+    assert "x-profile-id" not in unprofiled.headers
+
+    assert client.get("/debug/profiles/req-profile-1").status_code == 401
+    profile = client.get("/debug/profiles/req-profile-1", headers=auth_headers()).json()
+    assert profile["route"] == "/v1/events/{event_id}/predicted-wait"
+    assert "calculate_heuristic_wait" in profile["stats"]
+    listing = client.get("/debug/profiles", headers=auth_headers()).json()["data"]
+    assert listing[0]["requestId"] == "req-profile-1" and "stats" not in listing[0]
+
+
+def test_sampled_request_records_service_spans():
+    event_id = client.post(
+        "/v1/events",
+        headers=auth_headers(),
+        json={
+            "name": "Trace Bistro",
+            "eventType": "INDOOR_TABLES",
+            "maxCapacity": 20,
+            "totalTables": 2,
+            "startTime": "2026-03-20T17:00:00Z",
+            "endTime": "2026-03-20T23:00:00Z",
+        },
+    ).json()["id"]
+    client.post(f"/v1/events/{event_id}/waitlist", json={"name": "Traced Guest", "partySize": 2})
+
+    response = client.post(
+        f"/v1/events/{event_id}/staff/promote",
+        headers={**auth_headers(), "x-trace": "1", "x-request-id": "req-trace-1"},
+        json={"count": 1},
+    )
+    assert response.headers["x-trace-id"] == "req-trace-1"
+    anonymous = client.get(f"/v1/events/{event_id}/waitlist", headers={"x-trace": "1"})
+    assert "x-trace-id" not in anonymous.headers
+
+    spans = client.get("/debug/traces/req-trace-1", headers=auth_headers()).json()["spans"]
+    root = spans[-1]
+    assert root["name"] == "POST /v1/events/{event_id}/staff/promote"
+    assert root["parentId"] is None and root["attributes"]["status"] == 200
+    names = {s["name"] for s in spans}
+    assert {"get_event", "waitlist.schedule", "_best_table"} <= names
+    assert all(s["traceId"] == "req-trace-1" for s in spans)
+
+
+def test_bulk_import_streams_records_and_reports_line_errors():
+    event_id = client.post(
+        "/v1/events",
+        headers=auth_headers(),
+        json={
+            "name": "Import Hall",
+            "eventType": "OUTDOOR",
+            "maxCapacity": 500,
+            "startTime": "2026-03-20T17:00:00Z",
+            "endTime": "2026-03-20T23:00:00Z",
+        },
+    ).json()["id"]
+    client.post(f"/v1/events/{event_id}/waitlist", json={"name": "Already Here", "partySize": 2})
+
+    ndjson = "\n".join(
+        [
+            '{"name": "Ada Lovelace", "partySize": 2, "type": "reservation"}',
+            '{"name": "already here", "partySize": 3}',
+            '{"name": "X", "partySize": 0}',
+            "not json",
+            "",
+            '{"name": "Grace Hopper", "partySize": 4}',
+        ]
+    )
+    result = client.post(
+        f"/v1/events/{event_id}/waitlist/import",
+        headers={**auth_headers(), "Content-Type": "application/x-ndjson"},
+        content=ndjson,
+    ).json()
+    assert result["imported"] == 2
+    assert [(e["line"], e["code"]) for e in result["errors"]] == [
+        (2, "ALREADY_EXISTS"),
+        (3, "INVALID_INPUT"),
+        (4, "INVALID_INPUT"),
+    ]
+
+    csv_body = "name,partySize,type,sms\nAlan Turing,2,reservation,true\nAda Lovelace,2,waitlist,false\n"
+    result = client.post(
+        f"/v1/events/{event_id}/waitlist/import",
+        headers={**auth_headers(), "Content-Type": "text/csv"},
+        content=csv_body,
+    ).json()
+    assert result["imported"] == 1 and result["errors"][0]["line"] == 3
+
+    listing = client.get(f"/v1/events/{event_id}/waitlist", headers=auth_headers()).json()
+    assert [e["position"] for e in listing["data"]] == [1, 2, 3, 4]
+
+
+def test_export_streams_snapshot_unaffected_by_concurrent_writes(monkeypatch):
+    from app import exports
+
+    monkeypatch.setattr(exports, "CHUNK_ROWS", 1)
+
+    event_id = client.post(
+        "/v1/events",
+        headers=auth_headers(),
+        json={
+            "name": "Export Gala",
+            "eventType": "OUTDOOR",
+            "maxCapacity": 500,
+            "startTime": "2026-03-20T17:00:00Z",
+            "endTime": "2026-03-20T23:00:00Z",
+        },
+    ).json()["id"]
+    ids = [
+        client.post(f"/v1/events/{event_id}/waitlist", json={"name": f"Exported {i}", "partySize": 2}).json()["id"]
+        for i in range(3)
+    ]
+
+    csv_export = client.get(f"/v1/events/{event_id}/export?format=csv", headers=auth_headers())
+    assert csv_export.headers["content-type"].startswith("text/csv")
+    lines = csv_export.text.strip().split("\n")
+    assert lines[0].startswith("id,eventId,name") and len(lines) == 4 and "phoneNumber" not in lines[0]
+    # Scalar columns only, in the shape the CSV import reads back.
+    from app.imports import _csv_record, waitlist_create_adapter
+
+    header, row = next(csv.reader([lines[0]])), next(csv.reader([lines[1]]))
+    assert {"sms", "push"} <= set(header) and "notificationPreferences" not in header and not any("{" in v or "[" in v for v in row)
+    assert waitlist_create_adapter.validate_python(_csv_record(header, row)).name == "Exported 0"
+
+    stream = exports.export_waitlist(event_id, "ndjson")
+    first_chunk = next(stream)  # snapshot is taken when the stream starts
+    client.post(f"/v1/events/{event_id}/staff/seat", headers=auth_headers(), json={"entryId": ids[1]})
+    client.post(f"/v1/events/{event_id}/waitlist", json={"name": "Late Arrival", "partySize": 2})
+    rows = [json.loads(line) for line in (first_chunk + "".join(stream)).splitlines()]
+    assert [row["status"] for row in rows] == ["QUEUED", "QUEUED", "QUEUED"]
+
+    rows = [json.loads(line) for line in client.get(f"/v1/events/{event_id}/export", headers=auth_headers()).text.splitlines()]
+    assert [row["status"] for row in rows] == ["QUEUED", "SEATED", "QUEUED", "QUEUED"]
+
+
+def test_create_event_uses_venue_history_as_priors():
+    from datetime import datetime, timedelta, timezone
+
+    from app.models import EntryStatus, WaitlistEntry
+    from app.store import store
+
+    past = client.post(
+        "/v1/events",
+        headers=auth_headers(),
+        json={
+            "name": "Tuesday Trivia",
+            "location": "Analytics Arms",
+            "eventType": "OUTDOOR",
+            "maxCapacity": 200,
+            "startTime": "2025-01-07T18:00:00Z",
+            "endTime": "2025-01-07T22:00:00Z",
+        },
+    ).json()["id"]
+    start = datetime(2025, 1, 7, 18, 0, tzinfo=timezone.utc)
+    for i in range(40):
+        entry = WaitlistEntry(eventId=past, name=f"Regular {i}", partySize=2, type="waitlist", position=0, estimatedWait=0)
+        entry.joinedAt = start + timedelta(minutes=i)
+        entry.status = EntryStatus.NO_SHOW if i % 4 == 0 else EntryStatus.SEATED
+        entry.completedAt = start + timedelta(minutes=5 * (i + 1))
+        store.waitlists[past].append(entry)
+
+    upcoming = client.post(
+        "/v1/events",
+        headers=auth_headers(),
+        json={
+            "name": "Next Tuesday Trivia",
+            "location": "analytics arms",
+            "eventType": "OUTDOOR",
+            "maxCapacity": 200,
+            "startTime": "2030-01-14T18:00:00Z",
+            "endTime": "2030-01-14T22:00:00Z",
+        },
+    ).json()
+    assert upcoming["historical_no_show_rate"] == 0.25
+    assert upcoming["avg_service_time"] == 6.7  # 200 minutes over 30 seated parties
+
+    analytics = client.get(f"/v1/events/{upcoming['id']}/analytics", headers=auth_headers()).json()
+    assert analytics["events"] == 1 and analytics["entries"] == 40
+    assert analytics["byHour"][0]["key"] == 18
+    assert analytics["byPartySize"] == [
+        {"key": 2, "samples": 40, "noShowRate": 0.25, "abandonmentRate": 0.0, "avgServiceTime": 6.6667}
+    ]
+
+
+def test_simulated_wait_distribution_per_entry_and_party_size(monkeypatch):
+    from app.config import settings
+
+    # The per-request budget is wall-clock; give slow CI machines room to finish.
+    monkeypatch.setattr(settings, "simulation_budget_ms", 5000)
+    event_id = client.post(
+        "/v1/events",
+        headers=auth_headers(),
+        json={
+            "name": "Simulated Supper",
+            "eventType": "INDOOR_TABLES",
+            "maxCapacity": 60,
+            "totalTables": 2,
+            "startTime": "2026-03-20T17:00:00Z",
+            "endTime": "2026-03-20T23:00:00Z",
+        },
+    ).json()["id"]
+    ids = [
+        client.post(f"/v1/events/{event_id}/waitlist", json={"name": f"Diner {i}", "partySize": size}).json()["id"]
+        for i, size in enumerate([2, 4, 2, 6])
+    ]
+
+    dist = client.get(f"/v1/events/{event_id}/predicted-wait/distribution", headers=auth_headers()).json()
+    assert dist["complete"] is True
+    etas = {e["entryId"]: e for e in dist["entries"]}
+    assert etas[ids[0]]["p50"] == 0 and etas[ids[1]]["p50"] == 0  # two free tables
+    assert 0 < etas[ids[2]]["p50"] <= etas[ids[2]]["p90"]
+    assert etas[ids[3]]["p50"] >= etas[ids[2]]["p50"]  # six wait for both tables pushed together
+    sizes = {row["partySize"]: row for row in dist["partySizes"]}
+    assert sizes[4]["p50"] > 0 and sizes[6]["p50"] >= sizes[4]["p50"] and 7 not in sizes
+
+    eta = client.get(f"/v1/events/{event_id}/waitlist/{ids[2]}/eta").json()
+    assert eta["status"] == "QUEUED" and eta["p50"] == etas[ids[2]]["p50"]
+
+    quoted = client.post(f"/v1/events/{event_id}/waitlist", json={"name": "Late Diner", "partySize": 2}).json()
+    assert abs(quoted["estimatedWait"] - max(5, sizes[2]["p50"])) <= 1
+    # The simulation no longer describes the queue, so later joiners are quoted by position.
+    later = [client.post(f"/v1/events/{event_id}/waitlist", json={"name": f"Later Diner {i}", "partySize": 2}).json()["estimatedWait"] for i in range(30)]
+    assert later == sorted(later) and later[-1] > later[0] > 5
+
+
+def test_event_cache_counts_hits_and_is_invalidated_by_writes():
+    from app.cache import event_cache
+
+    event_id = client.post(
+        "/v1/events",
+        headers=auth_headers(),
+        json={
+            "name": "Cache Bistro",
+            "eventType": "INDOOR_TABLES",
+            "maxCapacity": 20,
+            "totalTables": 2,
+            "startTime": "2026-03-20T17:00:00Z",
+            "endTime": "2026-03-20T23:00:00Z",
+        },
+    ).json()["id"]
+    entry_id = client.post(f"/v1/events/{event_id}/waitlist", json={"name": "Cache Guest", "partySize": 2}).json()["id"]
+
+    hits = event_cache.hits
+    assert client.get(f"/v1/events/{event_id}/staff/dashboard", headers=auth_headers()).status_code == 200
+    assert event_cache.hits == hits + 1
+
+    invalidations = event_cache.invalidations
+    client.post(f"/v1/events/{event_id}/staff/seat", headers=auth_headers(), json={"entryId": entry_id})
+    assert event_cache.invalidations > invalidations
+    assert client.get(f"/v1/events/{event_id}/staff/dashboard", headers=auth_headers()).json()["availableTables"] == 1
+
+    body = client.get("/metrics").text
+    assert 'event_cache_requests_total{result="hit"}' in body
+
+
+def test_idempotency_key_replays_first_response():
+    event_id = client.post(
+        "/v1/events",
+        headers=auth_headers(),
+        json={
+            "name": "Retry Diner",
+            "eventType": "INDOOR_TABLES",
+            "maxCapacity": 20,
+            "totalTables": 4,
+            "startTime": "2026-03-20T17:00:00Z",
+            "endTime": "2026-03-20T23:00:00Z",
+        },
+    ).json()["id"]
+    for name in ("Retry A", "Retry B"):
+        client.post(f"/v1/events/{event_id}/waitlist", json={"name": name, "partySize": 2})
+
+    headers = {**auth_headers(), "Idempotency-Key": "promote-1"}
+    first = client.post(f"/v1/events/{event_id}/staff/promote", headers=headers, json={"count": 1})
+    retry = client.post(f"/v1/events/{event_id}/staff/promote", headers=headers, json={"count": 1})
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert retry.json() == first.json()
+    dashboard = client.get(f"/v1/events/{event_id}/staff/dashboard", headers=auth_headers()).json()
+    assert dashboard["availableTables"] == 3
+
+    reused = client.post(f"/v1/events/{event_id}/staff/promote", headers=headers, json={"count": 2})
+    assert reused.status_code == 422
+    assert reused.json()["code"] == "IDEMPOTENCY_KEY_REUSED"
+
+
+def test_concurrent_idempotent_duplicates_share_one_execution():
+    import asyncio
+
+    import httpx
+
+    event_id = client.post(
+        "/v1/events",
+        headers=auth_headers(),
+        json={
+            "name": "Double Tap Bar",
+            "eventType": "OUTDOOR",
+            "maxCapacity": 50,
+            "startTime": "2026-03-20T17:00:00Z",
+            "endTime": "2026-03-20T23:00:00Z",
+        },
+    ).json()["id"]
+
+    async def join_twice():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            request = dict(json={"name": "Double Tap", "partySize": 2}, headers={"Idempotency-Key": "join-1"})
+            return await asyncio.gather(*(http.post(f"/v1/events/{event_id}/waitlist", **request) for _ in range(2)))
+
+    first, second = asyncio.run(join_twice())
+    assert first.status_code == second.status_code == 200
+    assert first.json()["id"] == second.json()["id"]
+    assert second.headers["idempotent-replayed"] == "true"
+    assert client.get(f"/v1/events/{event_id}/waitlist", headers=auth_headers()).json()["total"] == 1
+
+
+def test_single_flight_shares_one_computation_per_revision():
+    import threading
+
+    from app.coalesce import SingleFlight
+
+    flight = SingleFlight(window_seconds=1)
+    started, release = threading.Event(), threading.Event()
+    runs: list[int] = []
+    results: list[int] = []
+
+    def compute():
+        runs.append(1)
+        started.set()
+        release.wait(1)
+        return 42
+
+    def call():
+        results.append(flight.do("dashboard", ("evt", 0), compute))
+
+    threads = [threading.Thread(target=call)]
+    threads[0].start()
+    started.wait(1)
+    threads += [threading.Thread(target=call) for _ in range(5)]
+    for thread in threads[1:]:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == [42] * 6
+    assert len(runs) == 1
+    assert flight.do("dashboard", ("evt", 1), compute) == 42
+    assert len(runs) == 2
+    assert 'coalesced_collapse_ratio{function="dashboard"} 3.500' in "\n".join(flight.metric_lines())
+
+
+def test_waitlist_page_negotiates_msgpack_columns_and_gzip():
+    import msgpack
+
+    event_id = client.post(
+        "/v1/events",
+        headers=auth_headers(),
+        json={
+            "name": "Wire Hall",
+            "eventType": "OUTDOOR",
+            "maxCapacity": 500,
+            "startTime": "2026-03-20T17:00:00Z",
+            "endTime": "2026-03-20T23:00:00Z",
+        },
+    ).json()["id"]
+    for i in range(30):
+        client.post(f"/v1/events/{event_id}/waitlist", json={"name": f"Wire Guest {i}", "partySize": 2})
+
+    as_json = client.get(f"/v1/events/{event_id}/waitlist?pageSize=30", headers=auth_headers())
+    assert as_json.headers["content-encoding"] == "gzip"
+    first = as_json.json()["data"][0]
+    assert first["status"] == "QUEUED" and first["joinedAt"].endswith("Z")
+
+    packed = client.get(
+        f"/v1/events/{event_id}/waitlist?pageSize=30",
+        headers={**auth_headers(), "Accept": "application/msgpack", "Accept-Encoding": "identity"},
+    )
+    assert packed.headers["content-type"] == "application/msgpack"
+    assert len(packed.content) < len(json.dumps(as_json.json(), separators=(",", ":")))
+    page = msgpack.unpackb(packed.content)
+    assert page["total"] == 30
+    row = dict(zip(page["columns"], page["rows"][0]))
+    codes = client.get("/v1/wire-format").json()["enums"]
+    assert codes["EntryStatus"][row["status"]] == "QUEUED"
+    assert row["id"] == first["id"]
+    assert isinstance(row["joinedAt"], int)
+
+
+def test_fields_parameter_projects_responses():
+    event = client.post(
+        "/v1/events",
+        headers=auth_headers(),
+        json={
+            "name": "Sparse Grill",
+            "eventType": "INDOOR_TABLES",
+            "maxCapacity": 30,
+            "totalTables": 3,
+            "startTime": "2026-03-20T17:00:00Z",
+            "endTime": "2026-03-20T23:00:00Z",
+        },
+    ).json()
+    entry_id = client.post(f"/v1/events/{event['id']}/waitlist", json={"name": "Sparse Guest", "partySize": 2}).json()["id"]
+
+    assert client.get(f"/v1/events/{event['id']}?fields=id,name", headers=auth_headers()).json() == {"id": event["id"], "name": "Sparse Grill"}
+    page = client.get(f"/v1/events/{event['id']}/waitlist?fields=id,status,position", headers=auth_headers()).json()
+    assert page["data"] == [{"id": entry_id, "status": "QUEUED", "position": 1}]
+    assert client.get(f"/v1/events/{event['id']}/waitlist/{entry_id}?fields=status").json() == {"status": "QUEUED"}
+    assert list(client.get(f"/v1/events/{event['id']}/waitlist/{entry_id}?fields=status,id").json()) == ["id", "status"]
+
+    bad = client.get(f"/v1/events/{event['id']}?fields=id,secret", headers=auth_headers())
+    assert bad.status_code == 400
+    assert bad.json()["details"]["unknownFields"] == ["secret"]
+
+
+def test_ended_events_are_archived_and_rehydrated_on_access(monkeypatch):
+    from app.analytics import venue_stats
+    from app.config import settings
+    from app.lifecycle import lifecycle
+    from app.store import store
+
+    event_id = client.post(
+        "/v1/events",
+        headers=auth_headers(),
+        json={
+            "name": "Closed Pavilion",
+            "eventType": "OUTDOOR",
+            "maxCapacity": 50,
+            "startTime": "2026-03-20T17:00:00Z",
+            "endTime": "2026-03-20T23:00:00Z",
+            "location": "Archive Park",
+        },
+    ).json()["id"]
+    entry_id = client.post(f"/v1/events/{event_id}/waitlist", json={"name": "Late Guest", "partySize": 3}).json()["id"]
+
+    lifecycle.sweep(budget=10_000)
+    assert event_id not in store.events and event_id not in store.waitlists
+    assert venue_stats("archive park").events == 1
+
+    event = client.get(f"/v1/events/{event_id}", headers=auth_headers()).json()
+    assert event["archived"] is True
+    assert client.get(f"/v1/events/{event_id}/waitlist/{entry_id}").json()["partySize"] == 3
+    rejected = client.post(f"/v1/events/{event_id}/waitlist", json={"name": "Too Late", "partySize": 2})
+    assert rejected.status_code == 409 and rejected.json()["code"] == "EVENT_ARCHIVED"
+
+    monkeypatch.setattr(settings, "archive_idle_seconds", 0)
+    lifecycle.sweep()
+    assert event_id not in store.events
+    assert venue_stats("archive park").events == 1
+
+
+def test_archive_waits_for_a_join_in_progress():
+    import threading
+
+    from app.lifecycle import lifecycle
+    from app.models import WaitlistCreate
+    from app.services import _join, get_event, get_guests
+    from app.store import store
+
+    event_id = client.post(
+        "/v1/events",
+        headers=auth_headers(),
+        json={"name": "Racing Close", "eventType": "OUTDOOR", "maxCapacity": 50, "startTime": "2026-03-20T17:00:00Z", "endTime": "2026-03-20T23:00:00Z"},
+    ).json()["id"]
+    event, guests = get_event(event_id), get_guests(event_id)
+    with guests.lock:
+        archiver = threading.Thread(target=lifecycle.archive, args=(event_id,))
+        archiver.start()
+        archiver.join(0.2)
+        assert archiver.is_alive() and not event.archived
+        entry = _join(event, store.waitlists[event_id], guests, WaitlistCreate(name="Last In", partySize=2))
+    archiver.join()
+    assert [e["id"] for e in lifecycle.cold.get(event_id)["waitlist"]] == [entry.id]
+
+
+def test_multi_queue_event_routes_joins_and_promotes_per_queue():
+    event = client.post(
+        "/v1/events",
+        headers=auth_headers(),
+        json={
+            "name": "Two Door Club",
+            "eventType": "OUTDOOR",
+            "maxCapacity": 200,
+            "startTime": "2026-03-20T17:00:00Z",
+            "endTime": "2026-03-20T23:00:00Z",
+            "queues": [
+                {"name": "VIP", "entryType": "reservation", "capacity": 1},
+                {"name": "Pairs", "maxPartySize": 2},
+                {"name": "Groups", "minPartySize": 3, "promotionPolicy": "SMALLEST_PARTY_FIRST"},
+            ],
+        },
+    ).json()
+    vip, pairs, groups = (q["id"] for q in event["queues"])
+    join = lambda name, size, **extra: client.post(f"/v1/events/{event['id']}/waitlist", json={"name": name, "partySize": size, **extra})
+
+    assert join("Pair One", 2).json()["queueId"] == pairs
+    assert join("Group Six", 6).json()["queueId"] == groups
+    group_four = join("Group Four", 4).json()
+    assert group_four["queueId"] == groups and group_four["position"] == 2
+    assert join("Booked", 4, type="reservation").json()["queueId"] == vip
+    full = join("Booked Too", 2, type="reservation")
+    assert full.status_code == 409 and full.json()["code"] == "QUEUE_FULL"
+
+    promoted = client.post(f"/v1/events/{event['id']}/staff/promote", headers=auth_headers(), json={"count": 1, "queueId": groups}).json()
+    assert [e["name"] for e in promoted["promoted"]] == ["Group Four"]
+
+    summary = client.get(f"/v1/events/{event['id']}/queues", headers=auth_headers()).json()
+    by_name = {q["name"]: q for q in summary["queues"]}
+    assert by_name["Groups"]["queued"] == 1 and by_name["Groups"]["notified"] == 1
+    assert summary["queued"] == 3
+    dashboard = client.get(f"/v1/events/{event['id']}/staff/dashboard", headers=auth_headers()).json()
+    assert dashboard["queuedReservations"] == 1 and dashboard["queuedWaitlist"] == 2
+    assert len(dashboard["queues"]) == 3
+
+    # FIFO and SMALLEST_PARTY_FIRST keys don't compare, so the queues take turns.
+    promoted = client.post(f"/v1/events/{event['id']}/staff/promote", headers=auth_headers(), json={"count": 3}).json()
+    assert [e["name"] for e in promoted["promoted"]] == ["Booked", "Pair One", "Group Six"]
+
+
+def test_priority_queue_orders_reservations_and_ages_walk_ins():
+    from datetime import datetime, timedelta, timezone
+
+    now = datetime.now(timezone.utc)
+    event_id = client.post(
+        "/v1/events",
+        headers=auth_headers(),
+        json={
+            "name": "Priority Terrace",
+            "eventType": "OUTDOOR",
+            "maxCapacity": 100,
+            "startTime": "2026-03-20T17:00:00Z",
+            "endTime": "2099-03-20T23:00:00Z",
+            "queues": [{"name": "Main", "promotionPolicy": "PRIORITY"}],
+        },
+    ).json()["id"]
+    join = lambda name, **extra: client.post(f"/v1/events/{event_id}/waitlist", json={"name": name, "partySize": 2, **extra})
+    join("Walk In Early")
+    join("Booked Later", type="reservation", reservationTime=(now + timedelta(hours=1)).isoformat())
+    join("Booked Now", type="reservation", reservationTime=now.isoformat())
+    join("Walk In Late")
+
+    promote = lambda count: client.post(f"/v1/events/{event_id}/staff/promote", headers=auth_headers(), json={"count": count}).json()
+    assert [e["name"] for e in promote(1)["promoted"]] == ["Booked Now"]
+    assert [e["name"] for e in promote(3)["promoted"]] == ["Walk In Early", "Walk In Late", "Booked Later"]
+    jumped = join("Booked Yesterday", type="reservation", reservationTime=(now - timedelta(days=1)).isoformat())
+    assert jumped.status_code == 400 and jumped.json()["code"] == "INVALID_INPUT"
+    naive = join("Booked Naive", type="reservation", reservationTime=now.replace(tzinfo=None).isoformat())
+    assert naive.status_code == 200 and naive.json()["reservationTime"].endswith(("Z", "+00:00"))
+    assert [e["name"] for e in promote(1)["promoted"]] == ["Booked Naive"]
+
+
+def test_priority_key_lets_long_waiting_walk_ins_pass_reservations():
+    from datetime import timedelta
+
+    from app.models import EntryType, WaitlistEntry, now_utc
+    from app.scheduling import Scheduler, priority_key
+
+    now = now_utc()
+    waited = WaitlistEntry(eventId="e", name="Waited", partySize=2, type="waitlist", position=1, estimatedWait=5, joinedAt=now - timedelta(minutes=30))
+    booked = WaitlistEntry(eventId="e", name="Booked", partySize=2, type="reservation", position=2, estimatedWait=5, reservationTime=now)
+    members = {waited.id: waited, booked.id: booked}
+    scheduler = Scheduler(priority_key, members)
+    scheduler.push(booked)
+    scheduler.push(waited)
+
+    assert [e.name for e in scheduler.take(2)] == ["Waited", "Booked"]
+    assert [e.name for e in scheduler.take(1, EntryType.reservation)] == ["Booked"]
+    del members[waited.id]
+    scheduler.discard(waited)
+    assert [e.name for e in scheduler.take(2)] == ["Booked"]
+
+
+def test_reservations_are_checked_against_table_interval_indexes():
+    event_id = client.post(
+        "/v1/events",
+        headers=auth_headers(),
+        json={
+            "name": "Booking Brasserie",
+            "eventType": "INDOOR_TABLES",
+            "maxCapacity": 20,
+            "totalTables": 2,
+            "startTime": "2099-06-01T17:00:00Z",
+            "endTime": "2099-06-01T23:00:00Z",
+        },
+    ).json()["id"]
+    book = lambda name, start: client.post(f"/v1/events/{event_id}/reservations", json={"name": name, "partySize": 2, "start": start})
+
+    first = book("Booker One", "2099-06-01T19:30:00Z").json()
+    second = book("Booker Two", "2099-06-01T19:00:00Z").json()
+    assert {first["tableId"], second["tableId"]} == {1, 2}
+    assert first["end"] == "2099-06-01T20:15:00Z"
+    clash = book("Booker Three", "2099-06-01T19:40:00Z")
+    assert clash.status_code == 409 and clash.json()["code"] == "NO_CAPACITY"
+
+    availability = lambda start: client.get(f"/v1/events/{event_id}/availability", params={"partySize": 2, "start": start}).json()["tableIds"]
+    assert availability("2099-06-01T19:40:00Z") == []
+    assert availability("2099-06-01T20:15:00Z") == [1, 2]
+    assert availability("2099-06-01T17:00:00Z") == [1, 2]
+    assert client.get(f"/v1/events/{event_id}/availability", params={"partySize": 6, "start": "2099-06-01T17:00:00Z"}).json()["tableIds"] == []
+
+    slot = client.get(f"/v1/events/{event_id}/availability/next", params={"partySize": 2, "after": "2099-06-01T18:30:00Z"}).json()
+    assert slot["tableId"] == first["tableId"]
+    assert (slot["start"][:19], slot["end"][:19]) == ("2099-06-01T18:30:00", "2099-06-01T19:15:00")
+    slot = client.get(f"/v1/events/{event_id}/availability/next", params={"partySize": 2, "after": "2099-06-01T18:50:00Z"}).json()
+    assert slot["start"].startswith("2099-06-01T19:45:00") and slot["tableId"] == second["tableId"]
+
+    promoted = client.post(f"/v1/events/{event_id}/staff/promote", headers=auth_headers(), json={"count": 1}).json()["promoted"][0]
+    assert promoted["name"] == "Booker One" and promoted["assignedTableId"] == first["tableId"]
+
+    cancelled = client.delete(f"/v1/events/{event_id}/reservations/{second['id']}", headers=auth_headers())
+    assert cancelled.status_code == 200
+    assert availability("2099-06-01T19:00:00Z") == [second["tableId"]]
+
+
+def test_reservations_cannot_start_in_the_past():
+    from datetime import datetime, timedelta, timezone
+
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    event_id = client.post(
+        "/v1/events",
+        headers=auth_headers(),
+        json={
+            "name": "Backdated Bistro",
+            "eventType": "INDOOR_TABLES",
+            "maxCapacity": 20,
+            "totalTables": 2,
+            "startTime": (now - timedelta(hours=3)).isoformat(),
+            "endTime": (now + timedelta(hours=3)).isoformat(),
+        },
+    ).json()["id"]
+    book = lambda name, start: client.post(f"/v1/events/{event_id}/reservations", json={"name": name, "partySize": 2, "start": start.isoformat()})
+
+    stale = book("Early Bird", now - timedelta(hours=2))
+    assert stale.status_code == 400 and stale.json()["code"] == "INVALID_INPUT"
+    assert book("Late Arrival", now - timedelta(minutes=10)).status_code == 200
+    assert book("On Time", now + timedelta(hours=1)).status_code == 200
+
+
+def test_large_parties_are_seated_at_adjacent_tables():
+    event_id = client.post(
+        "/v1/events",
+        headers=auth_headers(),
+        json={
+            "name": "Banquet Hall",
+            "eventType": "INDOOR_TABLES",
+            "maxCapacity": 40,
+            "totalTables": 8,
+            "startTime": "2099-06-01T17:00:00Z",
+            "endTime": "2099-06-01T23:00:00Z",
+        },
+    ).json()["id"]
+    join = lambda name, size: client.post(f"/v1/events/{event_id}/waitlist", json={"name": name, "partySize": size}).json()
+
+    join("Party Of Ten", 10)
+    promoted = client.post(f"/v1/events/{event_id}/staff/promote", headers=auth_headers(), json={"count": 1}).json()["promoted"][0]
+    assert promoted["assignedTableIds"] == [1, 2, 3] and promoted["assignedTableId"] == 1
+    seated = client.post(f"/v1/events/{event_id}/staff/seat", headers=auth_headers(), json={"entryId": promoted["id"]}).json()
+    assert seated["assignedTableIds"] == [1, 2, 3]
+    assert client.get(f"/v1/events/{event_id}/staff/dashboard", headers=auth_headers()).json()["availableTables"] == 5
+
+    seat = lambda entry: client.post(f"/v1/events/{event_id}/staff/seat", headers=auth_headers(), json={"entryId": entry["id"]})
+    assert seat(join("Party Of Eight", 8)).json()["assignedTableIds"] == [5, 6]
+    assert seat(join("Party Of Twelve", 12)).json()["assignedTableIds"] == [4, 7, 8]
+    full = seat(join("Party Of Five", 5))
+    assert full.status_code == 409 and full.json()["code"] == "TABLE_OCCUPIED"
+
+
+def test_promotion_writes_outbox_drained_in_batches_with_retry():
+    import asyncio
+    import time
+
+    from app.notifications import FakeGateway, dispatcher, outbox
+    from app.services import get_waitlist_entry
+
+    sms, push = FakeGateway("sms", max_batch=1), FakeGateway("push")
+    dispatcher.register("sms", sms)
+    dispatcher.register("push", push)
+    event_id = client.post(
+        "/v1/events",
+        headers=auth_headers(),
+        json={"name": "Notify Night", "eventType": "OUTDOOR", "maxCapacity": 50, "startTime": "2099-06-01T17:00:00Z", "endTime": "2099-06-01T23:00:00Z"},
+    ).json()["id"]
+    prefs = {"sms": True, "push": True}
+    for name, phone in [("Texter One", "+15550001"), ("Texter Two", "+15550002")]:
+        client.post(f"/v1/events/{event_id}/waitlist", json={"name": name, "partySize": 2, "phoneNumber": phone, "notificationPreferences": prefs})
+    client.post(f"/v1/events/{event_id}/waitlist", json={"name": "Quiet Guest", "partySize": 2})
+    texter_id = client.get(f"/v1/events/{event_id}/waitlist", headers=auth_headers()).json()["data"][0]["id"]
+    assert "phoneNumber" not in client.get(f"/v1/events/{event_id}/waitlist/{texter_id}").json()
+    assert client.get(f"/v1/events/{event_id}/waitlist/{texter_id}?fields=phoneNumber").status_code == 400
+
+    promoted = client.post(f"/v1/events/{event_id}/staff/promote", headers=auth_headers(), json={"count": 3}).json()["promoted"]
+    records = client.get(f"/v1/events/{event_id}/notifications", headers=auth_headers()).json()["notifications"]
+    assert sorted((r["channel"], r["status"]) for r in records) == [("push", "PENDING")] * 2 + [("sms", "PENDING")] * 2
+    texter = get_waitlist_entry(event_id, next(p["id"] for p in promoted if p["name"] == "Texter One"))
+    assert outbox.enqueue(texter, "promoted") == []
+
+    sms.fail_next = 1
+    now = time.monotonic()
+    asyncio.run(dispatcher.drain(now))
+    assert (sms.batches, push.batches) == (2, 1) and len(push.sent) == 2 and len(sms.sent) == 1
+    asyncio.run(dispatcher.drain(now + 60))
+    assert sorted(n.to for n in sms.sent) == ["+15550001", "+15550002"]
+    records = client.get(f"/v1/events/{event_id}/notifications", headers=auth_headers()).json()["notifications"]
+    assert {r["status"] for r in records} == {"SENT"} and max(r["attempts"] for r in records) == 2
+
+
+
+def test_staff_mutations_honour_if_match_versions():
+    event = client.post(
+        "/v1/events",
+        headers=auth_headers(),
+        json={"name": "Versioned Venue", "eventType": "INDOOR_TABLES", "maxCapacity": 20, "totalTables": 2, "startTime": "2099-06-01T17:00:00Z", "endTime": "2099-06-01T23:00:00Z"},
+    ).json()
+    event_id = event["id"]
+    entry = client.post(f"/v1/events/{event_id}/waitlist", json={"name": "Versioned Guest", "partySize": 2}).json()
+    assert client.get(f"/v1/events/{event_id}/waitlist/{entry['id']}").headers["etag"] == '"1"'
+
+    promote = lambda version: client.post(f"/v1/events/{event_id}/staff/promote", headers={**auth_headers(), "If-Match": version}, json={"count": 1})
+    stale = promote(str(event["version"] + 1))
+    assert stale.status_code == 409 and stale.json()["code"] == "VERSION_CONFLICT"
+    assert stale.json()["details"]["current"]["id"] == event_id
+    client.post(f"/v1/events/{event_id}/waitlist", json={"name": "Second Guest", "partySize": 2})
+    promoted = promote(f'"{event["version"]}"').json()["promoted"][0]
+    assert promoted["version"] == 2 and promoted["status"] == "NOTIFIED"
+    assert client.get(f"/v1/events/{event_id}", headers=auth_headers()).json()["version"] == event["version"] + 1
+    # The ETag was consumed by the first promote.
+    assert promote(f'"{event["version"]}"').json()["code"] == "VERSION_CONFLICT"
+
+    seat = lambda version: client.post(f"/v1/events/{event_id}/staff/seat", headers={**auth_headers(), "If-Match": version}, json={"entryId": entry["id"]})
+    conflict = seat("1")
+    assert conflict.status_code == 409 and conflict.json()["details"]["current"]["status"] == "NOTIFIED"
+    seated = seat('W/"2"').json()
+    assert (seated["status"], seated["version"]) == ("SEATED", 3)
+    assert seat("abc").status_code == 400
+
+
+def test_bumps_and_swaps_share_the_stripe_lock():
+    import threading
+
+    from app.models import Table
+    from app.versioning import bump, compare_and_swap
+
+    table = Table(id=1, name="T1", capacity=2, row=0, col=0)
+    start = table.version
+
+    def writer(i):
+        for _ in range(500):
+            if i % 2:
+                bump(table)
+            else:
+                with compare_and_swap((table, None)):
+                    pass
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert table.version == start + 8 * 500
+
+
+def test_staff_batch_is_atomic_or_best_effort():
+    event_id = client.post(
+        "/v1/events",
+        headers=auth_headers(),
+        json={"name": "Batch Bistro", "eventType": "INDOOR_TABLES", "maxCapacity": 20, "totalTables": 2, "startTime": "2099-06-01T17:00:00Z", "endTime": "2099-06-01T23:00:00Z"},
+    ).json()["id"]
+    ids = [client.post(f"/v1/events/{event_id}/waitlist", json={"name": f"Batch Guest {c}", "partySize": 2}).json()["id"] for c in "ABC"]
+    operations = [{"op": "PROMOTE"}, {"op": "SEAT", "entryId": ids[0]}, {"op": "SEAT", "entryId": ids[1]}, {"op": "SEAT", "entryId": ids[2]}]
+    batch = lambda mode: client.post(f"/v1/events/{event_id}/staff/batch", headers=auth_headers(), json={"mode": mode, "operations": operations})
+    dashboard = lambda: client.get(f"/v1/events/{event_id}/staff/dashboard", headers=auth_headers()).json()
+
+    failed = batch("ATOMIC")
+    assert failed.status_code == 409 and failed.json()["code"] == "BATCH_FAILED"
+    assert failed.json()["details"]["failedIndex"] == 3
+    assert (dashboard()["queuedWaitlist"], dashboard()["availableTables"]) == (3, 2)
+    first = client.get(f"/v1/events/{event_id}/waitlist/{ids[0]}").json()
+    assert (first["status"], first["assignedTableIds"]) == ("QUEUED", [])
+
+    result = batch("BEST_EFFORT").json()
+    assert (result["applied"], result["failed"]) == (3, 1)
+    assert result["results"][0]["entries"][0]["id"] == ids[0]
+    assert result["results"][3]["code"] == "TABLE_OCCUPIED"
+    assert [client.get(f"/v1/events/{event_id}/waitlist/{i}").json()["status"] for i in ids] == ["SEATED", "SEATED", "QUEUED"]
+    assert client.post(f"/v1/events/{event_id}/staff/batch", headers=auth_headers(), json={"operations": [{"op": "SEAT"}]}).status_code == 422
+
+
+def test_batch_rollback_skips_tables_taken_since_and_best_effort_reports_partial_promotes():
+    from app.models import SeatRequest
+    from app.services import BatchUndo, _seat, get_event, get_queues, seat
+    from app.store import store
+
+    create = lambda name: client.post(
+        "/v1/events",
+        headers=auth_headers(),
+        json={"name": name, "eventType": "INDOOR_TABLES", "maxCapacity": 20, "totalTables": 2, "startTime": "2099-06-01T17:00:00Z", "endTime": "2099-06-01T23:00:00Z"},
+    ).json()["id"]
+    join = lambda event_id: [client.post(f"/v1/events/{event_id}/waitlist", json={"name": f"Undo Guest {c}", "partySize": 2}).json()["id"] for c in "ABC"]
+
+    event_id = create("Undo Diner")
+    ids = join(event_id)
+    first_table = client.post(f"/v1/events/{event_id}/staff/promote", headers=auth_headers(), json={"count": 1}).json()["promoted"][0]["assignedTableId"]
+    event = get_event(event_id)
+    guest = next(e for e in store.waitlists[event_id] if e.id == ids[0])
+    other_table = next(t.id for t in event.tables if t.id != first_table)
+    # A batch seats guest A at the other table, freeing theirs; a single seat takes it before the batch fails.
+    undo = BatchUndo(event)
+    undo.capture(guest)
+    _seat(event, guest, other_table, None, lambda entry, kind: undo.changed(entry))
+    seat(event_id, SeatRequest(entryId=ids[1], tableId=first_table))
+    undo.rollback(get_queues(event))
+    assert (guest.status, guest.assignedTableIds) == ("SEATED", [other_table])
+    assert all(t.occupied for t in event.tables)
+
+    event_id = create("Partial Diner")
+    ids = join(event_id)
+    operations = [{"op": "PROMOTE", "count": 3}]
+    result = client.post(f"/v1/events/{event_id}/staff/batch", headers=auth_headers(), json={"mode": "BEST_EFFORT", "operations": operations}).json()
+    row = result["results"][0]
+    assert (row["ok"], row["code"]) == (False, "NO_CAPACITY")
+    assert [e["id"] for e in row["entries"]] == ids[:2] and all(e["status"] == "NOTIFIED" for e in row["entries"])
+
+
+def test_guest_index_dedupes_and_searches_names_and_phones():
+    import time
+
+    from app.models import WaitlistCreate
+    from app.services import WaitlistImporter
+
+    event_id = client.post(
+        "/v1/events",
+        headers=auth_headers(),
+        json={"name": "Search Fair", "eventType": "OUTDOOR", "maxCapacity": 50000, "startTime": "2099-06-01T17:00:00Z", "endTime": "2099-06-01T23:00:00Z"},
+    ).json()["id"]
+    importer = WaitlistImporter(event_id)
+    for i in range(10_000):
+        importer.add(i, WaitlistCreate(name=f"Guest {i:05d}", partySize=2, phoneNumber=f"+1 555 {i:07d}"))
+    join = lambda name, phone: client.post(f"/v1/events/{event_id}/waitlist", json={"name": name, "partySize": 2, "phoneNumber": phone})
+    smith = join("Jane Smith", "(555) 123-9876").json()
+    assert join("  JANE   smith ", None).status_code == 409
+
+    search = lambda q: client.get(f"/v1/events/{event_id}/waitlist/search", headers=auth_headers(), params={"q": q, "limit": 5}).json()["data"]
+    started = time.perf_counter()
+    assert [e["id"] for e in search("smi")] == [smith["id"]]
+    assert [e["id"] for e in search("jane s")] == [smith["id"]]
+    assert [e["name"] for e in search("guest 0999")] == [f"Guest {i:05d}" for i in range(9990, 9995)]
+    assert [e["id"] for e in search("555-123")] == [smith["id"]]
+    assert [e["name"] for e in search("+1 555 0004")][:1] == ["Guest 04000"]
+    assert time.perf_counter() - started < 1.0
+    assert client.get(f"/v1/events/{event_id}/waitlist/{smith['id']}").status_code == 200
+    blank = client.get(f"/v1/events/{event_id}/waitlist/search", headers=auth_headers(), params={"q": "   "})
+    assert blank.status_code == 400 and blank.json()["code"] == "INVALID_INPUT"
+
+    # Waitlists replaced or appended to straight in the store (restores, seeds) are picked up.
+    from app.models import EntryType, WaitlistEntry
+    from app.store import store
+
+    restored = lambda name: WaitlistEntry(eventId=event_id, name=name, partySize=2, type=EntryType.waitlist, position=1, estimatedWait=5)
+    store.waitlists[event_id] = [restored("Restored Rita")]
+    assert [e["name"] for e in search("rita")] == ["Restored Rita"] and search("smith") == []
+    store.waitlists[event_id].append(restored("Seeded Sam"))
+    assert [e["name"] for e in search("sam")] == ["Seeded Sam"]
+    assert join("Seeded Sam", None).status_code == 409
+
+
+def test_activity_log_and_queue_timeseries_follow_transitions():
+    from datetime import datetime, timedelta, timezone
+
+    from app.models import set_clock
+
+    now = [datetime(2099, 6, 1, 18, 0, 30, tzinfo=timezone.utc)]
+    set_clock(lambda: now[0])
+    try:
+        event_id = client.post(
+            "/v1/events",
+            headers=auth_headers(),
+            json={"name": "Activity Cafe", "eventType": "INDOOR_TABLES", "maxCapacity": 20, "totalTables": 2, "startTime": "2099-06-01T17:00:00Z", "endTime": "2099-06-01T23:00:00Z"},
+        ).json()["id"]
+        ids = [client.post(f"/v1/events/{event_id}/waitlist", json={"name": f"Activity Guest {c}", "partySize": 2}).json()["id"] for c in "ABC"]
+        now[0] += timedelta(minutes=3)
+        client.post(f"/v1/events/{event_id}/staff/promote", headers=auth_headers(), json={"count": 1})
+        client.post(f"/v1/events/{event_id}/staff/seat", headers=auth_headers(), json={"entryId": ids[0]})
+        client.post(f"/v1/events/{event_id}/staff/no-show", headers=auth_headers(), json={"entryId": ids[1]})
+
+        recent = client.get(f"/v1/events/{event_id}/staff/dashboard", headers=auth_headers()).json()["recentActivity"]
+        assert [(a["kind"], a["entryId"]) for a in recent] == [("no_show", ids[1]), ("seated", ids[0]), ("promoted", ids[0]), ("joined", ids[2]), ("joined", ids[1])]
+        activity = client.get(f"/v1/events/{event_id}/staff/activity", headers=auth_headers(), params={"limit": 10}).json()["data"]
+        assert len(activity) == 6 and activity[-1]["at"] == "2099-06-01T18:00:30+00:00"
+
+        series = client.get(f"/v1/events/{event_id}/staff/timeseries", headers=auth_headers(), params={"minutes": 10}).json()
+        assert series["resolutionSeconds"] == 60
+        assert series["at"][0] == "2099-06-01T18:00:00+00:00" and len(series["at"]) == 4
+        assert series["queueLength"] == [3, 3, 3, 1]
+        assert series["occupancy"] == [0, 0, 0, 2]
+    finally:
+        set_clock(None)
+
+
+# Runs the app's startup, which seeds the demo events; kept last so earlier tests see an unseeded store.
+def test_seeded_demo_events_survive_the_archive_sweep():
+    from app.lifecycle import lifecycle
+
+    with TestClient(app) as started:
+        lifecycle.sweep(budget=10_000)
+        joined = started.post("/v1/events/223/waitlist", json={"name": "Seed Keeper", "partySize": 2})
+    assert joined.status_code == 200
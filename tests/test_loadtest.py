@@ -0,0 +1,28 @@
+import asyncio
+
+from benchmarks.loadtest import SCENARIOS, LoadConfig, percentile, run_scenario
+
+
+def test_percentile_uses_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([], 95) == 0.0
+
+
+def test_scenarios_report_per_route_latencies():
+    config = LoadConfig(joins=20, guests=5, polls_per_guest=1, tables=40, bursts=2, burst_size=3, concurrency=4)
+    for name in SCENARIOS:
+        result = asyncio.run(run_scenario(name, config))
+        assert result["scenario"] == name
+        assert "POST /v1/events/{event_id}/waitlist" in result["routes"]
+        for row in result["routes"].values():
+            assert row["errors"] == 0
+            assert row["p50Ms"] <= row["p95Ms"] <= row["p99Ms"] <= row["maxMs"]
+
+
+def test_staff_burst_promotes_only_what_was_queued():
+    config = LoadConfig(tables=40, bursts=1, burst_size=25, concurrency=4)
+    routes = asyncio.run(run_scenario("staff_burst", config))["routes"]
+    assert routes["POST /v1/events/{event_id}/staff/promote"]["count"] == 2
+    assert routes["POST /v1/events/{event_id}/staff/seat"]["count"] == 25
@@ -0,0 +1,28 @@
+from benchmarks.microbench import check_baseline, check_scaling, run
+from app.store import store
+
+
+def test_gates_flag_slowdowns_and_superlinear_growth():
+    results = {"linear[1000]": 1e-4, "linear[100000]": 1e-2, "quadratic[1000]": 1e-4, "quadratic[100000]": 1.0}
+    assert check_scaling(results, max_exponent=1.3) == [
+        "quadratic: cost grows as n^2.00 between 1000 and 100000 (limit n^1.3)"
+    ]
+    assert check_baseline({"linear[1000]": 2e-4}, {"linear[1000]": 1e-4}, tolerance=0.5)
+    assert not check_baseline({"linear[1000]": 1.2e-4}, {"linear[1000]": 1e-4}, tolerance=0.5)
+
+
+def test_run_covers_every_hot_path_and_cleans_up():
+    results = run(entry_sizes=(200,), table_sizes=(10,), samples=1)
+    names = {key.split("[")[0] for key in results}
+    assert names == {
+        "get_waitlist_entry",
+        "add_waitlist_entry",
+        "calculate_heuristic_wait",
+        "get_real_time_no_show_rate",
+        "promote",
+        "list_waitlist",
+        "get_dashboard",
+        "_best_table",
+        "_table_set",
+    }
+    assert not any(event_id.startswith("bench-") for event_id in store.events)
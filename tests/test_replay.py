@@ -0,0 +1,77 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+
+from app.capture import capture, read_capture
+from app.main import app
+from app.store import store
+from benchmarks.replay import replay
+
+client = TestClient(app)
+AUTH = {"Authorization": "Bearer demo-token"}
+
+
+def test_captured_night_replays_on_a_virtual_clock(tmp_path):
+    path = tmp_path / "capture.jsonl.gz"
+    capture.start(path)
+    try:
+        event_id = client.post(
+            "/v1/events",
+            headers=AUTH,
+            json={"name": "Replay Night", "eventType": "OUTDOOR", "maxCapacity": 50, "startTime": "2099-06-01T17:00:00Z", "endTime": "2099-06-02T01:00:00Z"},
+        ).json()["id"]
+        entries = [client.post(f"/v1/events/{event_id}/waitlist", json={"name": f"Replay Guest {i}", "partySize": 2}).json() for i in range(3)]
+        client.post(f"/v1/events/{event_id}/staff/promote", headers=AUTH, json={"count": 1})
+        client.post(f"/v1/events/{event_id}/staff/seat", headers=AUTH, json={"entryId": entries[0]["id"]})
+        client.post(f"/v1/events/{event_id}/staff/no-show", headers=AUTH, json={"entryId": entries[1]["id"]})
+        client.get(f"/v1/events/{event_id}/waitlist", headers=AUTH, params={"status": "QUEUED"})
+    finally:
+        capture.stop()
+
+    records = list(read_capture(path))
+    assert [r["s"] for r in records] == [200] * 8 and "authorization" not in records[0]["h"]
+    # Spread the capture over an eight-hour night.
+    start = datetime.fromisoformat(records[0]["t"])
+    for i, record in enumerate(records):
+        record["t"] = (start + timedelta(hours=8 * i / (len(records) - 1))).isoformat()
+
+    report = asyncio.run(replay(records))
+    assert report["mismatches"] == 0 and report["checkedEntries"] == 3
+    assert report["virtualSeconds"] == 8 * 3600 and report["wallSeconds"] < 60
+    assert report["routes"]["POST /v1/events/{event_id}/waitlist"]["count"] == 3
+
+    recorded_name = json.loads(records[0]["b"])["name"]
+    assert recorded_name != "Replay Night"
+    replayed_event = next(e for e in store.events.values() if e.name == recorded_name)
+    seated = next(e for e in store.waitlists[replayed_event.id] if e.status == "SEATED")
+    assert seated.completedAt == datetime.fromisoformat(records[5]["t"])
+
+
+def test_capture_leaves_out_credentials_and_guest_details(tmp_path):
+    path = tmp_path / "capture.jsonl"
+    capture.start(path)
+    try:
+        client.post("/v1/auth/login", json={"email": "staff@example.com", "password": "hunter22"})
+        event_id = client.post(
+            "/v1/events",
+            headers=AUTH,
+            json={"name": "Private Night", "eventType": "OUTDOOR", "maxCapacity": 50, "startTime": "2099-06-01T17:00:00Z", "endTime": "2099-06-02T01:00:00Z"},
+        ).json()["id"]
+        for _ in range(2):
+            client.post(f"/v1/events/{event_id}/waitlist", json={"name": "Ada Lovelace", "partySize": 2, "phoneNumber": "+15550199"})
+        client.get(f"/v1/events/{event_id}/waitlist/search", headers=AUTH, params={"q": "Ada Lovelace", "limit": 5})
+        client.get(f"/v1/events/{event_id}/waitlist/search", headers=AUTH, params={"q": "555 0199"})
+    finally:
+        capture.stop()
+
+    text = path.read_text()
+    assert "hunter22" not in text and "staff@example.com" not in text
+    assert "Ada Lovelace" not in text and "15550199" not in text
+    assert "Ada" not in text and "555 0199" not in text and "555+0199" not in text
+    login, _, first, second, by_name, by_phone = read_capture(path)
+    assert login["trunc"] and "b" not in login and "r" not in login
+    # Equal values share a pseudonym, so the replayed duplicate join is still a 409.
+    assert json.loads(first["b"])["name"] == json.loads(second["b"])["name"] and second["s"] == 409
+    assert by_name["q"].startswith("q=redacted-") and by_name["q"].endswith("&limit=5") and by_phone["s"] == 200